@@ -0,0 +1,81 @@
+"""
+Streaming readers for ZIP and tar uploads.
+
+iter_members() yields each regular file of an archive as a readable
+stream. Nothing is extracted to disk and no member is read into memory
+whole, so callers can pipe members straight into the image store. ZIP
+needs a seekable file, and the spooled temp file behind an UploadFile is
+seekable. Tar archives, including .tar.gz, .tar.bz2 and .tar.xz, are read
+front to back in streaming mode.
+
+This module needs only the standard library, so simple_app.py imports it
+too; Dockerfile.fly copies it next to simple_app.py.
+"""
+
+import posixpath
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator, Tuple
+
+MAX_MEMBER_BYTES = 50 * 1024 * 1024  # Per file, after decompression
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class LimitedReader:
+    """Read through to source, failing once more than limit bytes come out.
+    Guards against members that decompress far beyond their declared size."""
+
+    def __init__(self, source: BinaryIO, limit: int, name: str):
+        self.source = source
+        self.remaining = limit
+        self.name = name
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.source.read(size)
+        self.remaining -= len(chunk)
+        if self.remaining < 0:
+            raise ArchiveError(too_large(self.name))
+        return chunk
+
+
+def too_large(name: str) -> str:
+    return f"{name} is larger than {MAX_MEMBER_BYTES // (1024 * 1024)} MB"
+
+
+def _skipped(name: str) -> bool:
+    """Directories and OS metadata (__MACOSX/, ._resource forks, .DS_Store)"""
+    base = posixpath.basename(name)
+    return not base or base.startswith(".") or name.startswith("__MACOSX/")
+
+
+def iter_members(fileobj: BinaryIO) -> Iterator[Tuple[str, int, BinaryIO]]:
+    """Yield (member path, declared size, stream) for every regular file in a
+    ZIP or tar. Each stream is only valid until the next member is requested
+    and raises ArchiveError once it has produced more than MAX_MEMBER_BYTES."""
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _skipped(info.filename):
+                    continue
+                with archive.open(info) as stream:
+                    yield info.filename, info.file_size, LimitedReader(stream, MAX_MEMBER_BYTES, info.filename)
+        return
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r|*")
+    except tarfile.TarError:
+        raise ArchiveError("Upload is not a ZIP or tar archive")
+    with archive:
+        try:
+            for info in archive:
+                if not info.isfile() or _skipped(info.name):
+                    continue
+                yield info.name, info.size, LimitedReader(archive.extractfile(info), MAX_MEMBER_BYTES, info.name)
+        except tarfile.TarError as e:
+            raise ArchiveError(f"Corrupt tar archive: {e}")
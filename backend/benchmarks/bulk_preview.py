@@ -0,0 +1,84 @@
+"""
+Benchmark filename parsing and the POST /cards/bulk/preview dry run.
+
+Generates a mix of filenames in every supported format and reports:
+- parser throughput (filenames per second) for filename_parser.parse()
+- end-to-end latency of /cards/bulk/preview for one batch, against a
+  throwaway database whose deck already holds some of those people
+
+Usage: python benchmarks/bulk_preview.py [--filenames 100000] [--batch 5000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from datagen import FIRST_NAMES, LAST_NAMES, ROLES, generate_filenames
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_parser(filenames, rounds):
+    sys.path.insert(0, BACKEND_DIR)
+    from filename_parser import filename_error, parse
+
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for filename in filenames:
+            filename_error(parse(filename), filename)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"parse + validate: {len(filenames)} filenames in {best * 1000:.1f} ms "
+          f"({len(filenames) / best:,.0f} filenames/s, best of {rounds})")
+
+
+def bench_preview(filenames, iterations):
+    with tempfile.TemporaryDirectory() as workdir:
+        # main.py creates ./flashcards.db and ./uploads on import
+        os.chdir(workdir)
+        import main
+        from fastapi.testclient import TestClient
+
+        with main.engine.begin() as conn:
+            conn.execute(main.Deck.__table__.insert(), [{"id": 1, "name": "Deck 1", "description": ""}])
+            conn.execute(main.Flashcard.__table__.insert(), [
+                {"deck_id": 1, "person_name": f"{first} {last}", "person_role": role}
+                for first in FIRST_NAMES for last in LAST_NAMES for role in ROLES[:2]
+            ])
+
+        client = TestClient(main.app)
+        token = client.post("/login", json={"username": main.VALID_USERNAME, "password": main.VALID_PASSWORD})
+        client.headers["Authorization"] = f"Bearer {token.json()['access_token']}"
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = client.post("/cards/bulk/preview", json={"deck_id": 1, "filenames": filenames})
+            timings.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+        timings.sort()
+        body = response.json()
+        print(f"/cards/bulk/preview: {len(filenames)} filenames, {body['valid_count']} valid, "
+              f"{body['error_count']} errors")
+        print(f"  p50 {timings[len(timings) // 2]:.1f} ms   "
+              f"p95 {timings[max(int(len(timings) * 0.95) - 1, 0)]:.1f} ms   ({iterations} runs)")
+        main.engine.dispose()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filenames", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    bench_parser(generate_filenames(args.filenames), args.rounds)
+    bench_preview(generate_filenames(args.batch, seed=7), args.iterations)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,168 @@
+"""
+Benchmark read throughput while bulk uploads are being committed.
+
+Starts the backend under uvicorn (one worker) against a throwaway database,
+then runs two phases of the same read load, GET /decks and
+GET /decks/{deck_id}/study from --readers concurrent clients:
+- reads only
+- reads while one client keeps posting /cards/bulk batches of --batch images
+
+For each phase it prints reads/s, read latency percentiles and failed
+requests. A handler that blocks the event loop shows up as a collapse in
+reads/s, a long tail or timeouts in the second phase.
+
+To compare before and after a change, run it against both trees:
+    git worktree add /tmp/flashcards-before <commit>
+    python benchmarks/concurrency.py --backend-dir /tmp/flashcards-before/backend
+    python benchmarks/concurrency.py
+
+Usage: python benchmarks/concurrency.py [--seconds 10] [--readers 16] [--batch 200]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_BYTES = 40 * 1024
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(backend_dir, workdir, port):
+    env = dict(os.environ, PYTHONPATH=backend_dir)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+
+def images(batch, start):
+    # Distinct content per image, so the image store has to write every one
+    return [
+        ("images", (f"Person {start + i} - Engineer.jpg", os.urandom(IMAGE_BYTES), "image/jpeg"))
+        for i in range(batch)
+    ]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+async def run_phase(client, deck_id, seconds, readers, batch):
+    latencies = []
+    uploads = []
+    errors = 0
+    stop = time.monotonic() + seconds
+
+    async def reader(n):
+        nonlocal errors
+        paths = ["/decks", f"/decks/{deck_id}/study?limit=20"]
+        i = n
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            response = await client.get(paths[i % 2])
+            if response.is_success:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+            i += 1
+
+    async def writer():
+        nonlocal errors
+        created = 0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            response = await client.post("/cards/bulk", data={"deck_id": deck_id}, files=images(batch, created))
+            if response.is_success:
+                uploads.append(time.perf_counter() - start)
+            else:
+                errors += 1
+            created += batch
+
+    tasks = [reader(n) for n in range(readers)]
+    if batch:
+        tasks.append(writer())
+    started = time.monotonic()
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        "reads_per_second": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "max": (latencies[-1] if latencies else float("nan")) * 1000,
+        "uploads": len(uploads),
+        "upload_seconds": sum(uploads) / len(uploads) if uploads else 0.0,
+        "errors": errors,
+    }
+
+
+async def benchmark(port, args):
+    limits = httpx.Limits(max_connections=args.readers + 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        token = (await client.post("/login", json={"username": "dave", "password": "india"})).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        deck_id = (await client.post("/decks", json={"name": "Benchmark"})).json()["id"]
+        for start in range(0, args.cards, 500):
+            count = min(500, args.cards - start)
+            (await client.post("/cards/bulk", data={"deck_id": deck_id}, files=images(count, -start - count))).raise_for_status()
+
+        results = [
+            ("reads only", await run_phase(client, deck_id, args.seconds, args.readers, 0)),
+            (f"reads + /cards/bulk x{args.batch}", await run_phase(client, deck_id, args.seconds, args.readers, args.batch)),
+        ]
+
+    print(f"{args.readers} readers, {args.seconds}s per phase, deck seeded with {args.cards} cards")
+    print(f"{'phase':<28}{'reads/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+          f"{'errors':>8}  uploads (mean time)")
+    for label, r in results:
+        uploads = f"{r['uploads']} ({r['upload_seconds']:.2f}s)" if r["uploads"] else "-"
+        print(f"{label:<28}{r['reads_per_second']:>10.0f}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+              f"{r['p99']:>10.1f}{r['max']:>10.1f}{r['errors']:>8}  {uploads}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend-dir", default=BACKEND_DIR, help="backend/ of the tree to benchmark")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=200, help="images per /cards/bulk request")
+    parser.add_argument("--cards", type=int, default=2000, help="cards seeded before measuring")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        server = start_server(os.path.abspath(args.backend_dir), workdir, port)
+        try:
+            asyncio.run(benchmark(port, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main_cli()
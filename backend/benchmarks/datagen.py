@@ -0,0 +1,133 @@
+"""
+Synthetic data for the benchmarks: people, filenames, images and seeded decks.
+
+Everything is derived from a seed, so two runs with the same arguments build
+the same data set; review timestamps are relative to the time of the run.
+seed_database() writes straight into the decks and
+flashcards tables through sqlite3. Those columns are shared by backend/main.py
+and simple_app.py, so one generator serves both apps. Images are random bytes
+named by their SHA-256, the same way the backend image store names them. The
+APIs never decode images except to build thumbnails, so real JPEGs are not
+needed.
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Callable, List, Sequence, Tuple
+
+FIRST_NAMES = ["John", "Jane", "Bob", "Alice", "Tom", "Sarah", "Mike", "María", "Wei", "Olu"]
+LAST_NAMES = ["Doe", "Smith", "Wilson", "Johnson", "Brown", "Davis", "Thompson", "García", "Chen"]
+ROLES = ["Software Engineer", "Marketing Manager", "Sales", "HR", "Product Manager", "Designer"]
+EXTENSIONS = ["jpg", "jpeg", "png", "JPG", "webp", "txt"]
+
+
+def parse_size(text: str) -> int:
+    """"200k" -> 204800; plain numbers are bytes"""
+    text = text.strip().lower()
+    for suffix, factor in (("k", 1024), ("m", 1024 * 1024)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def generate_filenames(count: int, seed: int = 42) -> List[str]:
+    """Upload filenames in every supported format, plus some non-images"""
+    rng = random.Random(seed)
+    filenames = []
+    for _ in range(count):
+        first, last, role = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(ROLES)
+        extension = rng.choice(EXTENSIONS)
+        style = rng.randrange(4)
+        if style == 0:
+            stem = f"{first} {last} - {role}"
+        elif style == 1:
+            stem = "_".join([first, last] + role.split())
+        elif style == 2:
+            stem = f"{first}_{last}"
+        else:
+            stem = f"{first} {last}"
+        filenames.append(f"{stem}.{extension}")
+    return filenames
+
+
+def image_bytes(size: int, rng: random.Random) -> bytes:
+    return rng.getrandbits(size * 8).to_bytes(size, "little") if size else b""
+
+
+def upload_files(count: int, size: int, seed: int, field: str) -> List[Tuple[str, tuple]]:
+    """Multipart files for a bulk upload: distinct content, parseable names"""
+    rng = random.Random(seed)
+    return [
+        (field, (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {seed}-{i} - {rng.choice(ROLES)}.jpg",
+                 image_bytes(size, rng), "image/jpeg"))
+        for i in range(count)
+    ]
+
+
+def write_images(directory: str, sizes: Sequence[int], count: int, seed: int) -> List[str]:
+    """count image files cycling through sizes; returns their filenames"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for i in range(count):
+        data = image_bytes(sizes[i % len(sizes)], rng)
+        filename = f"{hashlib.sha256(data).hexdigest()}.jpg"
+        with open(os.path.join(directory, filename), "wb") as out:
+            out.write(data)
+        filenames.append(filename)
+    return filenames
+
+
+def seed_database(path: str, decks: int, cards_per_deck: int, images: Sequence[str],
+                  format_timestamp: Callable[[datetime], str], seed: int = 42) -> List[int]:
+    """Insert decks x cards_per_deck cards with a realistic review history:
+    about half the cards are due, the rest are scheduled up to 30 days out.
+    The app must already have created its tables. Returns the deck ids."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    try:
+        # backend/main.py has flashcards.created_at, simple_app.py does not
+        card_created_at = "created_at" in {row[1] for row in conn.execute("PRAGMA table_info(flashcards)")}
+        deck_ids = []
+        for deck in range(decks):
+            cursor = conn.execute(
+                "INSERT INTO decks (name, description, created_at) VALUES (?, ?, ?)",
+                (f"Team {deck + 1}", "Synthetic deck", format_timestamp(now))
+            )
+            deck_ids.append(cursor.lastrowid)
+
+        def rows():
+            for deck_id in deck_ids:
+                for i in range(cards_per_deck):
+                    review_count = rng.randint(0, 12)
+                    last_reviewed = now - timedelta(days=rng.randint(1, 60)) if review_count else None
+                    yield (format_timestamp(now - timedelta(days=90)),) * card_created_at + (
+                        deck_id,
+                        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+                        rng.choice(ROLES),
+                        images[(deck_id * cards_per_deck + i) % len(images)] if images else None,
+                        "",
+                        "",
+                        rng.randint(1, 5),
+                        format_timestamp(last_reviewed) if last_reviewed else None,
+                        format_timestamp(now + timedelta(minutes=rng.randint(-30 * 24 * 60, 30 * 24 * 60))),
+                        review_count,
+                        round(rng.uniform(1.3, 3.5), 2),
+                        float(rng.choice([1, 2, 4, 7, 14, 30])) if review_count else None,
+                    )
+
+        columns = ("deck_id, person_name, person_role, image_filename, front, back, "
+                   "difficulty, last_reviewed, next_review, review_count, ease, interval_days")
+        if card_created_at:
+            columns = "created_at, " + columns
+        placeholders = ", ".join("?" * (12 + card_created_at))
+        conn.executemany(f"INSERT INTO flashcards ({columns}) VALUES ({placeholders})", rows())
+        conn.commit()
+        conn.execute("ANALYZE")
+        return deck_ids
+    finally:
+        conn.close()
@@ -0,0 +1,109 @@
+"""
+Benchmark the due-queue query used by GET /decks/{deck_id}/study.
+
+Builds a throwaway database with 100k cards, prints SQLite's query plan and
+the query latency with and without the (deck_id, next_review) index.
+
+Usage: python benchmarks/study_query.py [--cards 100000] [--decks 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app_in(workdir):
+    # main.py creates ./flashcards.db and ./uploads on import
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    return main
+
+
+def seed(main, total_cards, deck_count):
+    now = datetime.utcnow()
+    rng = random.Random(42)
+    with main.engine.begin() as conn:
+        conn.execute(main.Deck.__table__.insert(), [
+            {"id": deck_id, "name": f"Deck {deck_id}", "description": ""}
+            for deck_id in range(1, deck_count + 1)
+        ])
+        rows = []
+        for card_id in range(1, total_cards + 1):
+            rows.append({
+                "id": card_id,
+                "deck_id": rng.randint(1, deck_count),
+                "person_name": f"Person {card_id}",
+                "person_role": "Team Member",
+                "image_filename": f"{card_id}.jpg",
+                "difficulty": rng.randint(1, 5),
+                "review_count": rng.randint(0, 10),
+                # Roughly half the cards are overdue
+                "next_review": now + timedelta(minutes=rng.randint(-30 * 24 * 60, 30 * 24 * 60)),
+            })
+        conn.execute(main.Flashcard.__table__.insert(), rows)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def study_query(main, db, deck_id, limit):
+    return db.query(main.Flashcard).filter(
+        main.Flashcard.deck_id == deck_id,
+        main.Flashcard.next_review <= datetime.utcnow()
+    ).order_by(main.Flashcard.next_review, main.Flashcard.id).limit(limit)
+
+
+def report(main, label, deck_id, limit, iterations):
+    db = main.SessionLocal()
+    try:
+        query = study_query(main, db, deck_id, limit)
+        compiled = query.statement.compile(main.engine, compile_kwargs={"literal_binds": True})
+        plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+
+        timings = []
+        for _ in range(iterations):
+            db.expunge_all()
+            start = time.perf_counter()
+            study_query(main, db, deck_id, limit).all()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+    finally:
+        db.close()
+
+    print(label)
+    for row in plan:
+        print(f"  plan: {row[-1]}")
+    print(f"  p50 {timings[len(timings) // 2]:.3f} ms   "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.3f} ms   ({iterations} runs)")
+    print()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--decks", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        main = load_app_in(workdir)
+        seed(main, args.cards, args.decks)
+        print(f"{args.cards} cards across {args.decks} decks\n")
+
+        report(main, "With ix_flashcards_deck_next_review", 1, args.limit, args.iterations)
+
+        with main.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_flashcards_deck_next_review")
+        report(main, "Without composite index (deck_id index only)", 1, args.limit, args.iterations)
+
+        main.engine.dispose()
+
+
+if __name__ == "__main__":
+    main_cli()
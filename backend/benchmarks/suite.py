@@ -0,0 +1,382 @@
+"""
+Reproducible benchmark suite for backend/main.py and simple_app.py.
+
+Each app runs in its own process and scratch directory, seeded by
+datagen.py with --decks x --cards-per-deck cards and a pool of images of
+--image-sizes. Two kinds of benchmark run there:
+
+micro   the scheduler (schedule_card, which replaced calculate_next_review
+        and is shared with simple_app, and schedule_batch over 1000 cards)
+        and filename parsing, timed call by call
+http    in-process load through httpx's ASGI transport, so no network or
+        server is involved: login storm, deck listing, study fetch, single
+        review bursts, batched reviews and bulk upload, each with
+        --concurrency requests in flight
+
+Results are written as one JSON document (to stdout or --output): per
+benchmark the operation count, errors, throughput and p50/p95/p99/max
+latency in milliseconds. A readable summary goes to stderr. The same
+arguments and --seed give the same data set, so two result files can be
+compared directly.
+
+Usage: python benchmarks/suite.py [--apps backend,simple] [--decks 10] [--cards-per-deck 500]
+                                  [--image-sizes 20k,200k] [--requests 500] [--concurrency 16]
+                                  [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import datagen
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+APPS = ("backend", "simple")
+SCHEMA_VERSION = 1
+
+
+# Apps under test: how to load each one and how its endpoints are called
+
+class BackendTarget:
+    name = "backend"
+    upload_field = "images"
+
+    def __init__(self):
+        sys.path.insert(0, BACKEND_DIR)
+        import main
+        self.module = main
+        self.app = main.app
+        self.db_path = "flashcards.db"
+        self.upload_dir = main.UPLOAD_DIR
+
+    @staticmethod
+    def format_timestamp(moment: datetime) -> str:
+        return moment.strftime("%Y-%m-%d %H:%M:%S.%f")  # SQLAlchemy's SQLite DateTime format
+
+    def login(self, client):
+        return client.post("/login", json={"username": self.module.VALID_USERNAME,
+                                           "password": self.module.VALID_PASSWORD})
+
+    def study(self, client, deck_id):
+        return client.get(f"/decks/{deck_id}/study", params={"limit": 20})
+
+    def review(self, client, card_id, rating):
+        return client.post(f"/cards/{card_id}/review", json={"card_id": card_id, "difficulty": rating})
+
+    def review_batch(self, client, reviews):
+        return client.post("/reviews/batch", json={"reviews": [
+            {"card_id": card_id, "difficulty": rating} for card_id, rating in reviews
+        ]})
+
+    def bulk_upload(self, client, deck_id, files):
+        return client.post("/cards/bulk", data={"deck_id": deck_id}, files=files)
+
+    def micro_benchmarks(self):
+        from filename_parser import parse
+        from scheduling import schedule_batch, schedule_card
+
+        rng = random.Random(1)
+        cards = [(rng.randint(1, 5), rng.randint(0, 20), float(rng.randint(0, 60)), rng.uniform(1.3, 3.5))
+                 for _ in range(1000)]
+        columns = list(zip(*cards))
+        now = datetime.utcnow()
+        filenames = datagen.generate_filenames(1000)
+        return [
+            ("schedule_card", lambda i: schedule_card(*cards[i % len(cards)], now), 20000),
+            ("schedule_batch_1000", lambda i: schedule_batch(*columns, now), 500),
+            ("parse_filename", lambda i: parse(filenames[i % len(filenames)]), 50000),
+        ]
+
+    async def close(self):
+        await self.module.async_engine.dispose()
+
+
+class SimpleTarget:
+    name = "simple"
+    upload_field = "files"
+    RATINGS = {1: "hard", 2: "hard", 3: "medium", 4: "easy", 5: "easy"}
+
+    def __init__(self):
+        sys.path.insert(0, REPO_DIR)
+        import simple_app
+        self.module = simple_app
+        self.app = simple_app.app
+        self.db_path = simple_app.DATABASE_PATH
+        self.upload_dir = simple_app.UPLOAD_DIR
+
+    @staticmethod
+    def format_timestamp(moment: datetime) -> str:
+        return moment.isoformat()
+
+    def login(self, client):
+        return client.post("/login", data={"username": self.module.VALID_USERNAME,
+                                           "password": self.module.VALID_PASSWORD})
+
+    def study(self, client, deck_id):
+        return client.get(f"/decks/{deck_id}/study")
+
+    def review(self, client, card_id, rating):
+        return client.post(f"/cards/{card_id}/review", json={"difficulty": self.RATINGS[rating]})
+
+    def review_batch(self, client, reviews):
+        return client.post("/reviews/batch", json={"reviews": [
+            {"card_id": card_id, "difficulty": self.RATINGS[rating]} for card_id, rating in reviews
+        ]})
+
+    def bulk_upload(self, client, deck_id, files):
+        return client.post("/bulk-upload", data={"deck_id": deck_id}, files=files)
+
+    def micro_benchmarks(self):
+        from filename_parser import parse
+        from sm2 import schedule_card
+
+        rng = random.Random(1)
+        cards = [(rng.randint(1, 5), rng.randint(0, 20), float(rng.randint(0, 60)), rng.uniform(1.3, 3.5))
+                 for _ in range(1000)]
+        now = datetime.utcnow()
+        filenames = datagen.generate_filenames(1000)
+        return [
+            ("schedule_card", lambda i: schedule_card(*cards[i % len(cards)], now), 20000),
+            ("parse_filename", lambda i: parse(filenames[i % len(filenames)]), 50000),
+        ]
+
+    async def close(self):
+        pass
+
+
+TARGETS = {"backend": BackendTarget, "simple": SimpleTarget}
+
+
+# Measurement
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def summarize(app, kind, scenario, latencies, errors, seconds, **extra):
+    latencies.sort()
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 4)
+
+    return {
+        "app": app,
+        "kind": kind,
+        "scenario": scenario,
+        "operations": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(len(latencies) / seconds, 2) if seconds else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        **extra,
+    }
+
+
+def run_micro(app, name, call, operations):
+    for i in range(min(operations // 10, 1000)):  # Warm caches and lazy imports
+        call(i)
+    latencies = []
+    clock = time.perf_counter
+    started = clock()
+    for i in range(operations):
+        start = clock()
+        call(i)
+        latencies.append(clock() - start)
+    return summarize(app, "micro", name, latencies, 0, clock() - started)
+
+
+async def run_load(app, name, client, make_request, requests, concurrency, warmup):
+    """Issue requests calls of make_request(client, i) with concurrency in flight"""
+    for i in range(warmup):
+        try:
+            await make_request(client, requests + i)
+        except Exception:
+            pass  # Counted when the same failure happens in the timed run
+
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, index)
+                ok = response.is_success
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(app, "http", name, latencies, errors, time.perf_counter() - started,
+                     concurrency=concurrency)
+
+
+async def run_http(target, config, deck_ids, card_count):
+    import httpx
+
+    rng = random.Random(config["seed"])
+    requests, concurrency, warmup = config["requests"], config["concurrency"], config["warmup"]
+    transport = httpx.ASGITransport(app=target.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        token = (await target.login(client)).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        card_ids = [rng.randint(1, card_count) for _ in range(requests + warmup)]
+        ratings = [rng.randint(1, 5) for _ in range(requests + warmup)]
+        study_decks = [rng.choice(deck_ids) for _ in range(requests + warmup)]
+        review_batches = [
+            [(rng.randint(1, card_count), rng.randint(1, 5)) for _ in range(config["review_batch_size"])]
+            for _ in range(requests + warmup)
+        ]
+        bulk_requests = config["bulk_requests"]
+        upload_batches = [
+            datagen.upload_files(config["bulk_files"], config["bulk_image_size"], seed=config["seed"] + i,
+                                 field=target.upload_field)
+            for i in range(bulk_requests + 1)
+        ]
+
+        scenarios = [
+            ("login_storm", lambda c, i: target.login(c), requests),
+            ("deck_listing", lambda c, i: c.get("/decks"), requests),
+            ("study_fetch", lambda c, i: target.study(c, study_decks[i]), requests),
+            ("review_burst", lambda c, i: target.review(c, card_ids[i], ratings[i]), requests),
+            (f"review_batch_{config['review_batch_size']}",
+             lambda c, i: target.review_batch(c, review_batches[i]), max(requests // 10, 1)),
+        ]
+        results = []
+        for name, make_request, count in scenarios:
+            results.append(await run_load(target.name, name, client, make_request, count, concurrency, warmup))
+        # Last, since it grows the first deck
+        results.append(await run_load(
+            target.name, f"bulk_upload_{config['bulk_files']}x{config['bulk_image_size'] // 1024}k", client,
+            lambda c, i: target.bulk_upload(c, deck_ids[0], upload_batches[min(i, bulk_requests)]),
+            bulk_requests, min(concurrency, 2), min(warmup, 1),
+        ))
+        return results
+
+
+def worker_main(app_name, config, output_path):
+    """Runs inside the per-app process, with a scratch directory as cwd"""
+    os.environ.setdefault("TOKEN_STORE", "memory")
+    target = TARGETS[app_name]()
+
+    sizes = [datagen.parse_size(size) for size in config["image_sizes"].split(",")]
+    card_count = config["decks"] * config["cards_per_deck"]
+    images = datagen.write_images(target.upload_dir, sizes, min(config["images"], card_count), config["seed"])
+    deck_ids = datagen.seed_database(target.db_path, config["decks"], config["cards_per_deck"], images,
+                                     target.format_timestamp, seed=config["seed"])
+
+    results = [run_micro(app_name, name, call, operations)
+               for name, call, operations in target.micro_benchmarks()]
+
+    async def http():
+        try:
+            return await run_http(target, config, deck_ids, card_count)
+        finally:
+            await target.close()
+
+    results.extend(asyncio.run(http()))
+    with open(output_path, "w") as out:
+        json.dump(results, out)
+
+
+def print_summary(results):
+    print(f"{'app':<9}{'benchmark':<28}{'ops':>8}{'err':>5}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+          file=sys.stderr)
+    for r in results:
+        print(f"{r['app']:<9}{r['scenario']:<28}{r['operations']:>8}{r['errors']:>5}{r['throughput_per_s']:>12,.1f}"
+              f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}", file=sys.stderr)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", default=",".join(APPS), help="comma-separated: backend, simple")
+    parser.add_argument("--decks", type=int, default=10)
+    parser.add_argument("--cards-per-deck", type=int, default=500)
+    parser.add_argument("--image-sizes", default="20k,200k", help="sizes of seeded images, cycled")
+    parser.add_argument("--images", type=int, default=200, help="distinct seeded images")
+    parser.add_argument("--requests", type=int, default=500, help="requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests before each scenario")
+    parser.add_argument("--review-batch-size", type=int, default=50)
+    parser.add_argument("--bulk-requests", type=int, default=10)
+    parser.add_argument("--bulk-files", type=int, default=50, help="images per bulk upload")
+    parser.add_argument("--bulk-image-size", default="100k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="-", help="JSON results file; - for stdout")
+    parser.add_argument("--worker", choices=APPS, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-config", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args.worker, json.loads(args.worker_config), args.worker_output)
+        return
+
+    apps = [app.strip() for app in args.apps.split(",") if app.strip()]
+    unknown = [app for app in apps if app not in APPS]
+    if unknown:
+        parser.error(f"unknown apps: {', '.join(unknown)}")
+    config = {key: value for key, value in vars(args).items() if not key.startswith("worker") and key != "output"}
+    config["bulk_image_size"] = datagen.parse_size(args.bulk_image_size)
+
+    started_at = datetime.utcnow()
+    results = []
+    for app in apps:
+        with tempfile.TemporaryDirectory() as workdir:
+            output_path = os.path.join(workdir, "results.json")
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", app,
+                 "--worker-config", json.dumps(config), "--worker-output", output_path],
+                cwd=workdir, check=True,
+            )
+            with open(output_path) as f:
+                results.extend(json.load(f))
+
+    document = {
+        "schema_version": SCHEMA_VERSION,
+        "started_at": started_at.isoformat() + "Z",
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,159 @@
+"""
+Deck bundles: one deck with its cards and images in a single tar stream.
+
+Layout, in this order:
+    bundle.json              {"format", "version", "deck": {...}}
+    images/<sha256>.<ext>    each image the deck uses, once
+    cards/000001.ndjson      one card per line, CARDS_PER_PART cards per part
+
+Tar needs every member's size before its content. Splitting the manifest
+into parts keeps each one small enough to build in memory, and images are
+copied from disk in chunks. So a bundle is written with constant memory and
+never has to exist as a whole. Images come before the cards that reference
+them, so an importer reading front to back has every image stored before
+it inserts cards.
+"""
+
+import json
+import os
+import posixpath
+import tarfile
+import time
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, Tuple
+
+FORMAT = "flashcards-bundle"
+VERSION = 1
+CARDS_PER_PART = 1000
+COPY_CHUNK = 1024 * 1024
+MAX_PART_BYTES = 64 * 1024 * 1024  # Refuse manifest parts bigger than this on import
+
+# Card columns carried in the manifest; ids are not, the importer assigns new ones
+CARD_FIELDS = (
+    "person_name", "person_role", "front", "back", "image_filename", "difficulty",
+    "last_reviewed", "next_review", "review_count", "ease", "interval_days", "created_at",
+)
+DATETIME_FIELDS = ("last_reviewed", "next_review", "created_at")
+
+
+class BundleError(ValueError):
+    pass
+
+
+def _header(name: str, size: int) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+def _padding(size: int) -> bytes:
+    remainder = size % tarfile.BLOCKSIZE
+    return b"\0" * (tarfile.BLOCKSIZE - remainder) if remainder else b""
+
+
+def bytes_member(name: str, data: bytes) -> Iterator[bytes]:
+    yield _header(name, len(data))
+    yield data + _padding(len(data))
+
+
+def file_member(name: str, path: str) -> Iterator[bytes]:
+    """Stream a file from disk as a tar member, COPY_CHUNK at a time"""
+    with open(path, "rb") as source:
+        size = os.path.getsize(path)
+        yield _header(name, size)
+        sent = 0
+        while sent < size:
+            chunk = source.read(min(COPY_CHUNK, size - sent))
+            if not chunk:
+                raise BundleError(f"{path} shrank while it was being exported")
+            sent += len(chunk)
+            yield chunk
+        yield _padding(size)
+
+
+def end_of_archive() -> bytes:
+    return b"\0" * (tarfile.BLOCKSIZE * 2)
+
+
+def header_member(deck: dict) -> Iterator[bytes]:
+    data = json.dumps({"format": FORMAT, "version": VERSION, "deck": deck}).encode()
+    return bytes_member("bundle.json", data)
+
+
+def cards_member(part: int, cards: Iterable[dict]) -> Iterator[bytes]:
+    lines = []
+    for card in cards:
+        card = {field: card.get(field) for field in CARD_FIELDS}
+        for field in DATETIME_FIELDS:
+            if isinstance(card[field], datetime):
+                card[field] = card[field].isoformat()
+        lines.append(json.dumps(card))
+    data = ("\n".join(lines) + "\n").encode() if lines else b""
+    return bytes_member(f"cards/{part:06d}.ndjson", data)
+
+
+class _MemberStream:
+    """An image member's stream; a truncated bundle surfaces as BundleError"""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        try:
+            return self.stream.read(size)
+        except tarfile.TarError as e:
+            raise BundleError(f"Corrupt bundle: {e}")
+
+
+def _read_small(stream: BinaryIO, size: int, name: str) -> bytes:
+    if size > MAX_PART_BYTES:
+        raise BundleError(f"{name} is too large")
+    return stream.read()
+
+
+def read_bundle(fileobj: BinaryIO) -> Iterator[Tuple[str, object]]:
+    """Walk a bundle front to back. Yields, in file order:
+        ("deck", dict)              from bundle.json, always first
+        ("image", (name, stream))   stream is valid until the next item
+        ("cards", [dict, ...])      one manifest part, datetimes parsed
+    """
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r|*")
+    except tarfile.TarError:
+        raise BundleError("Upload is not a deck bundle")
+    seen_header = False
+    with archive:
+        try:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                stream = archive.extractfile(info)
+                if not seen_header:
+                    if info.name != "bundle.json":
+                        raise BundleError("Bundle must start with bundle.json")
+                    header = json.loads(_read_small(stream, info.size, info.name))
+                    if header.get("format") != FORMAT or header.get("version") != VERSION:
+                        raise BundleError(f"Unsupported bundle format: {header.get('format')} v{header.get('version')}")
+                    seen_header = True
+                    yield "deck", header.get("deck") or {}
+                elif info.name.startswith("images/"):
+                    yield "image", (posixpath.basename(info.name), _MemberStream(stream))
+                elif info.name.startswith("cards/"):
+                    cards = []
+                    for line in _read_small(stream, info.size, info.name).splitlines():
+                        if not line.strip():
+                            continue
+                        card = json.loads(line)
+                        for field in DATETIME_FIELDS:
+                            if card.get(field):
+                                card[field] = datetime.fromisoformat(card[field])
+                        cards.append({field: card.get(field) for field in CARD_FIELDS})
+                    yield "cards", cards
+        except (tarfile.TarError, json.JSONDecodeError, ValueError) as e:
+            if isinstance(e, BundleError):
+                raise
+            raise BundleError(f"Corrupt bundle: {e}")
+    if not seen_header:
+        raise BundleError("Bundle is empty")
@@ -0,0 +1,224 @@
+"""
+HTTP compression: on-the-fly for API responses, build-time for static assets.
+
+CompressionMiddleware negotiates brotli or gzip from Accept-Encoding and
+compresses text-like responses (JSON, HTML, JS, CSS, SVG) of at least
+minimum_size bytes. A streamed response is held back until minimum_size
+bytes have arrived or it ends, so short streams go out uncompressed too.
+After that it is compressed chunk by chunk and flushed, so clients still
+receive data as it is produced. Images, archives
+and anything that already has a Content-Encoding pass through untouched.
+
+PrecompressedStaticFiles serves the .br/.gz siblings that
+precompress_static.py writes next to the Vite bundle. Those are compressed
+once at maximum level, and no per-request CPU is spent on them.
+
+Brotli needs the optional brotli package; without it only gzip is offered.
+Apart from that this module needs only Starlette, so simple_app.py imports
+it too; Dockerfile.fly copies it next to simple_app.py.
+"""
+
+import os
+import zlib
+from typing import Dict, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip only without it
+    brotli = None
+
+MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6       # Per request; level 9 costs much more CPU for ~2% smaller JSON
+BROTLI_QUALITY = 5   # Per request; 11 is for build-time compression only
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/javascript", "application/xml",
+    "image/svg+xml", "text/",
+)
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def available_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """{"gzip": 1.0, "br": 0.5, ...}; entries with q=0 are kept so they can veto *"""
+    weights = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def choose_encoding(header: str, offered: Iterable[str]) -> Optional[str]:
+    """Best of the offered encodings the client accepts; ties go to offer order"""
+    weights = parse_accept_encoding(header or "")
+    best, best_weight = None, 0.0
+    for coding in offered:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        return self._zlib.compress(data) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), available_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressingResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        self.eligible = False
+        self.encoder: Optional[_Encoder] = None
+        self.started = False
+        self.buffered = bytearray()  # Body held back while deciding whether to compress
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Hold the headers back until the first body chunk shows whether to compress
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            self.eligible = (
+                message["status"] not in (204, 206, 304)
+                and "content-encoding" not in headers
+                and "content-range" not in headers
+                and is_compressible(headers.get("content-type", ""))
+            )
+            if self.eligible:
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.started:
+            if self.encoder is not None:
+                if more_body:
+                    message["body"] = self.encoder.compress(body, flush=True)
+                else:
+                    message["body"] = self.encoder.finish(body)
+            await self.send(message)
+            return
+        if not self.eligible:
+            self.started = True
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        self.buffered += body
+        if more_body and len(self.buffered) < self.minimum_size:
+            return
+        self.started = True
+        body, self.buffered = bytes(self.buffered), bytearray()
+        message = {"type": "http.response.body", "body": body, "more_body": more_body}
+        if len(body) < self.minimum_size:  # Ended before reaching minimum_size
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+        self.encoder = _Encoder(self.encoding)
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        if more_body:
+            del headers["Content-Length"]
+            message["body"] = self.encoder.compress(body, flush=True)
+        else:
+            message["body"] = self.encoder.finish(body)
+            headers["Content-Length"] = str(len(message["body"]))
+        await self.send(self.start_message)
+        await self.send(message)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers build-time foo.js.br / foo.js.gz when accepted"""
+
+    def __init__(self, *args, cache_control: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code != 200 or not isinstance(response, FileResponse):
+            return response
+
+        headers = {"Vary": "Accept-Encoding"}
+        if self.cache_control:
+            headers["Cache-Control"] = self.cache_control
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        offered = [coding for coding, suffix in PRECOMPRESSED_SUFFIXES.items()
+                   if os.path.isfile(response.path + suffix)]
+        encoding = choose_encoding(accept, offered) if offered else None
+        if encoding is None:
+            response.headers.update(headers)
+            return response
+
+        headers["Content-Encoding"] = encoding
+        compressed_path = response.path + PRECOMPRESSED_SUFFIXES[encoding]
+        compressed = FileResponse(
+            compressed_path,
+            media_type=response.media_type,
+            headers=headers,
+            stat_result=os.stat(compressed_path),  # Sets ETag/Last-Modified now, for the 304 check
+        )
+        if self.is_not_modified(compressed.headers, Headers(scope=scope)):
+            return NotModifiedResponse(compressed.headers)
+        return compressed
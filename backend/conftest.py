@@ -0,0 +1,117 @@
+import importlib
+import importlib.util
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from due_queue import DueQueueCache
+
+
+@pytest.fixture(scope="session")
+def app_dir(tmp_path_factory):
+    """Scratch working directory for the app's database and uploads"""
+    return tmp_path_factory.mktemp("app")
+
+
+@pytest.fixture(scope="session")
+def main_module(app_dir):
+    """backend/main.py, imported in app_dir so it creates its database there"""
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    try:
+        return importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def main(main_module, app_dir, monkeypatch):
+    # The SQLite paths are relative, so requests need the app's cwd too
+    monkeypatch.chdir(app_dir)
+    return main_module
+
+
+@pytest.fixture
+def client(main):
+    # Not used as a context manager: the app's lifespan would start
+    # background compaction, and tests compact explicitly
+    client = TestClient(main.app)
+    token = client.post("/login", json={"username": main.VALID_USERNAME, "password": main.VALID_PASSWORD})
+    client.headers["Authorization"] = "Bearer " + token.json()["access_token"]
+    return client
+
+
+@pytest.fixture(scope="session")
+def simple_app_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("simple_app")
+
+
+@pytest.fixture(scope="session")
+def simple_app_module(simple_app_dir):
+    """simple_app.py from the repository root, imported in simple_app_dir"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simple_app.py")
+    cwd = os.getcwd()
+    os.chdir(simple_app_dir)
+    try:
+        spec = importlib.util.spec_from_file_location("simple_app", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def simple_app(simple_app_module, simple_app_dir, monkeypatch):
+    monkeypatch.chdir(simple_app_dir)
+    return simple_app_module
+
+
+@pytest.fixture
+def simple_client(simple_app):
+    client = TestClient(simple_app.app)
+    token = client.post("/login", data={"username": simple_app.VALID_USERNAME, "password": simple_app.VALID_PASSWORD})
+    client.headers["Authorization"] = "Bearer " + token.json()["access_token"]
+    return client
+
+
+@pytest.fixture
+def due_queues(main, monkeypatch):
+    """A fresh, enabled due-queue cache in place of main.due_queues"""
+    due_queues = DueQueueCache(enabled=True)
+    monkeypatch.setattr(main, "due_queues", due_queues)
+    return due_queues
+
+
+@pytest.fixture
+def db(main):
+    with main.SessionLocal() as session:
+        yield session
+
+
+def jpeg(color="gray") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_deck(client):
+    def make_deck(cards=(), name="Team"):
+        """A new deck with one card per (person_name, person_role); returns (deck_id, card_ids)"""
+        deck_id = client.post("/decks", json={"name": name}).json()["id"]
+        card_ids = []
+        for person_name, person_role in cards:
+            response = client.post(
+                "/cards",
+                data={"deck_id": deck_id, "person_name": person_name, "person_role": person_role},
+                files={"image": ("card.jpg", jpeg(), "image/jpeg")},
+            )
+            assert response.status_code == 200, response.text
+            card_ids.append(response.json()["id"])
+        return deck_id, card_ids
+    return make_deck
+
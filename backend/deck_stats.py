@@ -0,0 +1,236 @@
+"""
+Materialized per-deck statistics, kept current by triggers on flashcards.
+
+Three small tables hold everything GET /decks/{deck_id}/stats returns, and
+the card counts GET /decks lists:
+- deck_stats: cards and total reviews (sum of review_count) per deck
+- deck_difficulty_counts: reviewed cards per deck and their last rating
+- deck_due_counts: cards per deck and UTC day of next_review
+
+Like the search index, the tables are maintained by SQLite triggers, so
+every write path updates them incrementally in the same transaction. That
+includes bulk uploads, imports, review log compaction, catch-up
+rescheduling, deletes and raw SQL. Reading a deck's stats touches a
+handful of rows by primary key instead of scanning flashcards. Reviews
+reach the tables when the review log is compacted (see review_log.py);
+until then read() is passed the cards they changed and adjusts for them.
+
+Cards that were never reviewed have no rating yet. They are left out of
+the difficulty counts and the mean, and reported as unreviewed.
+
+install() recreates triggers whose definition changed and then rebuilds
+the tables. rebuild() recomputes the tables from flashcards, for
+databases that were changed with triggers missing:
+    python deck_stats.py [path/to/flashcards.db]
+"""
+
+import sys
+from datetime import date, timedelta
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import column, table, text
+
+# For joining deck_stats into ORM queries, e.g. card counts when listing decks
+STATS = table("deck_stats", column("deck_id"), column("card_count"), column("review_total"))
+
+# NULL difficulty is treated as the column default, 1
+_DIFFICULTY = "coalesce({row}.difficulty, 1)"
+_REVIEWED = "coalesce({row}.review_count, 0) > 0"
+
+_TABLES = [
+    """CREATE TABLE deck_stats (
+        deck_id INTEGER PRIMARY KEY,
+        card_count INTEGER NOT NULL,
+        review_total INTEGER NOT NULL
+    )""",
+    """CREATE TABLE deck_difficulty_counts (
+        deck_id INTEGER NOT NULL,
+        difficulty INTEGER NOT NULL,
+        card_count INTEGER NOT NULL,
+        PRIMARY KEY (deck_id, difficulty)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE deck_due_counts (
+        deck_id INTEGER NOT NULL,
+        due_day TEXT NOT NULL,
+        card_count INTEGER NOT NULL,
+        PRIMARY KEY (deck_id, due_day)
+    ) WITHOUT ROWID""",
+]
+
+
+def _add(row: str) -> str:
+    """Statements counting one card (new or old) into the tables"""
+    difficulty = _DIFFICULTY.format(row=row)
+    return f"""
+        INSERT INTO deck_stats (deck_id, card_count, review_total)
+        VALUES ({row}.deck_id, 1, coalesce({row}.review_count, 0))
+        ON CONFLICT (deck_id) DO UPDATE SET
+            card_count = card_count + 1, review_total = review_total + excluded.review_total;
+        INSERT INTO deck_difficulty_counts (deck_id, difficulty, card_count)
+        SELECT {row}.deck_id, {difficulty}, 1 WHERE {_REVIEWED.format(row=row)}
+        ON CONFLICT (deck_id, difficulty) DO UPDATE SET card_count = card_count + 1;
+        INSERT INTO deck_due_counts (deck_id, due_day, card_count)
+        SELECT {row}.deck_id, date({row}.next_review), 1 WHERE {row}.next_review IS NOT NULL
+        ON CONFLICT (deck_id, due_day) DO UPDATE SET card_count = card_count + 1;
+    """
+
+
+def _remove(row: str) -> str:
+    """Statements taking one card out of the tables; empty buckets are dropped"""
+    difficulty = _DIFFICULTY.format(row=row)
+    return f"""
+        UPDATE deck_stats SET
+            card_count = card_count - 1, review_total = review_total - coalesce({row}.review_count, 0)
+        WHERE deck_id = {row}.deck_id;
+        UPDATE deck_difficulty_counts SET card_count = card_count - 1
+        WHERE deck_id = {row}.deck_id AND difficulty = {difficulty} AND {_REVIEWED.format(row=row)};
+        DELETE FROM deck_difficulty_counts
+        WHERE deck_id = {row}.deck_id AND difficulty = {difficulty} AND card_count <= 0;
+        UPDATE deck_due_counts SET card_count = card_count - 1
+        WHERE deck_id = {row}.deck_id AND due_day = date({row}.next_review);
+        DELETE FROM deck_due_counts
+        WHERE deck_id = {row}.deck_id AND due_day = date({row}.next_review) AND card_count <= 0;
+    """
+
+
+# An update is counted as removing the old card and adding the new one. The
+# WHEN clause skips updates that change nothing the stats depend on, such as
+# edits to names or images. install() compares these with the definitions
+# SQLite stored, so they are created without IF NOT EXISTS.
+_TRIGGERS = {
+    "deck_stats_insert": f"""CREATE TRIGGER deck_stats_insert AFTER INSERT ON flashcards BEGIN
+        {_add("new")}
+    END""",
+    "deck_stats_delete": f"""CREATE TRIGGER deck_stats_delete AFTER DELETE ON flashcards BEGIN
+        {_remove("old")}
+    END""",
+    "deck_stats_update": f"""CREATE TRIGGER deck_stats_update
+    AFTER UPDATE OF deck_id, difficulty, review_count, next_review ON flashcards
+    WHEN old.deck_id IS NOT new.deck_id
+        OR {_DIFFICULTY.format(row="old")} IS NOT {_DIFFICULTY.format(row="new")}
+        OR coalesce(old.review_count, 0) IS NOT coalesce(new.review_count, 0)
+        OR date(old.next_review) IS NOT date(new.next_review)
+    BEGIN
+        {_remove("old")}
+        {_add("new")}
+    END""",
+    "deck_stats_deck_delete": """CREATE TRIGGER deck_stats_deck_delete AFTER DELETE ON decks BEGIN
+        DELETE FROM deck_stats WHERE deck_id = old.id;
+        DELETE FROM deck_difficulty_counts WHERE deck_id = old.id;
+        DELETE FROM deck_due_counts WHERE deck_id = old.id;
+    END""",
+}
+
+_REBUILD = [
+    "DELETE FROM deck_stats",
+    "DELETE FROM deck_difficulty_counts",
+    "DELETE FROM deck_due_counts",
+    """INSERT INTO deck_stats (deck_id, card_count, review_total)
+    SELECT deck_id, count(*), coalesce(sum(review_count), 0) FROM flashcards GROUP BY deck_id""",
+    f"""INSERT INTO deck_difficulty_counts (deck_id, difficulty, card_count)
+    SELECT deck_id, {_DIFFICULTY.format(row="flashcards")}, count(*) FROM flashcards
+    WHERE {_REVIEWED.format(row="flashcards")} GROUP BY 1, 2""",
+    """INSERT INTO deck_due_counts (deck_id, due_day, card_count)
+    SELECT deck_id, date(next_review), count(*) FROM flashcards
+    WHERE next_review IS NOT NULL GROUP BY 1, 2""",
+]
+
+
+def install(conn):
+    """Create the tables and triggers if missing, and replace triggers from an
+    older version. New tables, or tables an older trigger maintained, are
+    refilled from the flashcards rows."""
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'deck_stats'"
+    ).first()
+    if exists is None:
+        for statement in _TABLES:
+            conn.exec_driver_sql(statement)
+    installed = dict(conn.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'deck_stats_%'"
+    ).all())
+    changed = [name for name, statement in _TRIGGERS.items() if installed.get(name) != statement]
+    for name in changed:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(_TRIGGERS[name])
+    if exists is None or changed:
+        rebuild(conn)
+
+
+def rebuild(conn):
+    """Recompute every deck's stats from flashcards"""
+    for statement in _REBUILD:
+        conn.exec_driver_sql(statement)
+
+
+def read(db, deck_id: int, today: date, days: int, changes: Iterable[Tuple[dict, dict]] = ()) -> Optional[dict]:
+    """A deck's stats, with due counts for today and the following days.
+    Cards due before today are overdue and also count as due today.
+    changes: (stored, current) column values of cards whose flashcards rows
+    are stale, with difficulty, review_count and next_review.
+    mean_difficulty is over reviewed cards only, None if there are none.
+    Returns None for a deck without cards."""
+    params = {"deck_id": deck_id, "today": today.isoformat(), "horizon": (today + timedelta(days=days)).isoformat()}
+    totals = db.execute(text(
+        "SELECT card_count, review_total FROM deck_stats WHERE deck_id = :deck_id"
+    ), params).first()
+    if totals is None or totals.card_count <= 0:
+        return None
+
+    histogram = dict(db.execute(text(
+        "SELECT difficulty, card_count FROM deck_difficulty_counts WHERE deck_id = :deck_id ORDER BY difficulty"
+    ), params).all())
+    overdue = db.execute(text(
+        "SELECT coalesce(sum(card_count), 0) FROM deck_due_counts WHERE deck_id = :deck_id AND due_day < :today"
+    ), params).scalar()
+    upcoming = dict(db.execute(text(
+        "SELECT due_day, card_count FROM deck_due_counts"
+        " WHERE deck_id = :deck_id AND due_day >= :today AND due_day < :horizon"
+    ), params).all())
+
+    review_total = totals.review_total
+    for stored, current in changes:
+        for card, sign in ((stored, -1), (current, 1)):
+            review_total += sign * (card["review_count"] or 0)
+            if card["review_count"]:
+                difficulty = card["difficulty"] or 1
+                histogram[difficulty] = histogram.get(difficulty, 0) + sign
+            if card["next_review"] is None:
+                continue
+            day = card["next_review"].date().isoformat()
+            if day < params["today"]:
+                overdue += sign
+            elif day < params["horizon"]:
+                upcoming[day] = upcoming.get(day, 0) + sign
+    histogram = {difficulty: n for difficulty, n in sorted(histogram.items()) if n > 0}
+
+    due_by_day = [
+        {"day": day, "due": upcoming.get(day.isoformat(), 0)}
+        for day in (today + timedelta(days=offset) for offset in range(days))
+    ]
+    reviewed = sum(histogram.values())
+    return {
+        "card_count": totals.card_count,
+        "review_total": review_total,
+        "unreviewed": totals.card_count - reviewed,
+        "mean_difficulty": sum(d * n for d, n in histogram.items()) / reviewed if reviewed else None,
+        "difficulty_histogram": histogram,
+        "overdue": overdue,
+        "due_today": overdue + upcoming.get(params["today"], 0),
+        "due_by_day": due_by_day,
+    }
+
+
+def main(path: str):
+    from sqlalchemy import create_engine
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        install(conn)
+        rebuild(conn)
+        decks = conn.exec_driver_sql("SELECT count(*), coalesce(sum(card_count), 0) FROM deck_stats").first()
+    print(f"Rebuilt stats for {decks[0]} decks ({decks[1]} cards)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "flashcards.db")
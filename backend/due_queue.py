@@ -0,0 +1,104 @@
+"""
+In-process due queues for study sessions.
+
+Each deck gets a heap of (next_review, card_id), warmed from the database on
+first use, plus a snapshot of every card so the study endpoint can answer
+without a query. Reviews update the queue in O(log n) after they have been
+written to SQLite; adding or deleting cards drops the deck's queue so it is
+rebuilt on the next request. A deck is loaded without holding the lock, and
+the result is only cached if no card changed while it was loading.
+
+The queues live in one process. With several uvicorn workers, a review
+handled by another worker is not seen here, so the cache is opt-in
+(DUE_QUEUE_CACHE=1).
+"""
+
+import heapq
+import threading
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+
+class DeckDueQueue:
+    def __init__(self, cards: Iterable):
+        self.cards = {card.id: card for card in cards}
+        self.heap = [(card.next_review, card.id) for card in self.cards.values() if card.next_review is not None]
+        heapq.heapify(self.heap)
+
+    def due(self, now: datetime, limit: int) -> List:
+        """Up to limit cards with next_review <= now, most overdue first"""
+        result = []
+        popped = []
+        while self.heap and len(result) < limit:
+            entry = heapq.heappop(self.heap)
+            next_review, card_id = entry
+            card = self.cards.get(card_id)
+            if card is None or card.next_review != next_review:
+                continue  # Superseded by a later review; drop it for good
+            popped.append(entry)
+            if next_review > now:
+                break
+            result.append(card)
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return result
+
+    def update(self, card_id: int, fields: dict):
+        card = self.cards.get(card_id)
+        if card is None:
+            return
+        card = card.model_copy(update=fields)
+        self.cards[card_id] = card
+        if card.next_review is not None:
+            heapq.heappush(self.heap, (card.next_review, card_id))
+        # Stale entries are skipped lazily; rebuild once they dominate
+        if len(self.heap) > 2 * len(self.cards) + 64:
+            self.heap = [(c.next_review, c.id) for c in self.cards.values() if c.next_review is not None]
+            heapq.heapify(self.heap)
+
+
+class DueQueueCache:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._decks: Dict[int, DeckDueQueue] = {}
+        self._deck_of: Dict[int, int] = {}  # card_id -> deck_id for warm decks
+        self._version = 0  # Bumped by changes to cards of cold decks
+        self._lock = threading.Lock()
+
+    async def due_cards(self, deck_id: int, now: datetime, limit: int,
+                        load: Callable[[], Awaitable[Iterable]]) -> List:
+        """Due cards for a deck; load() supplies card snapshots when the deck is cold"""
+        with self._lock:
+            queue = self._decks.get(deck_id)
+            if queue is not None:
+                return queue.due(now, limit)
+            version = self._version
+
+        queue = DeckDueQueue(await load())
+        with self._lock:
+            if self._version == version and deck_id not in self._decks:
+                self._decks[deck_id] = queue
+                for card_id in queue.cards:
+                    self._deck_of[card_id] = deck_id
+            return queue.due(now, limit)
+
+    def update_card(self, card_id: int, **fields):
+        """Write-through hook: call after the new values are committed"""
+        with self._lock:
+            deck_id = self._deck_of.get(card_id)
+            if deck_id is not None:
+                self._decks[deck_id].update(card_id, fields)
+            else:
+                self._version += 1  # A deck being loaded right now may have the old values
+
+    def invalidate(self, deck_id: int):
+        with self._lock:
+            self._version += 1
+            queue = self._decks.pop(deck_id, None)
+            if queue is not None:
+                for card_id in queue.cards:
+                    self._deck_of.pop(card_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._deck_of)
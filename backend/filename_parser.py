@@ -0,0 +1,84 @@
+"""
+Name and role parsing for uploaded photo filenames.
+
+Supported formats:
+    "John Doe - Software Engineer.jpg"  -> ("John Doe", "Software Engineer")
+    "Jane_Smith_Marketing_Manager.png"  -> ("Jane Smith", "Marketing Manager")
+    "Bob_Wilson_Sales.jpg"              -> ("Bob Wilson", "Sales")
+    "Sarah_Davis.png"                   -> ("Sarah", "Davis")
+    "Mike Thompson.jpg"                 -> ("Mike Thompson", "Team Member")
+
+With underscores, four or more parts give a two-word role and three parts
+give a one-word role. All patterns are compiled once at import. Parsing
+only looks at the name, so whole batches can be checked before any image
+bytes are read.
+
+filename_error() decides which files become cards, for the upload previews
+and every upload path in both apps. simple_app.py imports this module too;
+Dockerfile.fly copies it next to simple_app.py.
+"""
+
+import re
+from typing import NamedTuple, Optional, Tuple
+
+DEFAULT_ROLE = "Team Member"
+IMAGE_EXTENSIONS = frozenset({
+    "jpg", "jpeg", "png", "gif", "webp", "bmp", "tif", "tiff", "heic", "heif", "avif",
+})
+
+_EXTENSION = re.compile(r"\.([^.]*)\Z")
+_DASH = re.compile(r"(?P<name>.*?) - (?P<role>.*)", re.DOTALL)
+_UNDERSCORE = (
+    # Checked in order: 4+ parts, exactly 3, exactly 2
+    re.compile(r"(?P<name>[^_]*_.*)_(?P<role>[^_]*_[^_]*)", re.DOTALL),
+    re.compile(r"(?P<name>[^_]*_[^_]*)_(?P<role>[^_]*)", re.DOTALL),
+    re.compile(r"(?P<name>[^_]*)_(?P<role>[^_]*)", re.DOTALL),
+)
+
+
+class ParsedFilename(NamedTuple):
+    person_name: str
+    person_role: str
+    extension: str  # Lowercased, without the dot; "" if there is none
+
+
+def split_extension(filename: str) -> Tuple[str, str]:
+    match = _EXTENSION.search(filename)
+    if match is None:
+        return filename, ""
+    return filename[:match.start()], match.group(1).lower()
+
+
+def parse(filename: str) -> ParsedFilename:
+    stem, extension = split_extension(filename)
+
+    match = _DASH.fullmatch(stem)
+    if match is not None:
+        return ParsedFilename(match.group("name").strip(), match.group("role").strip(), extension)
+
+    if "_" in stem:
+        for pattern in _UNDERSCORE:
+            match = pattern.fullmatch(stem)
+            if match is not None:
+                return ParsedFilename(
+                    match.group("name").replace("_", " ").strip(),
+                    match.group("role").replace("_", " ").strip(),
+                    extension,
+                )
+
+    return ParsedFilename(stem.strip(), DEFAULT_ROLE, extension)
+
+
+def parse_filename(filename: str) -> Tuple[str, str]:
+    """Extract (person_name, person_role) from an upload filename"""
+    parsed = parse(filename)
+    return parsed.person_name, parsed.person_role
+
+
+def filename_error(parsed: ParsedFilename, filename: str) -> Optional[str]:
+    """Why a parsed filename can't become a card, or None if it can"""
+    if parsed.extension not in IMAGE_EXTENSIONS:
+        return f"File {filename} is not an image"
+    if not parsed.person_name:
+        return f"Could not parse name from filename: {filename}"
+    return None
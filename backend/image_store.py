@@ -0,0 +1,102 @@
+"""
+Content-addressed storage for uploaded card images.
+
+Each image is hashed while it streams to disk and stored once as
+<sha256>.<ext>, so re-uploading the same photo reuses the existing file.
+Files are removed again once no flashcard references them.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import Counter
+from typing import Iterable, List, NamedTuple
+
+CHUNK_SIZE = 1024 * 1024  # Bytes read and hashed per step
+DEFAULT_EXTENSION = "jpg"
+EXTENSION_ALIASES = {"jpeg": "jpg", "jpe": "jpg", "tif": "tiff"}
+
+
+class StoredImage(NamedTuple):
+    filename: str       # <sha256>.<ext>, what flashcards reference
+    size: int           # Bytes received
+    deduplicated: bool  # True if an identical image was already stored
+
+
+def normalize_extension(filename: str) -> str:
+    """Lower-cased, alias-folded extension; falls back to jpg for anything odd"""
+    extension = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    extension = EXTENSION_ALIASES.get(extension, extension)
+    if not extension or not extension.isalnum() or len(extension) > 5:
+        return DEFAULT_EXTENSION
+    return extension
+
+
+class ImageStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # Images saved but not yet committed to a flashcard row; the
+        # collector must not remove them in that window
+        self._pinned = Counter()
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.root, filename)
+
+    def save(self, source, original_filename: str) -> StoredImage:
+        """Stream a file object into the store. Blocking; call from a worker thread.
+        The result is pinned until unpin() is called with its filename."""
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = self.path(f".upload-{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, "wb") as buffer:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    buffer.write(chunk)
+                    size += len(chunk)
+
+            filename = f"{digest.hexdigest()}.{normalize_extension(original_filename)}"
+            with self._lock:
+                self._pinned[filename] += 1
+                deduplicated = os.path.exists(self.path(filename))
+                if deduplicated:
+                    os.remove(temp_path)
+                else:
+                    os.replace(temp_path, self.path(filename))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return StoredImage(filename, size, deduplicated)
+
+    def unpin(self, filenames: Iterable[str]):
+        with self._lock:
+            for filename in filenames:
+                self._pinned[filename] -= 1
+                if self._pinned[filename] <= 0:
+                    del self._pinned[filename]
+
+    def collect(self, candidates: Iterable[str], still_referenced: Iterable[str]) -> List[str]:
+        """Remove candidate files that no flashcard references any more.
+        Returns the filenames that were deleted."""
+        referenced = set(still_referenced)
+        removed = []
+        with self._lock:
+            for filename in set(candidates) - referenced:
+                if not filename or filename in self._pinned:
+                    continue
+                file_path = self.path(filename)
+                # Only touch files directly inside the store
+                if os.path.dirname(os.path.abspath(file_path)) != os.path.abspath(self.root):
+                    continue
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    removed.append(filename)
+        return removed
@@ -0,0 +1,101 @@
+"""
+Resized, recompressed variants of card images.
+
+Variants are generated lazily the first time a width is requested and cached
+on disk under <uploads>/variants/w<width>/, so a study session loads small
+JPEGs instead of full-size phone photos. Pillow is optional: without it the
+original image is served unchanged.
+"""
+
+import os
+import uuid
+from typing import Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+# Requested widths are rounded up to one of these so the cache stays small
+VARIANT_WIDTHS = (64, 128, 200, 400, 800)
+THUMBNAIL_WIDTH = 400  # 2x the 200px the study UIs display
+JPEG_QUALITY = 80
+
+
+def variant_width(requested: int) -> int:
+    """Smallest configured width that covers the requested one"""
+    for width in VARIANT_WIDTHS:
+        if requested <= width:
+            return width
+    return VARIANT_WIDTHS[-1]
+
+
+def variant_url(filename: Optional[str], width: int = THUMBNAIL_WIDTH) -> Optional[str]:
+    if not filename:
+        return None
+    return f"/images/{filename}?w={width}"
+
+
+class VariantCache:
+    def __init__(self, root: str):
+        self.root = os.path.join(root, "variants")
+
+    def _variant_name(self, filename: str, has_alpha: bool) -> str:
+        stem = filename.rsplit(".", 1)[0]
+        return f"{stem}.png" if has_alpha else f"{stem}.jpg"
+
+    def _existing(self, filename: str, width: int) -> Optional[str]:
+        directory = os.path.join(self.root, f"w{width}")
+        for has_alpha in (False, True):
+            candidate = os.path.join(directory, self._variant_name(filename, has_alpha))
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def get(self, original_path: str, filename: str, width: int) -> str:
+        """Path of the variant for a stored image, creating it if needed.
+        Falls back to the original when it is already small enough or cannot
+        be decoded. Blocking; call from a worker thread."""
+        width = variant_width(width)
+        cached = self._existing(filename, width)
+        if cached:
+            return cached
+        if Image is None:
+            return original_path
+
+        try:
+            with Image.open(original_path) as image:
+                image = ImageOps.exif_transpose(image)
+                if image.width <= width:
+                    return original_path
+
+                height = max(1, round(image.height * width / image.width))
+                has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+                resized = image.convert("RGBA" if has_alpha else "RGB").resize((width, height), Image.LANCZOS)
+
+                directory = os.path.join(self.root, f"w{width}")
+                os.makedirs(directory, exist_ok=True)
+                variant_path = os.path.join(directory, self._variant_name(filename, has_alpha))
+                temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+                try:
+                    if has_alpha:
+                        resized.save(temp_path, format="PNG", optimize=True)
+                    else:
+                        resized.save(temp_path, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                    os.replace(temp_path, variant_path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                return variant_path
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return original_path
+
+    def discard(self, filename: str):
+        """Remove every cached variant of an image"""
+        if not os.path.isdir(self.root):
+            return
+        for directory in os.listdir(self.root):
+            for has_alpha in (False, True):
+                path = os.path.join(self.root, directory, self._variant_name(filename, has_alpha))
+                if os.path.exists(path):
+                    os.remove(path)
@@ -1,20 +1,43 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, status
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Query, Request, Response, status, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, inspect, select, insert, delete, Column, Integer, Float, String, DateTime, Boolean, Text, Index, func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from pydantic import BaseModel
-from datetime import datetime, timedelta
-from typing import List, Optional
+from sqlalchemy.orm import aliased, sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from pydantic import BaseModel, Field, computed_field
+import numpy as np
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import asyncio
+from contextlib import asynccontextmanager
+import json
+import logging
 import os
-import uuid
-import shutil
+import random
 import hashlib
 import secrets
 
+from image_store import ImageStore, StoredImage
+from image_variants import VariantCache, variant_url, variant_width
+from token_store import create_token_store
+from scheduling import DEFAULT_EASE, schedule_batch, schedule_card, to_datetimes
+from rescheduling import RescheduleJobs, run_catch_up
+from due_queue import DueQueueCache
+from quiz import QuizIndexCache
+import search
+import review_log
+import deck_stats
+from filename_parser import filename_error, parse
+from archives import ArchiveError, LimitedReader, MAX_MEMBER_BYTES, iter_members, too_large
+import bundles
+from compression import CompressionMiddleware, PrecompressedStaticFiles
+from metrics import MetricsMiddleware, MetricsRegistry, SamplingProfiler, instrument_engine
+
 # Authentication configuration
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
@@ -24,16 +47,46 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 VALID_USERNAME = "dave"
 VALID_PASSWORD = "india"
 
-# Simple token storage (in production, use Redis or database)
-active_tokens = set()
+# Token storage with expiry. TOKEN_STORE=sqlite shares logins between
+# uvicorn workers through an access_tokens table in the database file.
+active_tokens = create_token_store(
+    os.getenv("TOKEN_STORE", "memory"),
+    path="flashcards.db",
+    max_tokens=int(os.getenv("MAX_ACTIVE_TOKENS", "10000")),
+)
 
 # Simple authentication
 security = HTTPBearer()
 
 # Database setup
+# Request handlers use the async engine: statements run on aiosqlite's
+# connection threads and are awaited, so a slow commit never holds the event
+# loop. The sync engine serves migrations and work that already runs on a
+# worker thread (streamed responses, archive/bundle imports, reschedule jobs).
 SQLALCHEMY_DATABASE_URL = "sqlite:///./flashcards.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./flashcards.db"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,  # aiosqlite defaults to NullPool: a new thread and connection per request
+    pool_size=DB_POOL_SIZE,
+    connect_args={"timeout": 30},  # Wait on a busy writer instead of failing after 5 s
+)
+# expire_on_commit=False: reading an expired attribute would be a lazy load,
+# which an AsyncSession cannot do implicitly
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets /decks and /study read while a bulk import is committing
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Durable enough with WAL, far fewer fsyncs
+    cursor.close()
+
 Base = declarative_base()
 
 # Database Models
@@ -54,19 +107,94 @@ class Flashcard(Base):
     back = Column(Text)   # This will store JSON with name, role, and other info
     person_name = Column(String)  # Person's name
     person_role = Column(String)  # Person's role in organization
-    image_filename = Column(String)  # Image file path
+    image_filename = Column(String, index=True)  # <sha256>.<ext> in the image store
     difficulty = Column(Integer, default=1)  # 1-5 scale
     last_reviewed = Column(DateTime)
     next_review = Column(DateTime)
     review_count = Column(Integer, default=0)
+    ease = Column(Float, default=DEFAULT_EASE)  # SM-2 ease factor
+    interval_days = Column(Float)  # Days between the last two reviews
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Due-queue lookups: cards in a deck ordered by next_review
+        Index("ix_flashcards_deck_next_review", "deck_id", "next_review"),
+    )
+
+class Review(Base):
+    """One row per review, never updated (see review_log.py)"""
+    __tablename__ = "reviews"
+
+    id = Column(Integer, primary_key=True)
+    card_id = Column(Integer, nullable=False)
+    deck_id = Column(Integer, nullable=False)
+    reviewed_at = Column(DateTime, nullable=False)
+    difficulty = Column(Integer, nullable=False)  # Rating given, 1-5
+    # Card state after this review; compaction copies it to flashcards
+    review_count = Column(Integer, nullable=False)
+    ease = Column(Float, nullable=False)
+    interval_days = Column(Float, nullable=False)
+    next_review = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # A card's history, and its newest review when compacting
+        Index("ix_reviews_card_id", "card_id", "id"),
+        {"sqlite_autoincrement": True},  # Ids never reused, so the compaction watermark stays valid
+    )
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# Lightweight migrations for flashcards.db files created by older versions.
+# create_all() skips tables that already exist, so columns and indexes added
+# to an existing model afterwards have to be created explicitly. New columns
+# must be nullable; code treats NULL as the column's default.
+def run_migrations():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        # Ratings were not range-checked before; responses now require 1-5
+        for table in ("flashcards", "reviews"):
+            conn.exec_driver_sql(
+                f"UPDATE {table} SET difficulty = min(max(difficulty, 1), 5) WHERE difficulty NOT BETWEEN 1 AND 5"
+            )
+        search.install(conn)
+        review_log.install(conn)
+        deck_stats.install(conn)
+
+run_migrations()
+
+# Optional in-process due queues for /study (see due_queue.py)
+due_queues = DueQueueCache(enabled=os.getenv("DUE_QUEUE_CACHE", "0") == "1")
+
+# Per-deck name/role indexes for quiz distractors (see quiz.py)
+quiz_index = QuizIndexCache()
+QUIZ_MAX_DISTRACTORS = 10
+
+# Background catch-up jobs for overdue backlogs (see rescheduling.py)
+reschedule_jobs = RescheduleJobs()
+DEFAULT_DAILY_REVIEW_CAP = 50
+
+# Reviews are appended to a log and folded into flashcards in bulk (see review_log.py)
+REVIEW_COMPACT_SECONDS = float(os.getenv("REVIEW_COMPACT_SECONDS", "5"))
+logger = logging.getLogger(__name__)
+
 # Create uploads directory
 UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+image_store = ImageStore(UPLOAD_DIR)
+image_variants = VariantCache(UPLOAD_DIR)
+
+# Bulk upload tuning
+BULK_UPLOAD_CONCURRENCY = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "4"))
+ARCHIVE_BATCH_SIZE = 200  # Cards per transaction for archive imports
+MAX_REPORTED_ERRORS = 100  # Per-file errors listed in an archive import response
 
 # Authentication models
 class LoginRequest(BaseModel):
@@ -81,7 +209,8 @@ class Token(BaseModel):
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     # Simple token generation using secrets
     token = secrets.token_urlsafe(32)
-    active_tokens.add(token)
+    expires_delta = expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    active_tokens.add(token, expires_delta.total_seconds())
     return token
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -91,12 +220,27 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    if credentials.credentials not in active_tokens:
+    if not active_tokens.is_valid(credentials.credentials):
         raise credentials_exception
     
     return VALID_USERNAME
 
 # Pydantic models
+class DueDay(BaseModel):
+    day: date
+    due: int
+
+class DeckStatsResponse(BaseModel):
+    deck_id: int
+    card_count: int = 0
+    review_total: int = 0  # Reviews of the deck's current cards
+    unreviewed: int = 0  # Cards never reviewed, left out of the difficulty fields
+    mean_difficulty: Optional[float] = None  # Over reviewed cards
+    difficulty_histogram: Dict[int, int] = {}  # Rating -> reviewed cards whose last rating it was
+    overdue: int = 0  # Due before today (UTC)
+    due_today: int = 0  # Including overdue
+    due_by_day: List[DueDay] = []
+
 class DeckCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -123,24 +267,131 @@ class FlashcardResponse(BaseModel):
     person_name: str
     person_role: str
     image_filename: Optional[str]
-    difficulty: int
+    difficulty: int = Field(ge=1, le=5)
     last_reviewed: Optional[datetime]
     next_review: Optional[datetime]
     review_count: int
 
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        """Resized image sized for the study view"""
+        return variant_url(self.image_filename)
+
+class SearchHit(BaseModel):
+    id: int
+    deck_id: int
+    deck_name: Optional[str]
+    person_name: str
+    person_role: str
+    image_filename: Optional[str]
+    rank: float  # bm25 score; lower is a better match
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        return variant_url(self.image_filename)
+
+class ReviewRecord(BaseModel):
+    card_id: int
+    difficulty: int = Field(ge=1, le=5)  # 1 (hard) to 5 (easy)
+    reviewed_at: Optional[datetime] = None  # When the card was studied; defaults to now
+
+class BatchReviewRequest(BaseModel):
+    reviews: List[ReviewRecord]
+
+class BatchReviewResult(BaseModel):
+    card_id: int
+    status: str  # "reviewed", "stale" (not newer than the card's last review) or "not_found"
+    review_count: Optional[int] = None
+    next_review: Optional[datetime] = None
+
+class BulkUploadFileResult(BaseModel):
+    filename: str
+    status: str  # "created" or "error"
+    card_id: Optional[int] = None
+    bytes_written: int = 0
+    deduplicated: bool = False  # Identical image was already stored
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    created: List[FlashcardResponse]
+    files: List[BulkUploadFileResult]
+    created_count: int
+    error_count: int
+
+class ArchiveImportResponse(BaseModel):
+    created_count: int
+    deduplicated_count: int  # Created cards whose image was already stored
+    error_count: int
+    errors: List[BulkUploadFileResult]  # The first MAX_REPORTED_ERRORS failures
+
+class DeckImportResponse(BaseModel):
+    deck: DeckResponse
+    image_count: int
+
+MAX_PREVIEW_FILENAMES = 20000
+
+class BulkPreviewRequest(BaseModel):
+    deck_id: int
+    filenames: List[str] = Field(..., max_length=MAX_PREVIEW_FILENAMES)
+
+class BulkPreviewFile(BaseModel):
+    filename: str
+    status: str  # "ok" or "error"
+    person_name: Optional[str] = None
+    person_role: Optional[str] = None
+    error: Optional[str] = None
+    warnings: List[str] = []
+
+class BulkPreviewResponse(BaseModel):
+    files: List[BulkPreviewFile]
+    valid_count: int
+    error_count: int
+
 class ReviewResult(BaseModel):
     card_id: int
-    difficulty: int  # 1 (hard) to 5 (easy)
+    difficulty: int = Field(ge=1, le=5)  # 1 (hard) to 5 (easy)
+
+class QuizQuestion(BaseModel):
+    card: FlashcardResponse
+    options: List[str]  # Names to pick from, card.person_name among them
+
+class ReviewEventResponse(BaseModel):
+    id: int
+    reviewed_at: datetime
+    difficulty: int = Field(ge=1, le=5)
+    review_count: int
+    ease: float
+    interval_days: float
+    next_review: datetime
 
 # FastAPI app
-app = FastAPI(title="Flashcard API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background review log compaction (see compact_review_log)
+    compaction = asyncio.create_task(compact_review_log())
+    try:
+        yield
+    finally:
+        compaction.cancel()
+        await async_engine.dispose()
+
+app = FastAPI(title="Flashcard API", version="1.0.0", lifespan=lifespan)
 
 # Mount static files for image serving
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
-# Check if we're in production and serve frontend static files
+# Check if we're in production and serve frontend static files. Vite bundles
+# have content-hashed names, so /assets can be cached forever; .br/.gz copies
+# from precompress_static.py are served when the browser accepts them.
 if os.path.exists("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    if os.path.isdir("static/assets"):
+        app.mount("/assets", PrecompressedStaticFiles(
+            directory="static/assets",
+            cache_control="public, max-age=31536000, immutable"
+        ), name="assets")
+    app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # CORS middleware
 origins = [
@@ -156,39 +407,236 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# brotli/gzip for JSON and other text responses of at least 1 KB (see compression.py)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")))
+
+# Request metrics for /metrics, and an optional sampling profiler for one
+# route (PROFILE_ROUTE=/decks/{deck_id}/study) read from /debug/profile.
+# Added last so it is outermost and times the whole request.
+metrics = MetricsRegistry()
+instrument_engine(engine, metrics)
+instrument_engine(async_engine.sync_engine, metrics)
+metrics.gauge("active_tokens", "Unexpired access tokens in the token store", lambda: len(active_tokens))
+metrics.gauge("due_queue_cards", "Cards held by the in-process due queues", lambda: len(due_queues))
+metrics.gauge("quiz_index_decks", "Decks with a cached quiz distractor index", lambda: len(quiz_index))
+metrics.gauge("reschedule_jobs", "Catch-up jobs held in the job registry", lambda: len(reschedule_jobs))
+profiler = SamplingProfiler(
+    os.environ["PROFILE_ROUTE"], interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+) if os.getenv("PROFILE_ROUTE") else None
+app.add_middleware(MetricsMiddleware, registry=metrics, profiler=profiler)
+
 # Dependency to get DB session
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def compact_review_log():
+    while True:
+        await asyncio.sleep(REVIEW_COMPACT_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(review_log.compact)
+        except Exception:
+            logger.exception("Review log compaction failed")
+
+# Spaced repetition (see scheduling.py)
+def last_interval_days(interval_days, last_reviewed, next_review) -> float:
+    """Stored interval, or the gap the old scheduler left for cards reviewed before it existed"""
+    if interval_days is not None:
+        return interval_days
+    if last_reviewed is not None and next_review is not None:
+        return max((next_review - last_reviewed).total_seconds() / 86400, 0.0)
+    return 0.0
+
+def review_state_query(card_ids):
+    """Cards with their most recent uncompacted review, if they have one"""
+    pending = aliased(Review, name="pending")
+    newest_pending = select(pending.id).where(
+        pending.card_id == Flashcard.id, review_log.uncompacted("pending")
+    ).order_by(pending.reviewed_at.desc(), pending.id.desc()).limit(1).correlate(Flashcard).scalar_subquery()
+    return select(
+        Flashcard.id, Flashcard.deck_id, Flashcard.review_count, Flashcard.ease,
+        Flashcard.interval_days, Flashcard.last_reviewed, Flashcard.next_review, Review
+    ).outerjoin(
+        Review, Review.id == newest_pending
+    ).where(Flashcard.id.in_(card_ids))
+
+def review_state(row) -> dict:
+    """Current scheduling state of a review_state_query() row. An uncompacted
+    review is newer than the flashcards columns."""
+    if row.Review is not None:
+        return {
+            "review_count": row.Review.review_count,
+            "ease": row.Review.ease,
+            "interval_days": row.Review.interval_days,
+            "last_reviewed": row.Review.reviewed_at,
+            "next_review": row.Review.next_review,
+        }
+    return {
+        "review_count": row.review_count or 0,
+        "ease": DEFAULT_EASE if row.ease is None else row.ease,
+        "interval_days": last_interval_days(row.interval_days, row.last_reviewed, row.next_review),
+        "last_reviewed": row.last_reviewed,
+        "next_review": row.next_review,
+    }
+
+# Reads don't compact the review log; they lay a deck's uncompacted reviews
+# over the flashcards rows instead (see review_log.py)
+REVIEW_STATE_FIELDS = {  # flashcards column -> reviews column
+    "difficulty": "difficulty",
+    "last_reviewed": "reviewed_at",
+    "review_count": "review_count",
+    "ease": "ease",
+    "interval_days": "interval_days",
+    "next_review": "next_review",
+}
+
+def pending_reviews_query(deck_id: int):
+    """A deck's reviews that are not folded into flashcards yet, oldest first"""
+    return select(Review).where(
+        review_log.uncompacted(), Review.deck_id == deck_id
+    ).order_by(Review.reviewed_at, Review.id)
+
+def newest_pending(reviews) -> Dict[int, dict]:
+    """card_id -> flashcards columns as the card's newest pending review left them"""
+    return {
+        review.card_id: {field: getattr(review, column) for field, column in REVIEW_STATE_FIELDS.items()}
+        for review in reviews
+    }
+
+def overlay_pending(card_id: int, values: dict, pending: Dict[int, dict]) -> dict:
+    """A card's column values with its pending review applied. A review older
+    than values["last_reviewed"] was compacted while the row was being read
+    and is ignored."""
+    state = pending.get(card_id)
+    if state is None:
+        return values
+    last_reviewed = values.get("last_reviewed")
+    if last_reviewed is not None and state["last_reviewed"] < last_reviewed:
+        return values
+    return {**values, **{field: value for field, value in state.items() if field in values}}
+
+# Upload storage
+async def save_upload(image: UploadFile) -> StoredImage:
+    """Hash and store an uploaded image without blocking the event loop.
+    The stored file stays pinned until image_store.unpin() is called."""
+    return await run_in_threadpool(image_store.save, image.file, image.filename or "")
+
+def referenced_images(filenames):
+    return select(Flashcard.image_filename).where(Flashcard.image_filename.in_(filenames)).distinct()
+
+def remove_unreferenced(filenames, referenced) -> List[str]:
+    removed = image_store.collect(filenames, referenced)
+    for filename in removed:
+        image_variants.discard(filename)
+    return removed
+
+def collect_unreferenced_images(db: Session, filenames):
+    """Delete image files that no remaining flashcard points at"""
+    filenames = {filename for filename in filenames if filename}
+    if not filenames:
+        return []
+    return remove_unreferenced(filenames, db.execute(referenced_images(filenames)).scalars().all())
+
+async def collect_unreferenced_images_async(db: AsyncSession, filenames):
+    """collect_unreferenced_images() for handlers; files are removed off the event loop"""
+    filenames = {filename for filename in filenames if filename}
+    if not filenames:
+        return []
+    referenced = (await db.execute(referenced_images(filenames))).scalars().all()
+    return await run_in_threadpool(remove_unreferenced, filenames, referenced)
+
+# Card listing: keyset pagination on id, field projection, streamed JSON
+CARD_FIELDS = tuple(FlashcardResponse.model_fields) + ("thumbnail_url",)
+CARD_PAGE_MAX_LIMIT = 1000
+CARD_STREAM_CHUNK = 500  # Rows per query when streaming a whole deck
+
+def parse_card_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(CARD_FIELDS)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in CARD_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id is the pagination cursor, so it is always returned
+    return list(dict.fromkeys(["id"] + requested))
+
+def card_columns(selected: List[str]):
+    names = [field for field in selected if field != "thumbnail_url"]
+    if "thumbnail_url" in selected and "image_filename" not in names:
+        names.append("image_filename")
+    return [getattr(Flashcard, name) for name in names]
+
+def card_page_query(deck_id: int, columns, after: Optional[int]):
+    query = select(*columns).where(Flashcard.deck_id == deck_id)
+    if after is not None:
+        query = query.where(Flashcard.id > after)
+    return query.order_by(Flashcard.id)
+
+def card_chunks(deck_id: int, columns, after: Optional[int], chunk_size: int = CARD_STREAM_CHUNK):
+    """Rows of a whole deck in chunk_size keyset pages. Uses its own session
+    because it runs while the response is being sent."""
     db = SessionLocal()
     try:
-        yield db
+        while True:
+            rows = db.execute(card_page_query(deck_id, columns, after).limit(chunk_size)).all()
+            db.rollback()  # Don't hold a read transaction between chunks
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1].id
     finally:
         db.close()
 
-# Spaced repetition algorithm
-def calculate_next_review(difficulty: int, review_count: int) -> datetime:
-    """Calculate next review date based on spaced repetition algorithm"""
-    base_intervals = {
-        1: 1,      # Hard: 1 day
-        2: 2,      # Medium-hard: 2 days
-        3: 4,      # Medium: 4 days
-        4: 7,      # Medium-easy: 1 week
-        5: 14      # Easy: 2 weeks
-    }
-    
-    interval = base_intervals.get(difficulty, 1)
-    # Increase interval based on review count (repetition factor)
-    if review_count > 0:
-        interval *= (1.3 ** review_count)
-    
-    return datetime.utcnow() + timedelta(days=int(interval))
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def stream_cards_json(chunks, selected: List[str], pending: Optional[Dict[int, dict]] = None):
+    """Serialize rows into one JSON array, a chunk at a time, with pending
+    reviews applied"""
+    yield "["
+    first = True
+    for rows in chunks:
+        if not rows:
+            continue
+        items = []
+        for row in rows:
+            values = overlay_pending(row.id, row._asdict(), pending or {})
+            item = {}
+            for field in selected:
+                if field == "thumbnail_url":
+                    item[field] = variant_url(values["image_filename"])
+                else:
+                    item[field] = values[field]
+            items.append(json.dumps(item, default=_json_default))
+        yield ("" if first else ",") + ",".join(items)
+        first = False
+    yield "]"
 
 # API Routes
 @app.get("/")
 def read_root():
     return {"message": "Flashcard API is running!"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+def get_profile(reset: bool = False, current_user: str = Depends(verify_token)):
+    """Folded stacks sampled during PROFILE_ROUTE requests, for flamegraph.pl or speedscope"""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is off; set PROFILE_ROUTE to enable it")
+    return PlainTextResponse(profiler.folded(reset=reset))
+
 @app.post("/login", response_model=Token)
 async def login(login_data: LoginRequest):
     # Verify credentials
@@ -207,11 +655,14 @@ async def login(login_data: LoginRequest):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/decks", response_model=List[DeckResponse])
-def get_decks(db: Session = Depends(get_db), current_user: str = Depends(verify_token)):
-    decks = db.query(Deck).all()
+async def get_decks(db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
+    """Decks with their card counts from the stats tables (see deck_stats.py)"""
+    rows = await db.execute(
+        select(Deck, func.coalesce(deck_stats.STATS.c.card_count, 0))
+        .outerjoin(deck_stats.STATS, deck_stats.STATS.c.deck_id == Deck.id)
+    )
     result = []
-    for deck in decks:
-        card_count = db.query(Flashcard).filter(Flashcard.deck_id == deck.id).count()
+    for deck, card_count in rows:
         result.append(DeckResponse(
             id=deck.id,
             name=deck.name,
@@ -222,11 +673,10 @@ def get_decks(db: Session = Depends(get_db), current_user: str = Depends(verify_
     return result
 
 @app.post("/decks", response_model=DeckResponse)
-def create_deck(deck: DeckCreate, db: Session = Depends(get_db), current_user: str = Depends(verify_token)):
+async def create_deck(deck: DeckCreate, db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
     db_deck = Deck(name=deck.name, description=deck.description)
     db.add(db_deck)
-    db.commit()
-    db.refresh(db_deck)
+    await db.commit()
     return DeckResponse(
         id=db_deck.id,
         name=db_deck.name,
@@ -235,113 +685,299 @@ def create_deck(deck: DeckCreate, db: Session = Depends(get_db), current_user: s
         card_count=0
     )
 
+@app.get("/decks/{deck_id}/stats", response_model=DeckStatsResponse)
+async def get_deck_stats(
+    deck_id: int,
+    days: int = Query(14, ge=1, le=366),
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(verify_token)
+):
+    """Card, review and due counts from the precomputed stats tables (see deck_stats.py).
+    days: how many days of due counts to return, starting today."""
+    if await db.get(Deck, deck_id) is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    pending = newest_pending((await db.execute(pending_reviews_query(deck_id))).scalars())
+    stored = await db.execute(select(
+        Flashcard.id, Flashcard.difficulty, Flashcard.last_reviewed, Flashcard.review_count, Flashcard.next_review
+    ).where(Flashcard.id.in_(pending)))
+    changes = []
+    for row in stored:
+        values = row._asdict()
+        current = overlay_pending(row.id, values, pending)
+        if current is not values:
+            changes.append((values, current))
+    today = datetime.utcnow().date()
+    stats = await db.run_sync(deck_stats.read, deck_id, today, days, changes)
+    if stats is None:
+        return DeckStatsResponse(deck_id=deck_id, due_by_day=[
+            DueDay(day=today + timedelta(days=offset), due=0) for offset in range(days)
+        ])
+    return DeckStatsResponse(deck_id=deck_id, **stats)
+
 @app.get("/decks/{deck_id}/cards", response_model=List[FlashcardResponse])
-def get_cards(deck_id: int, db: Session = Depends(get_db), current_user: str = Depends(verify_token)):
-    cards = db.query(Flashcard).filter(Flashcard.deck_id == deck_id).all()
-    return cards
+async def get_cards(
+    deck_id: int,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=CARD_PAGE_MAX_LIMIT),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(verify_token)
+):
+    """Cards of a deck in id order, serialized as they are read.
+
+    after: return cards with id > after (the X-Next-Cursor of the previous page).
+    limit: page size; omit to stream the whole deck.
+    fields: comma-separated subset of FlashcardResponse fields; id is always included.
+    """
+    selected = parse_card_fields(fields)
+    columns = card_columns(selected)
+    pending = newest_pending((await db.execute(pending_reviews_query(deck_id))).scalars())
+    if limit is None:
+        return StreamingResponse(
+            stream_cards_json(card_chunks(deck_id, columns, after), selected, pending),
+            media_type="application/json"
+        )
+
+    rows = (await db.execute(card_page_query(deck_id, columns, after).limit(limit + 1))).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+    return StreamingResponse(
+        stream_cards_json([rows], selected, pending),
+        media_type="application/json",
+        headers=headers
+    )
+
+@app.get("/search", response_model=List[SearchHit])
+async def search_people(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    deck_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(verify_token)
+):
+    """Find people by name or role across all decks (or one deck). Each
+    word in q matches as a prefix; best matches come first."""
+    rows = await db.run_sync(search.search_cards, q, limit=limit, deck_id=deck_id)
+    return [SearchHit.model_validate(row, from_attributes=True) for row in rows]
+
+def build_bulk_preview(filenames: List[str], existing) -> BulkPreviewResponse:
+    """Parse and check a batch of filenames; existing holds the deck's (name, role) pairs"""
+    seen_filenames = set()
+    files = []
+    error_count = 0
+    for filename in filenames:
+        parsed = parse(filename)
+        result = BulkPreviewFile(filename=filename, status="ok")
+        result.error = filename_error(parsed, filename)
+        if result.error:
+            result.status = "error"
+            error_count += 1
+        else:
+            result.person_name = parsed.person_name
+            result.person_role = parsed.person_role
+            if (parsed.person_name, parsed.person_role) in existing:
+                result.warnings.append(f"Deck already has a card for {parsed.person_name} ({parsed.person_role})")
+        if filename in seen_filenames:
+            result.warnings.append(f"Duplicate filename in batch: {filename}")
+        seen_filenames.add(filename)
+        files.append(result)
+
+    return BulkPreviewResponse(files=files, valid_count=len(files) - error_count, error_count=error_count)
+
+@app.post("/cards/bulk/preview", response_model=BulkPreviewResponse)
+async def preview_cards_bulk(preview: BulkPreviewRequest, db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
+    """
+    Dry run for /cards/bulk: parse and validate filenames without uploading
+    any image bytes. Errors come from filename_parser.filename_error(), the
+    check /cards/bulk applies before storing a file; warnings flag repeated
+    filenames and people the deck already has.
+    """
+    if await db.get(Deck, preview.deck_id) is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
 
-@app.post("/cards/bulk", response_model=List[FlashcardResponse])
+    existing = set((await db.execute(select(Flashcard.person_name, Flashcard.person_role).where(
+        Flashcard.deck_id == preview.deck_id
+    ))).all())
+    # Thousands of filenames are a few hundred ms of parsing; keep it off the event loop
+    return await run_in_threadpool(build_bulk_preview, preview.filenames, existing)
+
+@app.post("/cards/bulk", response_model=BulkUploadResponse)
 async def create_cards_bulk(
     deck_id: int = Form(...),
     images: List[UploadFile] = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: str = Depends(verify_token)
 ):
     """
     Bulk upload team member cards. Filename format should be:
     'FirstName LastName - Role.jpg' or 'FirstName_LastName_Role.jpg'
+    
+    Images are written to disk concurrently (up to BULK_UPLOAD_CONCURRENCY at a
+    time) off the event loop, then all cards are committed in one transaction.
     """
     # Check if deck exists
-    deck = db.query(Deck).filter(Deck.id == deck_id).first()
-    if not deck:
+    if await db.get(Deck, deck_id) is None:
         raise HTTPException(status_code=404, detail="Deck not found")
     
-    created_cards = []
-    errors = []
+    semaphore = asyncio.Semaphore(BULK_UPLOAD_CONCURRENCY)
+    
+    async def ingest(image: UploadFile):
+        result = BulkUploadFileResult(filename=image.filename or "", status="error")
+        
+        # Parse filename to extract name and role; the preview applies the same check
+        parsed = parse(result.filename)
+        result.error = filename_error(parsed, result.filename)
+        if result.error:
+            return result, None
+        
+        async with semaphore:
+            try:
+                stored = await save_upload(image)
+            except Exception as e:
+                result.error = f"Error processing {image.filename}: {str(e)}"
+                return result, None
+        
+        result.status = "created"
+        result.bytes_written = stored.size
+        result.deduplicated = stored.deduplicated
+        card_row = {
+            "deck_id": deck_id,
+            "front": "",  # Optional front text
+            "back": "",   # Optional back text
+            "person_name": parsed.person_name,
+            "person_role": parsed.person_role,
+            "image_filename": stored.filename,
+            "next_review": datetime.utcnow(),
+        }
+        return result, card_row
+    
+    outcomes = await asyncio.gather(*(ingest(image) for image in images))
+    file_results = [result for result, _ in outcomes]
+    created_cards = [card for _, card in outcomes if card is not None]
+    
+    async def persist():
+        # One transaction and one multi-row INSERT ... RETURNING for the batch.
+        # SQLite hands out ids in VALUES order, so sorting by id lines the rows
+        # up with file_results (sort_by_parameter_order would insert one row
+        # per statement on SQLite).
+        cards = await db.scalars(insert(Flashcard).returning(Flashcard), created_cards)
+        responses = [
+            FlashcardResponse.model_validate(card, from_attributes=True)
+            for card in sorted(cards, key=lambda card: card.id)
+        ]
+        await db.commit()
+        return responses
+    
+    try:
+        created = await persist() if created_cards else []
+    finally:
+        image_store.unpin(card["image_filename"] for card in created_cards)
+    if created:
+        due_queues.invalidate(deck_id)
+        quiz_index.invalidate(deck_id)
+    
+    created_iter = iter(created)
+    for result in file_results:
+        if result.status == "created":
+            result.card_id = next(created_iter).id
+    
+    errors = [result.error for result in file_results if result.error]
+    if errors and not created:
+        error_message = f"Created 0 cards successfully. Errors: {'; '.join(errors)}"
+        raise HTTPException(status_code=400, detail=error_message)
     
-    for image in images:
+    return BulkUploadResponse(
+        created=created,
+        files=file_results,
+        created_count=len(created),
+        error_count=len(errors)
+    )
+
+def import_archive(deck_id: int, archive_file) -> ArchiveImportResponse:
+    """Stream every image in a ZIP/tar into the image store and create a card
+    per member, committing every ARCHIVE_BATCH_SIZE cards. Memory use is one
+    read chunk plus one batch, whatever the archive size. Blocking."""
+    response = ArchiveImportResponse(created_count=0, deduplicated_count=0, error_count=0, errors=[])
+    batch = []
+
+    def fail(member_name: str, error: str):
+        response.error_count += 1
+        if len(response.errors) < MAX_REPORTED_ERRORS:
+            response.errors.append(BulkUploadFileResult(filename=member_name, status="error", error=error))
+
+    def commit_batch():
+        rows = batch[:]
+        batch.clear()
+        db = SessionLocal()
         try:
-            # Validate image file
-            if not image.content_type.startswith("image/"):
-                errors.append(f"File {image.filename} is not an image")
+            db.execute(Flashcard.__table__.insert(), rows)
+            db.commit()
+        finally:
+            db.close()
+            image_store.unpin(row["image_filename"] for row in rows)
+        response.created_count += len(rows)
+        due_queues.invalidate(deck_id)
+        quiz_index.invalidate(deck_id)
+
+    try:
+        for member_name, size, stream in iter_members(archive_file):
+            filename = member_name.rsplit("/", 1)[-1]
+            parsed = parse(filename)
+            error = filename_error(parsed, filename)
+            if error is None and size > MAX_MEMBER_BYTES:
+                error = too_large(member_name)
+            if error is not None:
+                fail(member_name, error)
                 continue
-            
-            # Parse filename to extract name and role
-            filename_without_ext = image.filename.rsplit('.', 1)[0] if '.' in image.filename else image.filename
-            
-            # Try different parsing patterns
-            person_name = ""
-            person_role = ""
-            
-            if ' - ' in filename_without_ext:
-                # Format: "John Doe - Software Engineer"
-                parts = filename_without_ext.split(' - ', 1)
-                person_name = parts[0].strip()
-                person_role = parts[1].strip() if len(parts) > 1 else "Team Member"
-            elif '_' in filename_without_ext:
-                # Format: "John_Doe_Software_Engineer" 
-                parts = filename_without_ext.split('_')
-                if len(parts) >= 3:
-                    # Find the split point - assume last 1-3 parts are role
-                    if len(parts) >= 4:
-                        person_name = ' '.join(parts[:-2]).strip()
-                        person_role = ' '.join(parts[-2:]).replace('_', ' ').strip()
-                    else:
-                        person_name = ' '.join(parts[:-1]).strip()
-                        person_role = parts[-1].replace('_', ' ').strip()
-                elif len(parts) == 2:
-                    person_name = parts[0].replace('_', ' ').strip()
-                    person_role = parts[1].replace('_', ' ').strip()
-                else:
-                    person_name = filename_without_ext.replace('_', ' ').strip()
-                    person_role = "Team Member"
-            else:
-                # Fallback: use filename as name
-                person_name = filename_without_ext.strip()
-                person_role = "Team Member"
-            
-            if not person_name:
-                errors.append(f"Could not parse name from filename: {image.filename}")
+            try:
+                stored = image_store.save(stream, filename)
+            except Exception as e:
+                fail(member_name, f"Error processing {member_name}: {str(e)}")
                 continue
-            
-            # Generate unique filename for storage
-            file_extension = image.filename.split(".")[-1] if "." in image.filename else "jpg"
-            unique_filename = f"{uuid.uuid4()}.{file_extension}"
-            file_path = os.path.join(UPLOAD_DIR, unique_filename)
-            
-            # Save the uploaded image
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
-            
-            # Create flashcard
-            db_card = Flashcard(
-                deck_id=deck_id,
-                front="",  # Optional front text
-                back="",   # Optional back text
-                person_name=person_name,
-                person_role=person_role,
-                image_filename=unique_filename,
-                next_review=datetime.utcnow()
-            )
-            db.add(db_card)
-            created_cards.append(db_card)
-            
-        except Exception as e:
-            errors.append(f"Error processing {image.filename}: {str(e)}")
-            continue
-    
-    if created_cards:
-        db.commit()
-        for card in created_cards:
-            db.refresh(card)
-    
-    if errors:
-        # Return partial success with error details
-        error_message = f"Created {len(created_cards)} cards successfully. Errors: {'; '.join(errors)}"
-        if not created_cards:
-            raise HTTPException(status_code=400, detail=error_message)
+            response.deduplicated_count += stored.deduplicated
+            batch.append({
+                "deck_id": deck_id,
+                "front": "",
+                "back": "",
+                "person_name": parsed.person_name,
+                "person_role": parsed.person_role,
+                "image_filename": stored.filename,
+                "next_review": datetime.utcnow(),
+            })
+            if len(batch) >= ARCHIVE_BATCH_SIZE:
+                commit_batch()
+        if batch:
+            commit_batch()
+    except Exception:
+        image_store.unpin(row["image_filename"] for row in batch)
+        raise
+    return response
+
+@app.post("/cards/archive", response_model=ArchiveImportResponse)
+async def create_cards_from_archive(
+    deck_id: int = Form(...),
+    archive: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(verify_token)
+):
+    """
+    Import a whole team from one ZIP or tar (.tar, .tar.gz, .tar.bz2, .tar.xz)
+    of photos named like the files for /cards/bulk. Folders inside the
+    archive are ignored; only the file name is parsed.
+    """
+    if await db.get(Deck, deck_id) is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    await db.close()  # Don't hold a connection through a long import
     
-    return created_cards
+    try:
+        response = await run_in_threadpool(import_archive, deck_id, archive.file)
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if response.created_count == 0 and response.error_count:
+        raise HTTPException(status_code=400, detail=response.model_dump())
+    return response
 
 @app.post("/cards", response_model=FlashcardResponse)
 async def create_card(
@@ -351,26 +987,21 @@ async def create_card(
     front: str = Form(""),
     back: str = Form(""),
     image: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: str = Depends(verify_token)
 ):
     # Check if deck exists
-    deck = db.query(Deck).filter(Deck.id == deck_id).first()
-    if not deck:
+    if await db.get(Deck, deck_id) is None:
         raise HTTPException(status_code=404, detail="Deck not found")
     
-    # Validate image file
-    if not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
-    
-    # Generate unique filename
-    file_extension = image.filename.split(".")[-1] if "." in image.filename else "jpg"
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    # Same rule as the bulk paths, with the name taken from the form
+    parsed = parse(image.filename or "")._replace(person_name=person_name)
+    error = filename_error(parsed, image.filename)
+    if error is not None:
+        raise HTTPException(status_code=400, detail=error)
     
     # Save the uploaded image
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    stored = await save_upload(image)
     
     db_card = Flashcard(
         deck_id=deck_id,
@@ -378,61 +1009,442 @@ async def create_card(
         back=back,
         person_name=person_name,
         person_role=person_role,
-        image_filename=unique_filename,
+        image_filename=stored.filename,
         next_review=datetime.utcnow()  # Available for review immediately
     )
-    db.add(db_card)
-    db.commit()
-    db.refresh(db_card)
+    try:
+        db.add(db_card)
+        await db.commit()
+    finally:
+        image_store.unpin([stored.filename])
+    due_queues.invalidate(deck_id)
+    quiz_index.invalidate(deck_id)
     return db_card
 
-@app.get("/decks/{deck_id}/study", response_model=List[FlashcardResponse])
-def get_cards_for_study(deck_id: int, limit: int = 10, db: Session = Depends(get_db), current_user: str = Depends(verify_token)):
-    """Get cards that are due for review"""
+# Stored images are named by their content hash, so an image or variant URL
+# never changes what it returns
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def image_etag(filename: str, width: Optional[int]) -> str:
+    stem = filename.rsplit(".", 1)[0]
+    return f'"{stem}-w{width}"' if width else f'"{stem}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.replace("W/", "", 1) == etag for tag in tags)
+
+@app.get("/images/{filename}")
+async def get_image(filename: str, request: Request, w: Optional[int] = None):
+    """Serve a stored image, resized to width w (cached on disk after first use)"""
+    file_path = image_store.path(filename)
+    if os.path.basename(filename) != filename or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    width = variant_width(w) if w is not None and w > 0 else None
+    headers = {"ETag": image_etag(filename, width), "Cache-Control": IMAGE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if width is not None:
+        file_path = await run_in_threadpool(image_variants.get, file_path, filename, width)
+    return FileResponse(file_path, headers=headers)
+
+async def due_cards(db: AsyncSession, deck_id: int, limit: int):
+    """Cards of a deck with next_review <= now, most overdue first"""
     now = datetime.utcnow()
-    cards = db.query(Flashcard).filter(
+
+    def with_pending(cards, pending):
+        return [
+            FlashcardResponse(**overlay_pending(card.id, card.model_dump(), pending)) if card.id in pending else card
+            for card in (FlashcardResponse.model_validate(card, from_attributes=True) for card in cards)
+        ]
+
+    if due_queues.enabled:
+        async def load():
+            pending = newest_pending((await db.execute(pending_reviews_query(deck_id))).scalars())
+            cards = await db.execute(select(Flashcard).where(Flashcard.deck_id == deck_id))
+            return with_pending(cards.scalars(), pending)
+        return await due_queues.due_cards(deck_id, now, limit, load)
+
+    # Over-fetch by the pending count, since a pending review can make a due
+    # card not due. Cards a pending review made due are fetched by id.
+    pending = newest_pending((await db.execute(pending_reviews_query(deck_id))).scalars())
+    cards = (await db.execute(select(Flashcard).where(
         Flashcard.deck_id == deck_id,
         Flashcard.next_review <= now
-    ).limit(limit).all()
-    return cards
+    ).order_by(Flashcard.next_review, Flashcard.id).limit(limit + len(pending)))).scalars().all()
+    fetched = {card.id for card in cards}
+    newly_due = [card_id for card_id, state in pending.items() if card_id not in fetched and state["next_review"] <= now]
+    if newly_due:
+        cards += (await db.execute(select(Flashcard).where(Flashcard.id.in_(newly_due)))).scalars().all()
+    due = [card for card in with_pending(cards, pending) if card.next_review is not None and card.next_review <= now]
+    due.sort(key=lambda card: (card.next_review, card.id))
+    return due[:limit]
+
+@app.get("/decks/{deck_id}/study", response_model=List[FlashcardResponse])
+async def get_cards_for_study(deck_id: int, limit: int = 10, db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
+    """Get cards that are due for review, most overdue first"""
+    return await due_cards(db, deck_id, limit)
+
+@app.get("/decks/{deck_id}/quiz", response_model=List[QuizQuestion])
+async def get_quiz(
+    deck_id: int,
+    limit: int = 10,
+    distractors: int = Query(3, ge=1, le=QUIZ_MAX_DISTRACTORS),
+    seed: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(verify_token)
+):
+    """Due cards as multiple-choice questions: the card's name shuffled in with
+    up to `distractors` names of people in the same or similar roles.
+    seed makes the choice and order of names reproducible."""
+    cards = await due_cards(db, deck_id, limit)
+    if not cards:
+        return []
+
+    async def load():
+        rows = await db.execute(
+            select(Flashcard.person_name, Flashcard.person_role).where(Flashcard.deck_id == deck_id)
+        )
+        return rows.all()
+    people = await quiz_index.get(deck_id, load)
+    
+    rng = random.Random(seed)
+    questions = []
+    for card in cards:
+        options = people.distractors(card.person_name, card.person_role, distractors, rng) + [card.person_name]
+        rng.shuffle(options)
+        questions.append(QuizQuestion(card=card, options=options))
+    return questions
 
 @app.post("/cards/{card_id}/review")
-def review_card(card_id: int, review: ReviewResult, db: Session = Depends(get_db), current_user: str = Depends(verify_token)):
-    card = db.query(Flashcard).filter(Flashcard.id == card_id).first()
-    if not card:
+async def review_card(card_id: int, review: ReviewResult, db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
+    row = (await db.execute(review_state_query([card_id]))).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Card not found")
     
-    # Update card based on review
-    card.difficulty = review.difficulty
-    card.last_reviewed = datetime.utcnow()
-    card.review_count += 1
-    card.next_review = calculate_next_review(review.difficulty, card.review_count)
-    
-    db.commit()
+    # Append the review; the card row is updated when the log is compacted
+    now = datetime.utcnow()
+    state = review_state(row)
+    schedule = schedule_card(review.difficulty, state["review_count"], state["interval_days"], state["ease"], now)
+    event = {
+        "card_id": card_id,
+        "deck_id": row.deck_id,
+        "reviewed_at": now,
+        "difficulty": review.difficulty,
+        "review_count": state["review_count"] + 1,
+        "ease": schedule.ease,
+        "interval_days": schedule.interval_days,
+        "next_review": schedule.next_review,
+    }
+    await db.execute(insert(Review), [event])
+    await db.commit()
+    due_queues.update_card(
+        card_id,
+        difficulty=event["difficulty"],
+        last_reviewed=event["reviewed_at"],
+        review_count=event["review_count"],
+        next_review=event["next_review"]
+    )
     return {"message": "Card reviewed successfully"}
 
+def _as_utc_naive(moment: Optional[datetime], now: datetime) -> datetime:
+    """Stored timestamps are naive UTC; clamp client clocks that run ahead"""
+    if moment is None:
+        return now
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(moment, now)
+
+@app.post("/reviews/batch", response_model=List[BatchReviewResult])
+async def review_cards_batch(batch: BatchReviewRequest, db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
+    """Append buffered reviews to the review log with one multi-row INSERT.
+    Several reviews of the same card are applied in reviewed_at order. A
+    review that is not newer than the card's last review is skipped, so a
+    late offline upload can't rewind a card, and a retried upload is a no-op."""
+    now = datetime.utcnow()
+    card_ids = {record.card_id for record in batch.reviews}
+    rows = (await db.execute(review_state_query(card_ids))).all() if card_ids else []
+    state = {row.id: review_state(row) for row in rows}
+    deck_of = {row.id: row.deck_id for row in rows}
+    
+    # Split into rounds: round k holds the k-th review of each card, so every
+    # round is scheduled with one vectorized call on up-to-date card state
+    ordered = sorted(
+        ((_as_utc_naive(record.reviewed_at, now), position, record)
+         for position, record in enumerate(batch.reviews) if record.card_id in state),
+        key=lambda item: item[:2]
+    )
+    rounds = []
+    seen = {}
+    latest = {card_id: card["last_reviewed"] for card_id, card in state.items()}
+    for reviewed_at, _, record in ordered:
+        if latest[record.card_id] is not None and reviewed_at <= latest[record.card_id]:
+            continue
+        latest[record.card_id] = reviewed_at
+        occurrence = seen.get(record.card_id, 0)
+        seen[record.card_id] = occurrence + 1
+        if occurrence == len(rounds):
+            rounds.append([])
+        rounds[occurrence].append((reviewed_at, record))
+    
+    events = []
+    updates = {}  # Newest event per card
+    for reviews in rounds:
+        cards = [state[record.card_id] for _, record in reviews]
+        schedule = schedule_batch(
+            [record.difficulty for _, record in reviews],
+            [card["review_count"] for card in cards],
+            [card["interval_days"] for card in cards],
+            [card["ease"] for card in cards],
+            np.array([reviewed_at for reviewed_at, _ in reviews], dtype="datetime64[us]")
+        )
+        next_reviews = to_datetimes(schedule.next_review)
+        for i, (reviewed_at, record) in enumerate(reviews):
+            card = state[record.card_id]
+            card["review_count"] += 1
+            card["ease"] = float(schedule.ease[i])
+            card["interval_days"] = float(schedule.interval_days[i])
+            event = {
+                "card_id": record.card_id,
+                "deck_id": deck_of[record.card_id],
+                "reviewed_at": reviewed_at,
+                "difficulty": record.difficulty,
+                "review_count": card["review_count"],
+                "ease": card["ease"],
+                "interval_days": card["interval_days"],
+                "next_review": next_reviews[i],
+            }
+            events.append(event)
+            updates[record.card_id] = event
+    
+    # Rounds are appended in order, so a card's newest review gets the highest id
+    if events:
+        await db.execute(insert(Review), events)
+        await db.commit()
+        for row in updates.values():
+            due_queues.update_card(
+                row["card_id"],
+                difficulty=row["difficulty"],
+                last_reviewed=row["reviewed_at"],
+                review_count=row["review_count"],
+                next_review=row["next_review"]
+            )
+    
+    results = []
+    for card_id in dict.fromkeys(record.card_id for record in batch.reviews):
+        row = updates.get(card_id)
+        if card_id not in state:
+            results.append(BatchReviewResult(card_id=card_id, status="not_found"))
+        elif row is None:
+            results.append(BatchReviewResult(
+                card_id=card_id,
+                status="stale",
+                review_count=state[card_id]["review_count"],
+                next_review=state[card_id]["next_review"]
+            ))
+        else:
+            results.append(BatchReviewResult(
+                card_id=card_id,
+                status="reviewed",
+                review_count=row["review_count"],
+                next_review=row["next_review"]
+            ))
+    return results
+
+@app.get("/cards/{card_id}/reviews", response_model=List[ReviewEventResponse])
+async def get_card_reviews(card_id: int, db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
+    """Review history of a card, oldest first, read from the review log"""
+    if await db.get(Flashcard, card_id) is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    reviews = await db.execute(select(Review).where(Review.card_id == card_id).order_by(Review.id))
+    return reviews.scalars().all()
+
+@app.post("/decks/{deck_id}/reschedule", status_code=status.HTTP_202_ACCEPTED)
+async def reschedule_deck(
+    deck_id: int,
+    background_tasks: BackgroundTasks,
+    daily_cap: int = DEFAULT_DAILY_REVIEW_CAP,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(verify_token)
+):
+    """Spread a deck's overdue backlog over the coming days, at most daily_cap per day.
+    Runs in the background; poll GET /reschedule-jobs/{job_id} for progress."""
+    if daily_cap < 1:
+        raise HTTPException(status_code=400, detail="daily_cap must be at least 1")
+    if await db.get(Deck, deck_id) is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    
+    job, created = reschedule_jobs.create(deck_id, daily_cap)
+    if created:
+        background_tasks.add_task(run_catch_up, job, SessionLocal, Flashcard, on_chunk_written=due_queues.invalidate)
+    return job.as_dict()
+
+@app.get("/reschedule-jobs/{job_id}")
+def get_reschedule_job(job_id: str, current_user: str = Depends(verify_token)):
+    job = reschedule_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.as_dict()
+
+# Deck bundles (see bundles.py)
+def deck_bundle_stream(deck_id: int, deck_header: dict):
+    """Generate a deck's bundle lazily: images in filename order, then the
+    cards in id-ordered manifest parts. Uses its own sessions because it runs
+    while the response is being sent."""
+    db = SessionLocal()
+    try:
+        yield from bundles.header_member(deck_header)
+
+        last_filename = ""
+        while True:
+            filenames = [row[0] for row in db.query(Flashcard.image_filename).filter(
+                Flashcard.deck_id == deck_id,
+                Flashcard.image_filename > last_filename
+            ).distinct().order_by(Flashcard.image_filename).limit(CARD_STREAM_CHUNK)]
+            db.rollback()  # Don't hold a read transaction while images are sent
+            if not filenames:
+                break
+            for filename in filenames:
+                file_path = image_store.path(filename)
+                if os.path.isfile(file_path):
+                    yield from bundles.file_member(f"images/{filename}", file_path)
+            last_filename = filenames[-1]
+
+        pending = newest_pending(db.execute(pending_reviews_query(deck_id)).scalars().all())
+        db.rollback()
+        columns = [Flashcard.id] + [getattr(Flashcard, field) for field in bundles.CARD_FIELDS]
+        for part, rows in enumerate(card_chunks(deck_id, columns, None, bundles.CARDS_PER_PART), start=1):
+            yield from bundles.cards_member(part, (overlay_pending(row.id, row._asdict(), pending) for row in rows))
+        yield bundles.end_of_archive()
+    finally:
+        db.close()
+
+@app.get("/decks/{deck_id}/export")
+async def export_deck(deck_id: int, db: AsyncSession = Depends(get_db), current_user: str = Depends(verify_token)):
+    """Download a deck with its cards, review state and images as one tar bundle"""
+    deck = await db.get(Deck, deck_id)
+    if not deck:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    header = {"name": deck.name, "description": deck.description, "exported_at": datetime.utcnow().isoformat()}
+    safe_name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in deck.name or "deck")
+    return StreamingResponse(
+        deck_bundle_stream(deck_id, header),
+        media_type="application/x-tar",
+        headers={"Content-Disposition": f'attachment; filename="{safe_name}.flashcards.tar"'}
+    )
+
+def import_bundle(bundle_file, name: Optional[str]) -> DeckImportResponse:
+    """Create a new deck from a bundle, storing images as they stream in and
+    inserting each manifest part in its own transaction. Blocking. On any
+    error the partly imported deck is removed again."""
+    db = SessionLocal()
+    stored: Dict[str, str] = {}  # Image name in the bundle -> name in the image store
+    deck = None
+    card_count = 0
+    try:
+        for kind, item in bundles.read_bundle(bundle_file):
+            if kind == "deck":
+                deck = Deck(name=name or item.get("name") or "Imported deck", description=item.get("description"))
+                db.add(deck)
+                db.commit()
+            elif kind == "image":
+                bundle_name, stream = item
+                if bundle_name not in stored:
+                    stored[bundle_name] = image_store.save(
+                        LimitedReader(stream, MAX_MEMBER_BYTES, bundle_name), bundle_name
+                    ).filename
+            elif item:
+                now = datetime.utcnow()
+                rows = [{
+                    **card,
+                    "deck_id": deck.id,
+                    "person_name": card["person_name"] or "",
+                    "person_role": card["person_role"] or "",
+                    "image_filename": stored.get(card["image_filename"]),
+                    "difficulty": min(max(card["difficulty"] or 1, 1), 5),
+                    "review_count": card["review_count"] or 0,
+                    "ease": card["ease"] or DEFAULT_EASE,
+                    "created_at": card["created_at"] or now,
+                } for card in item]
+                db.execute(Flashcard.__table__.insert(), rows)
+                db.commit()
+                card_count += len(rows)
+                quiz_index.invalidate(deck.id)
+    except Exception:
+        db.rollback()
+        if deck is not None:
+            db.query(Flashcard).filter(Flashcard.deck_id == deck.id).delete()
+            db.query(Deck).filter(Deck.id == deck.id).delete()
+            db.commit()
+            quiz_index.invalidate(deck.id)
+        raise
+    finally:
+        image_store.unpin(stored.values())
+        collect_unreferenced_images(db, stored.values())
+        db.close()
+
+    return DeckImportResponse(
+        deck=DeckResponse(
+            id=deck.id,
+            name=deck.name,
+            description=deck.description,
+            created_at=deck.created_at,
+            card_count=card_count
+        ),
+        image_count=len(set(stored.values()))
+    )
+
+@app.post("/decks/import", response_model=DeckImportResponse)
+async def import_deck(
+    bundle: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    current_user: str = Depends(verify_token)
+):
+    """Create a new deck from a bundle made by GET /decks/{deck_id}/export; name overrides the bundle's"""
+    try:
+        return await run_in_threadpool(import_bundle, bundle.file, name)
+    except (bundles.BundleError, ArchiveError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.delete("/cards/{card_id}")
-def delete_card(card_id: int, db: Session = Depends(get_db)):
-    card = db.query(Flashcard).filter(Flashcard.id == card_id).first()
+async def delete_card(card_id: int, db: AsyncSession = Depends(get_db)):
+    card = await db.get(Flashcard, card_id)
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     
-    db.delete(card)
-    db.commit()
+    deck_id = card.deck_id
+    image_filename = card.image_filename
+    await db.delete(card)
+    await db.execute(delete(Review).where(Review.card_id == card_id))
+    await db.commit()
+    due_queues.invalidate(deck_id)
+    quiz_index.invalidate(deck_id)
+    await collect_unreferenced_images_async(db, [image_filename])
     return {"message": "Card deleted successfully"}
 
 @app.delete("/decks/{deck_id}")
-def delete_deck(deck_id: int, db: Session = Depends(get_db)):
-    # Delete all cards in the deck first
-    db.query(Flashcard).filter(Flashcard.deck_id == deck_id).delete()
+async def delete_deck(deck_id: int, db: AsyncSession = Depends(get_db)):
+    image_filenames = (await db.execute(
+        select(Flashcard.image_filename).where(Flashcard.deck_id == deck_id).distinct()
+    )).scalars().all()
+    
+    # Delete all cards in the deck first, with their review history
+    await db.execute(delete(Review).where(
+        Review.card_id.in_(select(Flashcard.id).where(Flashcard.deck_id == deck_id))
+    ))
+    await db.execute(delete(Flashcard).where(Flashcard.deck_id == deck_id))
     
     # Delete the deck
-    deck = db.query(Deck).filter(Deck.id == deck_id).first()
+    deck = await db.get(Deck, deck_id)
     if not deck:
         raise HTTPException(status_code=404, detail="Deck not found")
     
-    db.delete(deck)
-    db.commit()
+    await db.delete(deck)
+    await db.commit()
+    due_queues.invalidate(deck_id)
+    quiz_index.invalidate(deck_id)
+    await collect_unreferenced_images_async(db, image_filenames)
     return {"message": "Deck deleted successfully"}
 
 # Serve frontend in production
@@ -0,0 +1,273 @@
+"""
+Request metrics in the Prometheus text format, plus an opt-in sampling profiler.
+
+MetricsMiddleware records, per route template (e.g. /decks/{deck_id}/study):
+- request latency histograms by method, route and status
+- database queries per request (histogram) and total time spent in them
+- request body bytes received (uploads)
+- requests in flight
+
+Gauges such as the token store size are read when /metrics is scraped.
+Database queries are counted by SQLAlchemy engine hooks
+(instrument_engine()), or by anything else that calls record_query().
+They are attributed to the request through a context variable, which also
+follows the request into threadpool workers.
+
+SamplingProfiler is off unless PROFILE_ROUTE is set. While a request for
+that route is in flight, it samples the Python stacks of all threads and
+aggregates them as folded stacks ("frame;frame;frame count"). The output
+can be fed to flamegraph.pl or speedscope. Samples from other requests
+running at the same time are included, so profile under a load that
+targets the one route.
+
+This module needs only the standard library (SQLAlchemy just for
+instrument_engine()), so simple_app.py imports it too; Dockerfile.fly
+copies it next to simple_app.py.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+UNMATCHED_ROUTE = "unmatched"  # Static mounts and 404s; keeps label cardinality bounded
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    __slots__ = ("db_queries", "db_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "flashcards"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._latency: Dict[tuple, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self._db_queries: Dict[str, Histogram] = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self._db_seconds: Dict[str, float] = defaultdict(float)
+        self._upload_bytes: Dict[str, int] = defaultdict(int)
+        self._in_progress = 0
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Register a gauge whose value is read at scrape time"""
+        self._gauges[name] = (help_text, read)
+
+    def record_query(self, seconds: float):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += seconds
+
+    def _request_started(self):
+        with self._lock:
+            self._in_progress += 1
+
+    def _request_finished(self, method: str, route: str, status: int, seconds: float,
+                          stats: RequestStats, body_bytes: int):
+        with self._lock:
+            self._in_progress -= 1
+            self._latency[(method, route, str(status))].observe(seconds)
+            self._db_queries[route].observe(stats.db_queries)
+            self._db_seconds[route] += stats.db_seconds
+            if body_bytes:
+                self._upload_bytes[route] += body_bytes
+
+    def render(self) -> str:
+        p = self.prefix
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series:
+                cumulative = 0
+                for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_labels(**labels, le=le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(**labels)} {hist.sum}")
+                lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+
+        def counter(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series:
+                lines.append(f"{name}{_labels(**labels)} {value}")
+
+        with self._lock:
+            histogram(f"{p}_http_request_duration_seconds", "Request latency by route",
+                      [({"method": m, "route": r, "status": s}, h) for (m, r, s), h in sorted(self._latency.items())])
+            histogram(f"{p}_db_queries_per_request", "Database queries issued per request",
+                      [({"route": r}, h) for r, h in sorted(self._db_queries.items())])
+            counter(f"{p}_db_query_seconds_total", "Time spent in database queries",
+                    [({"route": r}, v) for r, v in sorted(self._db_seconds.items())])
+            counter(f"{p}_request_body_bytes_total", "Request body bytes received (uploads)",
+                    [({"route": r}, v) for r, v in sorted(self._upload_bytes.items())])
+            lines.append(f"# HELP {p}_http_requests_in_progress Requests being handled")
+            lines.append(f"# TYPE {p}_http_requests_in_progress gauge")
+            lines.append(f"{p}_http_requests_in_progress {self._in_progress}")
+
+        for name, (help_text, read) in sorted(self._gauges.items()):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+
+def instrument_engine(engine, registry: MetricsRegistry):
+    """Count and time every statement the engine runs"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        registry.record_query(time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            registry.record_query(time.perf_counter() - started.pop())
+
+
+class SamplingProfiler:
+    IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+
+    def __init__(self, route: str, interval: float = 0.005):
+        from starlette.routing import compile_path
+
+        self.route = route
+        self._path_regex = compile_path(route)[0]
+        self.interval = interval
+        self.samples = Counter()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def matches(self, path: str) -> bool:
+        return self._path_regex.match(path) is not None
+
+    def request_started(self):
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def request_finished(self):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._wake.clear()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            self._wake.wait()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if os.path.basename(frame.f_code.co_filename) in self.IDLE_FILES:
+                    continue  # Parked worker or event loop waiting for I/O
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    self.samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def folded(self, reset: bool = False) -> str:
+        """Samples in folded-stack format, one "stack count" per line"""
+        with self._lock:
+            text = "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+            if reset:
+                self.samples.clear()
+        return text
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: MetricsRegistry, profiler: Optional[SamplingProfiler] = None):
+        self.app = app
+        self.registry = registry
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        body_bytes = 0
+        status = 500
+        profiling = self.profiler is not None and self.profiler.matches(scope["path"])
+        started = time.perf_counter()
+
+        async def counting_receive():
+            nonlocal body_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                body_bytes += len(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.registry._request_started()
+        if profiling:
+            self.profiler.request_started()
+        try:
+            await self.app(scope, counting_receive, recording_send)
+        finally:
+            if profiling:
+                self.profiler.request_finished()
+            _request_stats.reset(token)
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            self.registry._request_finished(
+                scope["method"], route, status, time.perf_counter() - started, stats, body_bytes
+            )
@@ -0,0 +1,57 @@
+"""
+Write .gz and .br copies of the built frontend for PrecompressedStaticFiles.
+
+Run after the Vite build has been copied into static/ (build-production.sh
+and the Dockerfile do this). Files are compressed once at maximum level; a
+copy is only kept if it is actually smaller. Brotli copies need the brotli
+package and are skipped without it.
+
+Usage: python precompress_static.py [static_dir]
+"""
+
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONS = (".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".wasm")
+MINIMUM_SIZE = 1024
+
+
+def precompress(path: str) -> list:
+    with open(path, "rb") as source:
+        data = source.read()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as target:
+                target.write(compressed)
+            written.append((suffix, len(compressed)))
+    return written
+
+
+def main(static_dir: str):
+    total = 0
+    for root, _, filenames in os.walk(static_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(root, filename)
+            if not filename.endswith(EXTENSIONS) or os.path.getsize(path) < MINIMUM_SIZE:
+                continue
+            sizes = ", ".join(f"{suffix} {size:,} B" for suffix, size in precompress(path))
+            print(f"{os.path.relpath(path, static_dir)}: {os.path.getsize(path):,} B -> {sizes}")
+            total += 1
+    if brotli is None:
+        print("brotli not installed: wrote .gz only")
+    print(f"Precompressed {total} files")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "static")
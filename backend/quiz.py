@@ -0,0 +1,152 @@
+"""
+Distractor names for "pick the right name" quizzes.
+
+For every card in a quiz, the client shows the image and the card's name
+mixed with k distractor names, taken from other people in the deck. A
+distractor is more convincing when it comes from someone in the same role
+("Product Manager"), then from a similar role that shares a word with it
+("Marketing Manager"), and only then from anyone in the deck.
+
+DeckPeople indexes a deck's distinct names three ways: by normalized role,
+by role word, and as one list. It is built from a single scan of the deck.
+Drawing distractors then costs O(k) per card, whatever the deck size.
+Small pools are filtered whole. Large pools are sampled at random
+positions, and names that are excluded or already chosen are skipped.
+
+QuizIndexCache keeps one DeckPeople per deck in the process. Adding or
+deleting cards drops the deck's entry, and it is rebuilt on the next quiz.
+As with the due queues, a deck is loaded without holding the lock and only
+cached if no card changed meanwhile. Cards changed by another uvicorn
+worker are not seen until the deck is invalidated here. That only affects
+which names are offered as distractors.
+
+This module needs only the standard library, so simple_app.py imports it
+too; Dockerfile.fly copies it next to simple_app.py.
+"""
+
+import random
+import re
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+SMALL_POOL_FACTOR = 4  # Pools up to this many times the names needed are filtered whole
+ROLE_STOPWORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "the", "to"}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def role_key(role: str) -> str:
+    return " ".join((role or "").casefold().split())
+
+
+def role_words(role: str) -> List[str]:
+    return [word for word in dict.fromkeys(_WORD.findall(role_key(role))) if word not in ROLE_STOPWORDS]
+
+
+def _draw(pools: Sequence[List[str]], needed: int, rng: random.Random,
+          chosen: List[str], exclude: Set[str]):
+    """Append up to needed names from pools to chosen, skipping excluded ones"""
+    total = sum(len(pool) for pool in pools)
+    if total == 0 or needed <= 0:
+        return
+    target = len(chosen) + needed
+    if total <= SMALL_POOL_FACTOR * needed:
+        candidates = [name for pool in pools for name in pool if name not in exclude]
+        rng.shuffle(candidates)
+        for name in candidates:
+            if len(chosen) >= target:
+                break
+            if name not in exclude:  # Pools can share names
+                chosen.append(name)
+                exclude.add(name)
+        return
+    for _ in range(SMALL_POOL_FACTOR * needed):
+        if len(chosen) >= target:
+            break
+        position = rng.randrange(total)
+        for pool in pools:
+            if position < len(pool):
+                name = pool[position]
+                break
+            position -= len(pool)
+        if name not in exclude:
+            chosen.append(name)
+            exclude.add(name)
+
+
+class DeckPeople:
+    def __init__(self, people: Iterable[Tuple[str, str]]):
+        """people: (person_name, person_role) for every card in the deck"""
+        by_role: Dict[str, Dict[str, None]] = {}
+        by_word: Dict[str, Dict[str, None]] = {}
+        names: Dict[str, None] = {}
+        for name, role in people:
+            name = (name or "").strip()
+            if not name:
+                continue
+            names[name] = None
+            by_role.setdefault(role_key(role), {})[name] = None
+            for word in role_words(role):
+                by_word.setdefault(word, {})[name] = None
+        self.by_role = {key: list(group) for key, group in by_role.items()}
+        self.by_word = {word: list(group) for word, group in by_word.items()}
+        self.names = list(names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def distractors(self, name: str, role: str, k: int, rng: random.Random) -> List[str]:
+        """Up to k names other than name: same role first, then similar roles,
+        then anyone in the deck. Fewer when the deck has too few people."""
+        chosen: List[str] = []
+        exclude = {(name or "").strip()}
+        tiers = [
+            [self.by_role.get(role_key(role), [])],
+            [self.by_word[word] for word in role_words(role) if word in self.by_word],
+            [self.names],
+        ]
+        for pools in tiers:
+            if len(chosen) >= k:
+                break
+            _draw(pools, k - len(chosen), rng, chosen, exclude)
+        return chosen
+
+
+class QuizIndexCache:
+    def __init__(self):
+        self._decks: Dict[int, DeckPeople] = {}
+        self._version = 0  # Bumped by every invalidation, so a load that raced one is not kept
+        self._lock = threading.Lock()
+
+    async def get(self, deck_id: int, load: Callable[[], Awaitable[Iterable[Tuple[str, str]]]]) -> DeckPeople:
+        """The deck's index; load() supplies (name, role) pairs when it is cold"""
+        people, version = self._lookup(deck_id)
+        if people is None:
+            people = self._keep(deck_id, version, DeckPeople(await load()))
+        return people
+
+    def get_sync(self, deck_id: int, load: Callable[[], Iterable[Tuple[str, str]]]) -> DeckPeople:
+        """get() with a plain load(), for callers outside the event loop"""
+        people, version = self._lookup(deck_id)
+        if people is None:
+            people = self._keep(deck_id, version, DeckPeople(load()))
+        return people
+
+    def _lookup(self, deck_id: int) -> Tuple[Optional[DeckPeople], int]:
+        with self._lock:
+            return self._decks.get(deck_id), self._version
+
+    def _keep(self, deck_id: int, version: int, people: DeckPeople) -> DeckPeople:
+        with self._lock:
+            if self._version == version:
+                self._decks.setdefault(deck_id, people)
+        return people
+
+    def invalidate(self, deck_id: int):
+        with self._lock:
+            self._version += 1
+            self._decks.pop(deck_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._decks)
@@ -0,0 +1,215 @@
+"""
+Catch-up rescheduling for decks with a large overdue backlog.
+
+After a break, thousands of cards can be past next_review at once. The
+catch-up job reads a deck's overdue cards in chunks and ranks them by how
+overdue they are relative to their own interval (a card on a 2-day interval
+that is 10 days late goes before one on a 60-day interval). It then spreads
+them over the coming days so no day gets more than daily_cap reviews,
+counting cards that are already due on those days. New next_review values
+are written with bulk UPDATEs in short per-chunk transactions, so the
+database is never locked for long and progress can be polled while the job
+runs. A finished job stays pollable for FINISHED_JOB_TTL, and at most
+MAX_FINISHED_JOBS finished jobs are kept.
+"""
+
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import Integer, bindparam, cast, func, update
+
+CHUNK_SIZE = 1000
+MAX_SPREAD_DAYS = 365
+FINISHED_JOB_TTL = timedelta(hours=1)
+MAX_FINISHED_JOBS = 1000
+
+
+class RescheduleJob:
+    def __init__(self, deck_id: int, daily_cap: int):
+        self.id = uuid.uuid4().hex
+        self.deck_id = deck_id
+        self.daily_cap = daily_cap
+        self.state = "queued"  # queued -> scanning -> writing -> done | failed
+        self.total = 0          # Overdue cards found
+        self.scanned = 0        # Overdue cards read and ranked
+        self.to_reschedule = 0  # Cards that move to a later day
+        self.rescheduled = 0    # ... of which written so far
+        self.days_spread = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def progress(self) -> float:
+        if self.state == "done":
+            return 1.0
+        work = self.total + self.to_reschedule
+        return (self.scanned + self.rescheduled) / work if work else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "deck_id": self.deck_id,
+            "daily_cap": self.daily_cap,
+            "state": self.state,
+            "total": self.total,
+            "scanned": self.scanned,
+            "to_reschedule": self.to_reschedule,
+            "rescheduled": self.rescheduled,
+            "days_spread": self.days_spread,
+            "progress": self.progress,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class RescheduleJobs:
+    """In-process registry of catch-up jobs; one running job per deck"""
+
+    def __init__(self, finished_ttl: timedelta = FINISHED_JOB_TTL, max_finished: int = MAX_FINISHED_JOBS,
+                 clock=datetime.utcnow):
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self._clock = clock
+        self._jobs: Dict[str, RescheduleJob] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        """Drop finished jobs past the TTL, and the oldest beyond max_finished"""
+        finished = sorted((job.finished_at, job.id) for job in self._jobs.values() if job.finished_at is not None)
+        expires = self._clock() - self.finished_ttl
+        over_cap = len(finished) - self.max_finished
+        for i, (finished_at, job_id) in enumerate(finished):
+            if i >= over_cap and finished_at > expires:
+                break
+            del self._jobs[job_id]
+
+    def create(self, deck_id: int, daily_cap: int):
+        """Returns (job, created); an unfinished job for the deck is reused"""
+        with self._lock:
+            self._evict()
+            for job in self._jobs.values():
+                if job.deck_id == deck_id and job.state in ("queued", "scanning", "writing"):
+                    return job, False
+            job = RescheduleJob(deck_id, daily_cap)
+            self._jobs[job.id] = job
+            return job, True
+
+    def get(self, job_id: str) -> Optional[RescheduleJob]:
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+def _day_capacity(session, Flashcard, deck_id: int, now: datetime, daily_cap: int) -> np.ndarray:
+    """Free review slots for day offsets 0..MAX_SPREAD_DAYS from now"""
+    day_offset = cast(func.julianday(Flashcard.next_review) - func.julianday(now), Integer).label("day_offset")
+    already_due = session.query(day_offset, func.count(Flashcard.id)).filter(
+        Flashcard.deck_id == deck_id,
+        Flashcard.next_review > now,
+        Flashcard.next_review <= now + timedelta(days=MAX_SPREAD_DAYS)
+    ).group_by(day_offset).all()
+
+    capacity = np.full(MAX_SPREAD_DAYS + 1, daily_cap, dtype=np.int64)
+    for offset, count in already_due:
+        if offset is not None and 0 <= offset <= MAX_SPREAD_DAYS:
+            capacity[offset] -= count
+    return np.maximum(capacity, 0)
+
+
+def run_catch_up(job: RescheduleJob, session_factory, Flashcard, on_chunk_written=None):
+    """Run a catch-up job to completion. Blocking; meant for a background task.
+    on_chunk_written(deck_id) is called after every committed chunk."""
+    job.state = "scanning"
+    job.started_at = datetime.utcnow()
+    session = session_factory()
+    try:
+        now = datetime.utcnow()
+        job.total = session.query(Flashcard).filter(
+            Flashcard.deck_id == job.deck_id,
+            Flashcard.next_review <= now
+        ).count()
+
+        # Pass 1: read overdue cards in keyset-paginated chunks along the
+        # (deck_id, next_review) index and score each one
+        card_ids = []
+        priorities = []
+        last_key = None
+        while True:
+            query = session.query(
+                Flashcard.id, Flashcard.next_review, Flashcard.last_reviewed, Flashcard.interval_days
+            ).filter(Flashcard.deck_id == job.deck_id, Flashcard.next_review <= now)
+            if last_key is not None:
+                query = query.filter(
+                    (Flashcard.next_review > last_key[0])
+                    | ((Flashcard.next_review == last_key[0]) & (Flashcard.id > last_key[1]))
+                )
+            rows = query.order_by(Flashcard.next_review, Flashcard.id).limit(CHUNK_SIZE).all()
+            session.rollback()  # Don't hold a read transaction between chunks
+            if not rows:
+                break
+            last_key = (rows[-1].next_review, rows[-1].id)
+
+            overdue_days = np.array([(now - row.next_review).total_seconds() / 86400 for row in rows])
+            intervals = np.array([
+                row.interval_days if row.interval_days is not None
+                else ((row.next_review - row.last_reviewed).total_seconds() / 86400 if row.last_reviewed else 0.0)
+                for row in rows
+            ], dtype=np.float64)
+            card_ids.extend(row.id for row in rows)
+            priorities.append(overdue_days / np.maximum(intervals, 1.0))
+            job.scanned = len(card_ids)
+        job.total = len(card_ids)
+
+        if card_ids:
+            # Most overdue relative to its interval first; fill each day up to
+            # its free capacity, starting today
+            order = np.argsort(-np.concatenate(priorities), kind="stable")
+            capacity = _day_capacity(session, Flashcard, job.deck_id, now, job.daily_cap)
+            session.rollback()
+            slot_day = np.repeat(np.arange(len(capacity)), capacity)
+            if len(slot_day) < len(order):
+                # Past the horizon: everything left lands on the last day
+                slot_day = np.concatenate([slot_day, np.full(len(order) - len(slot_day), MAX_SPREAD_DAYS)])
+            day_offsets = np.empty(len(order), dtype=np.int64)
+            day_offsets[order] = slot_day[:len(order)]
+            job.days_spread = int(day_offsets.max()) + 1
+
+            # Pass 2: write new due dates in short transactions; cards that
+            # keep a slot today stay due as they are. Cards reviewed while the
+            # job ran are no longer overdue and are left alone.
+            table = Flashcard.__table__
+            move = update(table).where(
+                table.c.id == bindparam("card_id"),
+                table.c.next_review <= now
+            ).values(next_review=bindparam("new_next_review"))
+            ids = np.asarray(card_ids)
+            to_move = np.nonzero(day_offsets > 0)[0]
+            job.to_reschedule = len(to_move)
+            job.state = "writing"
+            for start in range(0, len(to_move), CHUNK_SIZE):
+                chunk = to_move[start:start + CHUNK_SIZE]
+                session.execute(move, [
+                    {"card_id": int(ids[i]), "new_next_review": now + timedelta(days=int(day_offsets[i]))}
+                    for i in chunk
+                ])
+                session.commit()
+                job.rescheduled += len(chunk)
+                if on_chunk_written is not None:
+                    on_chunk_written(job.deck_id)
+
+        job.state = "done"
+    except Exception as e:
+        session.rollback()
+        job.state = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.utcnow()
+        session.close()
@@ -0,0 +1,87 @@
+"""
+Append-only review log with compaction into the flashcards table.
+
+A review no longer updates its card. It appends one row to reviews holding
+the rating and the scheduling state it produced (review_count, ease,
+interval_days, next_review). Ids only grow (AUTOINCREMENT), so these are
+sequential inserts at the end of the table instead of random-row UPDATEs of
+flashcards and its (deck_id, next_review) index. The rows are also the full
+review history of every card, for retention analytics that never read
+flashcards.
+
+compact() folds the log into flashcards. review_log_state.compacted_through
+is the last review id already folded. Every card with a later review gets
+the state of its most recent review, in one UPDATE, and the watermark moves to
+the newest id. Both statements are writes, so the transaction holds the
+write lock before it reads the watermark. Two workers compacting at once
+are serialized by SQLite and never fold the same events twice.
+
+Compaction only runs in the background, every few seconds, so reads never
+take the write lock and keep running alongside the one writer under WAL.
+Until a review is compacted, its flashcards row is stale. Anything that
+needs the current state reads the uncompacted reviews past the watermark
+and lays them over the rows instead. The review endpoints schedule from
+them, and study, card listing, export and stats return them. The backlog
+is a few seconds of reviews, found by a primary key range scan.
+"""
+
+from sqlalchemy import text
+
+STATE_TABLE = "review_log_state"
+
+_SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (id INTEGER PRIMARY KEY, compacted_through INTEGER NOT NULL)",
+    f"INSERT OR IGNORE INTO {STATE_TABLE} (id, compacted_through) VALUES (1, 0)",
+]
+
+_WATERMARK = f"(SELECT compacted_through FROM {STATE_TABLE} WHERE id = 1)"
+
+_PENDING = f"SELECT count(*) FROM reviews WHERE id > {_WATERMARK}"
+
+# Newest review per card by reviewed_at, among its rows in the (card_id, id)
+# index. Offline reviews can be appended after newer ones.
+_FOLD = f"""
+    UPDATE flashcards
+    SET (difficulty, last_reviewed, review_count, ease, interval_days, next_review) = (
+        SELECT r.difficulty, r.reviewed_at, r.review_count, r.ease, r.interval_days, r.next_review
+        FROM reviews r
+        WHERE r.card_id = flashcards.id
+        ORDER BY r.reviewed_at DESC, r.id DESC
+        LIMIT 1
+    )
+    WHERE id IN (SELECT card_id FROM reviews WHERE id > {_WATERMARK})
+"""
+
+_ADVANCE = f"""
+    UPDATE {STATE_TABLE}
+    SET compacted_through = max(compacted_through, (SELECT coalesce(max(id), 0) FROM reviews))
+    WHERE id = 1
+"""
+
+
+def install(conn):
+    """Create the watermark row; the reviews table itself is a model in main.py"""
+    for statement in _SCHEMA:
+        conn.exec_driver_sql(statement)
+
+
+def uncompacted(table: str = "reviews"):
+    """WHERE clause for reviews that are not folded into flashcards yet;
+    table is the name or alias reviews is selected as"""
+    return text(f"{table}.id > {_WATERMARK}")
+
+
+def pending(db) -> int:
+    """Reviews not yet folded into flashcards"""
+    return db.execute(text(_PENDING)).scalar()
+
+
+def compact(db) -> int:
+    """Fold uncompacted reviews into flashcards and commit. Returns the
+    number of cards updated."""
+    if not pending(db):
+        return 0
+    folded = db.execute(text(_FOLD)).rowcount
+    db.execute(text(_ADVANCE))
+    db.commit()
+    return folded
@@ -0,0 +1,64 @@
+"""
+Spaced-repetition scheduling (SM-2 style) with a vectorized batch API.
+
+The rules and constants are in sm2.py, which schedules one card in plain
+Python; schedule_card() is re-exported from there, since a one-element
+NumPy call costs tens of microseconds in array setup alone.
+schedule_batch() applies the same rules to NumPy arrays, so thousands of
+cards can be rescheduled in one call.
+"""
+
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+import sm2
+from sm2 import DEFAULT_EASE, LAPSE_RATING, MAX_EASE, MAX_INTERVAL_DAYS, MIN_EASE, CardSchedule, schedule_card
+
+BASE_INTERVALS = np.array(sm2.BASE_INTERVALS)
+
+
+class Schedule(NamedTuple):
+    ease: np.ndarray           # float64, new ease factor per card
+    interval_days: np.ndarray  # float64, whole days until the next review
+    next_review: np.ndarray    # datetime64[us]
+
+
+def schedule_batch(difficulties, review_counts, last_intervals, eases=None, reviewed_at=None) -> Schedule:
+    """Schedule one review for each card.
+
+    difficulties: ratings 1 (hard) to 5 (easy).
+    review_counts: reviews each card had *before* this one.
+    last_intervals: days between the previous two reviews (0 if unknown).
+    eases: current ease factors (NaN or omitted means DEFAULT_EASE).
+    reviewed_at: one datetime for all cards, or an array of datetime64; defaults to now (UTC).
+    """
+    ratings = np.clip(np.asarray(difficulties, dtype=np.int64), 1, 5)
+    counts = np.asarray(review_counts, dtype=np.int64)
+    last = np.nan_to_num(np.asarray(last_intervals, dtype=np.float64), nan=0.0)
+    if eases is None:
+        ease = np.full(ratings.shape, DEFAULT_EASE)
+    else:
+        ease = np.nan_to_num(np.asarray(eases, dtype=np.float64), nan=DEFAULT_EASE)
+
+    # SM-2 ease update, with the 1-5 rating used directly as the quality score
+    miss = 5 - ratings
+    new_ease = np.clip(ease + 0.1 - miss * (0.08 + miss * 0.02), MIN_EASE, MAX_EASE)
+
+    base = BASE_INTERVALS[ratings]
+    grown = np.maximum(base, np.rint(last * new_ease))
+    first_review = (counts <= 0) | (last <= 0)
+    interval = np.where((ratings <= LAPSE_RATING) | first_review, base, grown)
+    interval = np.minimum(interval, MAX_INTERVAL_DAYS)
+
+    if reviewed_at is None:
+        reviewed_at = datetime.utcnow()
+    start = np.asarray(reviewed_at, dtype="datetime64[us]")
+    next_review = start + (interval * 86400e6).astype("timedelta64[us]")
+    return Schedule(new_ease, interval, next_review)
+
+
+def to_datetimes(values: np.ndarray):
+    """datetime64 array -> list of naive datetime objects"""
+    return values.astype("datetime64[us]").tolist()
@@ -0,0 +1,100 @@
+"""
+People search over flashcards with an SQLite FTS5 index.
+
+flashcards_fts is an external-content FTS5 table over person_name and
+person_role. It stores only the inverted index, not a second copy of the
+text. Triggers on flashcards keep it in sync, so every write path is
+covered, including bulk uploads, deck deletes and raw SQL. Reviews only
+update scheduling columns and don't fire the update trigger.
+
+Queries are split into words and each word is matched as a prefix
+("jo eng" finds "John Doe, Engineer"). Results are ranked with bm25, and a
+match in the name outweighs a match in the role. Every match is scored,
+so a one-letter prefix costs time in proportion to the cards it matches,
+but ORDER BY rank LIMIT n keeps only the best n while sorting.
+"""
+
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+
+FTS_TABLE = "flashcards_fts"
+NAME_WEIGHT = 10.0
+ROLE_WEIGHT = 2.0
+
+_SCHEMA = [
+    # prefix= keeps short prefix queries on the index instead of a term scan
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        person_name, person_role,
+        content='flashcards', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, person_name, person_role)
+        VALUES (new.id, new.person_name, new.person_role);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, person_name, person_role)
+        VALUES ('delete', old.id, old.person_name, old.person_role);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF person_name, person_role ON flashcards BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, person_name, person_role)
+        VALUES ('delete', old.id, old.person_name, old.person_role);
+        INSERT INTO {FTS_TABLE}(rowid, person_name, person_role)
+        VALUES (new.id, new.person_name, new.person_role);
+    END""",
+]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def install(conn):
+    """Create the index and its triggers if missing. A newly created index
+    is filled from the existing flashcards rows."""
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first()
+    if exists is None:
+        conn.exec_driver_sql(_SCHEMA[0])
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    for statement in _SCHEMA[1:]:
+        conn.exec_driver_sql(statement)
+
+
+def rebuild(conn):
+    """Re-index every card, e.g. after rows were changed with triggers disabled"""
+    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(q: str) -> Optional[str]:
+    """User input -> FTS5 MATCH expression: every word as a quoted prefix.
+    Quoting keeps FTS5 operators and punctuation in q from being parsed."""
+    words = _WORD.findall(q)
+    if not words:
+        return None
+    return " AND ".join(f'"{word}"*' for word in words)
+
+
+def search_cards(db, q: str, limit: int = 20, deck_id: Optional[int] = None) -> List:
+    """Best matches first; rows carry card and deck columns plus rank"""
+    expression = match_expression(q)
+    if expression is None:
+        return []
+    deck_filter = "AND f.deck_id = :deck_id" if deck_id is not None else ""
+    return db.execute(text(f"""
+        SELECT f.id, f.deck_id, d.name AS deck_name, f.person_name, f.person_role,
+               f.image_filename, bm25({FTS_TABLE}, :name_weight, :role_weight) AS rank
+        FROM {FTS_TABLE}
+        JOIN flashcards f ON f.id = {FTS_TABLE}.rowid
+        LEFT JOIN decks d ON d.id = f.deck_id
+        WHERE {FTS_TABLE} MATCH :expression {deck_filter}
+        ORDER BY rank
+        LIMIT :limit
+    """), {
+        "expression": expression,
+        "name_weight": NAME_WEIGHT,
+        "role_weight": ROLE_WEIGHT,
+        "limit": limit,
+        "deck_id": deck_id,
+    }).all()
@@ -0,0 +1,54 @@
+"""
+SM-2 style scheduling rules for a single card, in plain Python.
+
+A review rated 1 (hard) to 5 (easy) adjusts the card's ease factor the way
+SM-2 does. Ratings of 1-2 send the card back to its short base interval.
+Ratings of 3-5 grow the last interval by the new ease, never below the
+base interval for the rating.
+
+scheduling.py builds its NumPy batch API on these constants and re-exports
+schedule_card(). This module has no dependencies, so simple_app.py imports
+it too; Dockerfile.fly copies it next to simple_app.py.
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_EASE = 3.5
+MAX_INTERVAL_DAYS = 365
+
+# Days until the next review for a first review, or after a lapse, by rating 1..5
+BASE_INTERVALS = (1.0, 1.0, 2.0, 4.0, 7.0, 14.0)  # index 0 unused
+LAPSE_RATING = 2  # Ratings at or below this restart the card's interval
+
+
+class CardSchedule(NamedTuple):
+    ease: float
+    interval_days: float
+    next_review: datetime
+
+
+def schedule_card(difficulty: int, review_count: int, last_interval: Optional[float] = None,
+                  ease: Optional[float] = None, reviewed_at: Optional[datetime] = None) -> CardSchedule:
+    """Schedule a single review; the scalar form of scheduling.schedule_batch()"""
+    rating = min(max(int(difficulty), 1), 5)
+    last = 0.0 if last_interval is None or math.isnan(last_interval) else float(last_interval)
+    if ease is None or math.isnan(ease):
+        ease = DEFAULT_EASE
+
+    miss = 5 - rating
+    new_ease = min(max(ease + 0.1 - miss * (0.08 + miss * 0.02), MIN_EASE), MAX_EASE)
+
+    base = BASE_INTERVALS[rating]
+    if rating <= LAPSE_RATING or review_count <= 0 or last <= 0:
+        interval = base
+    else:
+        interval = max(base, float(round(last * new_ease)))  # round() is half-to-even, like np.rint
+    interval = float(min(interval, MAX_INTERVAL_DAYS))
+
+    if reviewed_at is None:
+        reviewed_at = datetime.utcnow()
+    return CardSchedule(new_ease, interval, reviewed_at + timedelta(days=interval))
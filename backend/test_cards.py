@@ -0,0 +1,138 @@
+from sqlalchemy import text
+
+PEOPLE = [
+    ("Ada Lovelace", "Engineer"),
+    ("Grace Hopper", "Rear Admiral"),
+    ("Alan Turing", "Logician"),
+    ("Katherine Johnson", "Mathematician"),
+    ("Edsger Dijkstra", "Engineer"),
+]
+
+
+def test_keyset_pages_cover_the_deck_once(client, make_deck):
+    deck_id, card_ids = make_deck(PEOPLE)
+    seen = []
+    after = None
+    while True:
+        params = {"limit": 2} if after is None else {"limit": 2, "after": after}
+        response = client.get(f"/decks/{deck_id}/cards", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen += [card["id"] for card in page]
+        after = response.headers.get("x-next-cursor")
+        if after is None:
+            break
+        assert int(after) == page[-1]["id"]
+    assert seen == sorted(card_ids)
+
+    streamed = client.get(f"/decks/{deck_id}/cards").json()
+    assert [card["id"] for card in streamed] == sorted(card_ids)
+    assert client.get(f"/decks/{deck_id}/cards", params={"after": card_ids[2]}).json() == streamed[3:]
+
+
+def test_last_full_page_has_no_cursor(client, make_deck):
+    deck_id, _ = make_deck(PEOPLE[:2])
+    response = client.get(f"/decks/{deck_id}/cards", params={"limit": 2})
+    assert len(response.json()) == 2
+    assert "x-next-cursor" not in response.headers
+
+
+def test_field_projection(client, make_deck):
+    deck_id, card_ids = make_deck(PEOPLE[:1])
+    cards = client.get(f"/decks/{deck_id}/cards", params={"fields": "person_name,thumbnail_url"}).json()
+    assert list(cards[0]) == ["id", "person_name", "thumbnail_url"]
+    assert cards[0]["thumbnail_url"].startswith("/images/")
+    assert client.get(f"/decks/{deck_id}/cards", params={"fields": "password"}).status_code == 400
+
+
+def test_search_matches_name_and_role_prefixes(client, make_deck):
+    deck_id, (ada, grace, alan, katherine, edsger) = make_deck(PEOPLE)
+
+    def search(q):
+        return [hit["id"] for hit in client.get("/search", params={"q": q, "deck_id": deck_id}).json()]
+
+    assert search("grac") == [grace]
+    assert search("grace hop") == [grace]
+    assert sorted(search("engineer")) == sorted([ada, edsger])
+    assert search("admiral") == [grace]
+    assert search("nobody") == []
+
+    hit = client.get("/search", params={"q": "turing", "deck_id": deck_id}).json()[0]
+    assert (hit["person_name"], hit["deck_id"]) == ("Alan Turing", deck_id)
+
+
+def test_search_ranks_name_matches_above_role_matches(client, make_deck):
+    deck_id, (in_name, in_role) = make_deck([("Lee Logic", "Engineer"), ("Ann Smith", "Logic Lead")])
+    hits = client.get("/search", params={"q": "logic", "deck_id": deck_id}).json()
+    assert [hit["id"] for hit in hits] == [in_name, in_role]
+
+
+def test_search_index_follows_deletes(client, make_deck):
+    deck_id, (ada, *_) = make_deck(PEOPLE[:2])
+    client.delete(f"/cards/{ada}")
+    assert client.get("/search", params={"q": "ada", "deck_id": deck_id}).json() == []
+
+
+def test_search_ranks_the_whole_match_set(client, db, make_deck):
+    deck_id, (oldest,) = make_deck([("Quill Quentin", "Engineer")])
+    # Far more newer role-only matches than one page
+    db.execute(text(
+        "INSERT INTO flashcards (deck_id, person_name, person_role, image_filename, front, back, difficulty, review_count)"
+        " VALUES (:deck_id, 'Someone', 'Quill Keeper', 'x.jpg', '', '', 0, 0)"
+    ), [{"deck_id": deck_id}] * 6000)
+    db.commit()
+    hits = client.get("/search", params={"q": "quill", "deck_id": deck_id, "limit": 5}).json()
+    assert hits[0]["id"] == oldest
+    assert len(hits) == 5
+
+
+def test_quiz_distractors_never_include_the_answer(client, make_deck):
+    deck_id, _ = make_deck(PEOPLE + [("Ada Lovelace", "Logician")])
+    for seed in range(20):
+        questions = client.get(f"/decks/{deck_id}/quiz", params={"distractors": 4, "seed": seed}).json()
+        assert len(questions) == len(PEOPLE) + 1
+        for question in questions:
+            options = question["options"]
+            assert len(options) == len(set(options)) == 5
+            assert options.count(question["card"]["person_name"]) == 1
+
+
+def test_simple_app_quiz_distractors_never_include_the_answer(simple_app, simple_client):
+    deck_id = simple_client.post("/decks", json={"name": "Team"}).json()["id"]
+    with simple_app.db_pool.connection() as conn:
+        conn.executemany(
+            "INSERT INTO flashcards (deck_id, person_name, person_role, image_filename, front, back)"
+            " VALUES (?, ?, ?, 'card.jpg', '', '')", [(deck_id, name, role) for name, role in PEOPLE]
+        )
+        conn.commit()
+    for seed in range(20):
+        questions = simple_client.get(f"/decks/{deck_id}/quiz", params={"distractors": 3, "seed": seed}).json()
+        assert len(questions) == len(PEOPLE)
+        for question in questions:
+            assert len(set(question["options"])) == 4
+            assert question["options"].count(question["person_name"]) == 1
+
+
+def test_export_import_round_trip(client, make_deck):
+    deck_id, (reviewed, _) = make_deck(PEOPLE[:2], name="Founders")
+    client.post(f"/cards/{reviewed}/review", json={"card_id": reviewed, "difficulty": 4})
+    fields = ("person_name", "person_role", "difficulty", "review_count", "next_review", "last_reviewed")
+
+    def contents(deck_id):
+        cards = client.get(f"/decks/{deck_id}/cards").json()
+        return [
+            ({field: card[field] for field in fields}, client.get(f"/images/{card['image_filename']}").content)
+            for card in cards
+        ]
+
+    bundle = client.get(f"/decks/{deck_id}/export")
+    assert bundle.status_code == 200
+    imported = client.post("/decks/import", files={"bundle": ("founders.tar", bundle.content, "application/x-tar")})
+    assert imported.status_code == 200, imported.text
+    copy = imported.json()
+    assert copy["deck"]["name"] == "Founders"
+    assert copy["deck"]["id"] != deck_id
+    original = contents(deck_id)
+    assert [card["review_count"] for card, _ in original] == [1, 0]
+    assert contents(copy["deck"]["id"]) == original
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+import compression
+
+
+def streaming_app(middleware, minimum_size):
+    async def stream(request):
+        chunk = b"x" * int(request.query_params["chunk"])
+
+        async def body():
+            for _ in range(int(request.query_params["chunks"])):
+                yield chunk
+        return StreamingResponse(body(), media_type="application/json")
+
+    app = Starlette(routes=[Route("/", stream)])
+    return TestClient(middleware(app, minimum_size=minimum_size))
+
+
+def test_short_streamed_response_is_not_compressed():
+    client = streaming_app(compression.CompressionMiddleware, minimum_size=100)
+    response = client.get("/", params={"chunk": 10, "chunks": 5}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content == b"x" * 50
+
+
+def test_streamed_response_is_compressed_once_minimum_size_arrives():
+    client = streaming_app(compression.CompressionMiddleware, minimum_size=100)
+    response = client.get("/", params={"chunk": 30, "chunks": 10}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b"x" * 300  # Decoded by the client
+
+
+def test_index_page_has_one_charset(simple_client):
+    response = simple_client.get("/")
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+
+
+def test_simple_app_compresses_large_json(simple_client):
+    simple_client.post("/decks", json={"name": "x" * 2000})
+    response = simple_client.get("/decks", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "x" * 2000 in response.text
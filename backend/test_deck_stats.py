@@ -0,0 +1,95 @@
+import deck_stats
+import review_log
+from sqlalchemy import text
+
+
+def deck_card_count(client, deck_id):
+    return next(deck["card_count"] for deck in client.get("/decks").json() if deck["id"] == deck_id)
+
+
+def test_deck_list_counts_cards_from_stats_tables(client, make_deck):
+    deck_id, (first, _) = make_deck([("Ada Lovelace", "Engineer"), ("Grace Hopper", "Admiral")])
+    empty_id, _ = make_deck(name="Empty")
+    assert deck_card_count(client, deck_id) == 2
+    assert deck_card_count(client, empty_id) == 0
+
+    assert client.delete(f"/cards/{first}").status_code == 200
+    assert deck_card_count(client, deck_id) == 1
+
+
+def test_mean_difficulty_leaves_out_unreviewed_cards(client, db, make_deck):
+    deck_id, (first, second, _) = make_deck([("Ada", "Engineer"), ("Grace", "Admiral"), ("Alan", "Logician")])
+    stats = client.get(f"/decks/{deck_id}/stats").json()
+    assert (stats["unreviewed"], stats["mean_difficulty"], stats["difficulty_histogram"]) == (3, None, {})
+
+    client.post(f"/cards/{first}/review", json={"card_id": first, "difficulty": 5})
+    client.post(f"/cards/{second}/review", json={"card_id": second, "difficulty": 2})
+    pending = client.get(f"/decks/{deck_id}/stats").json()
+    review_log.compact(db)
+    compacted = client.get(f"/decks/{deck_id}/stats").json()
+    for stats in (pending, compacted):
+        assert stats["unreviewed"] == 1
+        assert stats["mean_difficulty"] == 3.5
+        assert stats["difficulty_histogram"] == {"2": 1, "5": 1}
+
+
+def test_review_difficulty_must_be_1_to_5(client, make_deck):
+    _, (card_id,) = make_deck([("Ada", "Engineer")])
+    for difficulty in (0, 6):
+        assert client.post(f"/cards/{card_id}/review", json={"card_id": card_id, "difficulty": difficulty}).status_code == 422
+        batch = {"reviews": [{"card_id": card_id, "difficulty": difficulty}]}
+        assert client.post("/reviews/batch", json=batch).status_code == 422
+
+
+def test_install_replaces_outdated_triggers_and_rebuilds(main, db, make_deck):
+    deck_id, _ = make_deck([("Ada", "Engineer")])
+    connection = db.connection()
+    connection.exec_driver_sql("DROP TRIGGER deck_stats_insert")
+    connection.exec_driver_sql("CREATE TRIGGER deck_stats_insert AFTER INSERT ON flashcards BEGIN SELECT 1; END")
+    connection.exec_driver_sql("UPDATE deck_stats SET card_count = 99 WHERE deck_id = ?", (deck_id,))
+    deck_stats.install(connection)
+    db.commit()
+
+    trigger = db.execute(text("SELECT sql FROM sqlite_master WHERE name = 'deck_stats_insert'")).scalar()
+    assert trigger == deck_stats._TRIGGERS["deck_stats_insert"]
+    assert db.execute(text("SELECT card_count FROM deck_stats WHERE deck_id = :id"), {"id": deck_id}).scalar() == 1
+
+
+def stats_rows(db, deck_id):
+    params = {"deck_id": deck_id}
+    return (
+        db.execute(text("SELECT card_count, review_total FROM deck_stats WHERE deck_id = :deck_id"), params).all(),
+        db.execute(text(
+            "SELECT difficulty, card_count FROM deck_difficulty_counts WHERE deck_id = :deck_id ORDER BY 1"
+        ), params).all(),
+        db.execute(text(
+            "SELECT due_day, card_count FROM deck_due_counts WHERE deck_id = :deck_id ORDER BY 1"
+        ), params).all(),
+    )
+
+
+def test_triggers_match_a_rebuild(client, db, make_deck):
+    deck_id, (first, second, third) = make_deck([("Ada", "Engineer"), ("Grace", "Admiral"), ("Alan", "Logician")])
+    client.post(f"/cards/{first}/review", json={"card_id": first, "difficulty": 4})
+    client.post(f"/cards/{second}/review", json={"card_id": second, "difficulty": 4})
+    client.post(f"/cards/{second}/review", json={"card_id": second, "difficulty": 1})
+    review_log.compact(db)
+    client.delete(f"/cards/{third}")
+    db.execute(text("UPDATE flashcards SET next_review = '2030-01-01 00:00:00' WHERE id = :id"), {"id": first})
+    db.commit()
+
+    totals, difficulties, due_days = stats_rows(db, deck_id)
+    assert [tuple(row) for row in totals] == [(2, 3)]
+    assert [tuple(row) for row in difficulties] == [(1, 1), (4, 1)]
+    assert sum(count for _, count in due_days) == 2
+    assert ("2030-01-01", 1) in [tuple(row) for row in due_days]
+
+    deck_stats.rebuild(db.connection())
+    assert stats_rows(db, deck_id) == (totals, difficulties, due_days)
+    db.rollback()
+
+
+def test_deleting_a_deck_drops_its_stats(client, db, make_deck):
+    deck_id, _ = make_deck([("Ada", "Engineer")])
+    assert client.delete(f"/decks/{deck_id}").status_code == 200
+    assert stats_rows(db, deck_id) == ([], [], [])
@@ -0,0 +1,7 @@
+def test_simple_app_metrics_count_queries_per_route(simple_client):
+    simple_client.get("/decks")
+    text = simple_client.get("/metrics").text
+    assert 'flashcards_http_request_duration_seconds_count{method="GET",route="/decks",status="200"}' in text
+    queries = [line for line in text.splitlines() if line.startswith('flashcards_db_queries_per_request_sum{route="/decks"}')]
+    assert queries and float(queries[0].split()[-1]) > 0
+    assert "flashcards_active_tokens " in text
@@ -1,47 +1,37 @@
-# Test the filename parsing logic
-def parse_filename(filename):
-    """Test function to demonstrate filename parsing"""
-    name_without_ext = filename.replace('.jpg', '').replace('.png', '').replace('.jpeg', '')
-    
-    if ' - ' in name_without_ext:
-        # Format: "John Doe - Software Engineer"
-        parts = name_without_ext.split(' - ')
-        person_name = parts[0].strip()
-        person_role = parts[1].strip() if len(parts) > 1 else "Team Member"
-    elif '_' in name_without_ext:
-        # Format: "John_Doe_Software_Engineer"
-        parts = name_without_ext.split('_')
-        if len(parts) >= 3:
-            person_name = ' '.join(parts[:-1])
-            person_role = parts[-1].replace('_', ' ')
-        elif len(parts) == 2:
-            person_name = parts[0].replace('_', ' ')
-            person_role = parts[1].replace('_', ' ')
-        else:
-            person_name = name_without_ext.replace('_', ' ')
-            person_role = "Team Member"
-    else:
-        person_name = name_without_ext
-        person_role = "Team Member"
-    
-    return person_name, person_role
+import pytest
 
-# Test examples
-test_files = [
-    "John Doe - Software Engineer.jpg",
-    "Jane_Smith_Marketing_Manager.png", 
-    "Bob_Wilson_Sales.jpg",
-    "Alice Johnson - Product Manager.jpeg",
-    "Tom_Brown_HR.jpg",
-    "Sarah_Davis.png",
-    "Mike Thompson.jpg"
-]
+from filename_parser import DEFAULT_ROLE, filename_error, parse, parse_filename
 
-print("Filename Parsing Test Results:")
-print("=" * 50)
-for filename in test_files:
-    name, role = parse_filename(filename)
-    print(f"File: {filename}")
-    print(f"  → Name: {name}")
-    print(f"  → Role: {role}")
-    print()
+
+@pytest.mark.parametrize("filename, expected", [
+    ("John Doe - Software Engineer.jpg", ("John Doe", "Software Engineer")),
+    ("Jane_Smith_Marketing_Manager.png", ("Jane Smith", "Marketing Manager")),
+    ("Bob_Wilson_Sales.jpg", ("Bob Wilson", "Sales")),
+    ("Alice Johnson - Product Manager.jpeg", ("Alice Johnson", "Product Manager")),
+    ("Tom_Brown_HR.jpg", ("Tom Brown", "HR")),
+    ("Sarah_Davis.png", ("Sarah", "Davis")),
+    ("Mike Thompson.jpg", ("Mike Thompson", DEFAULT_ROLE)),
+    ("Mary Ann - Lead - Platform.jpg", ("Mary Ann", "Lead - Platform")),  # First " - " splits
+    ("Jean_Luc_Picard_Starship_Captain.jpg", ("Jean Luc Picard", "Starship Captain")),
+    ("  Padded Name  .jpg", ("Padded Name", DEFAULT_ROLE)),
+])
+def test_parse_filename(filename, expected):
+    assert parse_filename(filename) == expected
+
+
+def test_parse_keeps_lowercased_extension():
+    assert parse("Ada Lovelace - Engineer.JPG").extension == "jpg"
+    assert parse("archive.tar.gz").extension == "gz"
+    assert parse("no extension").extension == ""
+
+
+@pytest.mark.parametrize("filename, error", [
+    ("Ada Lovelace - Engineer.jpg", None),
+    ("Grace Hopper.HEIC", None),
+    ("notes.txt", "File notes.txt is not an image"),
+    ("Ada Lovelace", "File Ada Lovelace is not an image"),
+    (".png", "Could not parse name from filename: .png"),
+    (" - Engineer.png", "Could not parse name from filename:  - Engineer.png"),
+])
+def test_filename_error(filename, error):
+    assert filename_error(parse(filename), filename) == error
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from rescheduling import RescheduleJobs
+
+
+def set_schedule(db, main, card_id, days_overdue, interval_days):
+    now = datetime.utcnow()
+    db.execute(update(main.Flashcard).where(main.Flashcard.id == card_id).values(
+        next_review=now - timedelta(days=days_overdue),
+        last_reviewed=now - timedelta(days=days_overdue + interval_days),
+        interval_days=interval_days,
+        review_count=3,
+    ))
+
+
+def due_days(db, main, card_ids):
+    """card_id -> days from now until next_review, rounded (negative when overdue)"""
+    now = datetime.utcnow()
+    rows = db.execute(select(main.Flashcard.id, main.Flashcard.next_review).where(main.Flashcard.id.in_(card_ids)))
+    return {card_id: round((next_review - now).total_seconds() / 86400) for card_id, next_review in rows}
+
+
+def test_catch_up_spreads_backlog_by_relative_overdueness(client, db, main, make_deck):
+    deck_id, card_ids = make_deck([(f"Person {i}", "Engineer") for i in range(5)])
+    # (days overdue, interval): priority is overdue / interval
+    schedules = [(10, 2.0), (10, 60.0), (3, 1.0), (20, 100.0), (6, 30.0)]
+    for card_id, (days_overdue, interval_days) in zip(card_ids, schedules):
+        set_schedule(db, main, card_id, days_overdue, interval_days)
+    db.commit()
+
+    job = client.post(f"/decks/{deck_id}/reschedule", params={"daily_cap": 2}).json()
+    job = client.get(f"/reschedule-jobs/{job['job_id']}").json()  # Background tasks run before the response
+    assert job["state"] == "done"
+    assert (job["total"], job["to_reschedule"], job["days_spread"]) == (5, 3, 3)
+
+    db.expire_all()
+    days = due_days(db, main, card_ids)
+    # Priorities 5 and 3 keep today's two slots and stay overdue; the two
+    # at 0.2 move to tomorrow and the one at 0.17 to the day after
+    assert [days[card_id] for card_id in card_ids] == [-10, 2, -3, 1, 1]
+
+
+def test_catch_up_invalidates_the_due_queue(client, db, main, due_queues, make_deck):
+    deck_id, card_ids = make_deck([(f"Person {i}", "Engineer") for i in range(3)])
+    for card_id in card_ids:
+        set_schedule(db, main, card_id, days_overdue=5, interval_days=10.0)
+    db.commit()
+
+    def study():
+        return {card["id"] for card in client.get(f"/decks/{deck_id}/study").json()}
+
+    assert study() == set(card_ids)
+    client.post(f"/decks/{deck_id}/reschedule", params={"daily_cap": 1})
+    assert len(study()) == 1
+
+
+def test_catch_up_leaves_decks_without_backlog_alone(client, make_deck):
+    deck_id, _ = make_deck([("Ada Lovelace", "Engineer")])
+    job = client.post(f"/decks/{deck_id}/reschedule", params={"daily_cap": 10}).json()
+    job = client.get(f"/reschedule-jobs/{job['job_id']}").json()
+    assert job["state"] == "done"
+    assert job["to_reschedule"] == 0
+
+
+def test_catch_up_rejects_bad_requests(client):
+    assert client.post("/decks/999999/reschedule").status_code == 404
+    assert client.get("/reschedule-jobs/nope").status_code == 404
+
+
+def test_finished_jobs_are_evicted_after_the_ttl_or_over_the_cap():
+    now = datetime(2024, 1, 1)
+    jobs = RescheduleJobs(finished_ttl=timedelta(hours=1), max_finished=2, clock=lambda: now)
+
+    def finish(deck_id, minutes_ago):
+        job, _ = jobs.create(deck_id, daily_cap=10)
+        job.state = "done"
+        job.finished_at = now - timedelta(minutes=minutes_ago)
+        return job
+
+    expired = finish(1, 61)
+    running, _ = jobs.create(2, daily_cap=10)
+    assert jobs.get(expired.id) is None
+    assert jobs.get(running.id) is running
+
+    oldest, newer, newest = finish(3, 30), finish(4, 20), finish(5, 10)
+    assert jobs.get(oldest.id) is None
+    assert [jobs.get(job.id) for job in (newer, newest)] == [newer, newest]
+    assert len(jobs) == 3
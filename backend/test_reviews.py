@@ -0,0 +1,156 @@
+import time
+from datetime import datetime
+
+import review_log
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, text
+
+from conftest import jpeg
+
+
+def review_counts(db, card_ids):
+    rows = db.execute(text(
+        "SELECT id, review_count FROM flashcards WHERE id IN (%s)" % ",".join(map(str, card_ids))
+    ))
+    return dict(rows.all())
+
+
+def watermark(db):
+    return db.execute(text("SELECT compacted_through FROM review_log_state WHERE id = 1")).scalar()
+
+
+def test_compact_folds_newest_review_and_advances_watermark(client, db, make_deck):
+    review_log.compact(db)
+    _, (card_id,) = make_deck([("Ada Lovelace", "Engineer")])
+    for difficulty in (2, 5):
+        assert client.post(f"/cards/{card_id}/review", json={"card_id": card_id, "difficulty": difficulty}).status_code == 200
+
+    assert review_log.pending(db) == 2
+    assert review_counts(db, [card_id]) == {card_id: 0}
+
+    assert review_log.compact(db) == 1
+    newest = db.execute(text("SELECT max(id) FROM reviews")).scalar()
+    assert watermark(db) == newest
+    assert review_log.pending(db) == 0
+    row = db.execute(text("SELECT difficulty, review_count FROM flashcards WHERE id = :id"), {"id": card_id}).first()
+    assert tuple(row) == (5, 2)
+
+
+def test_compact_skips_reviews_behind_the_watermark(client, db, make_deck):
+    _, (first, second) = make_deck([("Ada Lovelace", "Engineer"), ("Grace Hopper", "Admiral")])
+    client.post(f"/cards/{first}/review", json={"card_id": first, "difficulty": 3})
+    review_log.compact(db)
+    compacted = watermark(db)
+
+    # A folded review is not applied again, even to a row changed since
+    db.execute(text("UPDATE flashcards SET review_count = 7 WHERE id = :id"), {"id": first})
+    db.commit()
+    assert review_log.compact(db) == 0
+    assert watermark(db) == compacted
+
+    client.post(f"/cards/{second}/review", json={"card_id": second, "difficulty": 3})
+    assert review_log.compact(db) == 1
+    assert watermark(db) > compacted
+    assert review_counts(db, [first, second]) == {first: 7, second: 1}
+
+
+def test_reads_include_uncompacted_reviews_without_compacting(client, db, make_deck):
+    review_log.compact(db)
+    deck_id, (reviewed, unreviewed) = make_deck([("Ada Lovelace", "Engineer"), ("Grace Hopper", "Admiral")])
+    client.post(f"/cards/{reviewed}/review", json={"card_id": reviewed, "difficulty": 4})
+
+    cards = {card["id"]: card for card in client.get(f"/decks/{deck_id}/cards").json()}
+    assert cards[reviewed]["review_count"] == 1
+    assert cards[reviewed]["difficulty"] == 4
+    assert cards[unreviewed]["review_count"] == 0
+
+    paged = client.get(f"/decks/{deck_id}/cards", params={"limit": 10, "fields": "id,review_count"}).json()
+    assert {card["id"]: card["review_count"] for card in paged} == {reviewed: 1, unreviewed: 0}
+
+    assert [card["id"] for card in client.get(f"/decks/{deck_id}/study").json()] == [unreviewed]
+
+    stats = client.get(f"/decks/{deck_id}/stats").json()
+    assert stats["review_total"] == 1
+    assert stats["due_today"] == 1
+
+    assert review_log.pending(db) == 1
+    assert review_counts(db, [reviewed]) == {reviewed: 0}
+
+
+def test_late_offline_review_does_not_rewind_the_card(client, db, make_deck):
+    _, (card_id,) = make_deck([("Ada Lovelace", "Engineer")])
+    current = client.post("/reviews/batch", json={"reviews": [{"card_id": card_id, "difficulty": 5}]}).json()
+    assert current[0]["status"] == "reviewed"
+
+    late = client.post("/reviews/batch", json={"reviews": [
+        {"card_id": card_id, "difficulty": 1, "reviewed_at": "2020-01-01T00:00:00Z"},
+    ]}).json()
+    assert late == [{**current[0], "status": "stale"}]
+
+    review_log.compact(db)
+    row = db.execute(text("SELECT review_count, next_review FROM flashcards WHERE id = :id"), {"id": card_id}).first()
+    assert row.review_count == 1
+    assert not row.next_review.startswith("2020")
+
+
+def test_compact_folds_the_most_recent_review_not_the_last_appended(client, db, main, make_deck):
+    deck_id, (card_id,) = make_deck([("Ada Lovelace", "Engineer")])
+    review_log.compact(db)
+    review = {"card_id": card_id, "deck_id": deck_id, "review_count": 1, "ease": 2.5, "interval_days": 1.0}
+    db.execute(insert(main.Review), [
+        {**review, "difficulty": 4, "reviewed_at": datetime(2024, 6, 1), "next_review": datetime(2024, 6, 2)},
+        {**review, "difficulty": 1, "reviewed_at": datetime(2020, 1, 1), "next_review": datetime(2020, 1, 2)},
+    ])
+    db.commit()
+
+    review_log.compact(db)
+    row = db.execute(text("SELECT difficulty, next_review FROM flashcards WHERE id = :id"), {"id": card_id}).first()
+    assert row.difficulty == 4
+    assert row.next_review.startswith("2024-06-02")
+
+
+def test_lifespan_runs_background_compaction(client, db, main, make_deck, monkeypatch):
+    _, (card_id,) = make_deck([("Ada Lovelace", "Engineer")])
+    client.post(f"/cards/{card_id}/review", json={"card_id": card_id, "difficulty": 3})
+    monkeypatch.setattr(main, "REVIEW_COMPACT_SECONDS", 0.01)
+    with TestClient(main.app):
+        for _ in range(200):
+            if review_log.pending(db) == 0:
+                break
+            time.sleep(0.01)
+    assert review_log.pending(db) == 0
+
+
+def test_due_queue_follows_reviews_and_new_cards(client, due_queues, make_deck):
+    deck_id, (reviewed, kept) = make_deck([("Ada Lovelace", "Engineer"), ("Grace Hopper", "Admiral")])
+
+    def study():
+        return sorted(card["id"] for card in client.get(f"/decks/{deck_id}/study").json())
+
+    assert study() == [reviewed, kept]
+    assert len(due_queues) == 2  # Warm
+    client.post(f"/cards/{reviewed}/review", json={"card_id": reviewed, "difficulty": 5})
+    assert study() == [kept]
+
+    added = client.post("/cards", data={"deck_id": deck_id, "person_name": "Alan Turing", "person_role": "Logician"},
+                        files={"image": ("card.jpg", jpeg(), "image/jpeg")}).json()["id"]
+    assert study() == [kept, added]
+    client.delete(f"/cards/{kept}")
+    assert study() == [added]
+
+
+def test_simple_app_skips_late_offline_reviews(simple_app, simple_client):
+    deck_id = simple_client.post("/decks", json={"name": "Team"}).json()["id"]
+    with simple_app.db_pool.connection() as conn:
+        card_id = conn.execute(
+            "INSERT INTO flashcards (deck_id, person_name, person_role, image_filename, front, back)"
+            " VALUES (?, 'Ada Lovelace', 'Engineer', 'ada.jpg', '', '')", (deck_id,)
+        ).lastrowid
+        conn.commit()
+
+    current = simple_client.post("/reviews/batch", json={"reviews": [{"card_id": card_id, "difficulty": "easy"}]}).json()
+    late = simple_client.post("/reviews/batch", json={"reviews": [
+        {"card_id": card_id, "difficulty": "hard", "reviewed_at": "2020-01-01T00:00:00Z"},
+    ]}).json()
+    assert current[0]["status"] == "reviewed"
+    assert late == [{**current[0], "status": "stale"}]
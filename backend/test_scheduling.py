@@ -0,0 +1,74 @@
+import itertools
+from datetime import datetime, timedelta
+
+import sm2
+from scheduling import schedule_batch, schedule_card, to_datetimes
+
+
+def test_schedule_card_matches_schedule_batch():
+    reviewed_at = datetime(2024, 3, 1, 9, 30, 15, 123456)
+    cases = list(itertools.product(
+        [0, 1, 2, 3, 4, 5, 6],                                  # difficulty, clipped to 1-5
+        [0, 1, 7],                                              # review_count
+        [None, float("nan"), 0.0, 0.5, 1.0, 2.5, 13.0, 300.0],  # last_interval
+        [None, float("nan"), 1.3, 1.75, 2.5, 3.5],              # ease
+    ))
+    batch = schedule_batch(
+        [difficulty for difficulty, _, _, _ in cases],
+        [review_count for _, review_count, _, _ in cases],
+        [0.0 if last is None else last for _, _, last, _ in cases],
+        [float("nan") if ease is None else ease for _, _, _, ease in cases],
+        reviewed_at,
+    )
+    next_reviews = to_datetimes(batch.next_review)
+    for i, case in enumerate(cases):
+        card = schedule_card(*case, reviewed_at=reviewed_at)
+        assert card.ease == batch.ease[i], case
+        assert card.interval_days == batch.interval_days[i], case
+        assert card.next_review == next_reviews[i], case
+
+
+def test_simple_app_schedules_with_the_shared_rules(simple_app, simple_client):
+    deck_id = simple_client.post("/decks", json={"name": "Team"}).json()["id"]
+    with simple_app.db_pool.connection() as conn:
+        card_id = conn.execute(
+            "INSERT INTO flashcards (deck_id, person_name, person_role, image_filename, front, back)"
+            " VALUES (?, 'Ada Lovelace', 'Engineer', 'ada.jpg', '', '')", (deck_id,)
+        ).lastrowid
+        conn.commit()
+
+    expected = sm2.schedule_card(5, 0)
+    expected = sm2.schedule_card(1, 1, expected.interval_days, expected.ease)
+    for difficulty in ("easy", "hard"):
+        assert simple_client.post(f"/cards/{card_id}/review", json={"difficulty": difficulty}).status_code == 200
+    with simple_app.db_pool.connection() as conn:
+        row = conn.execute("SELECT ease, interval_days FROM flashcards WHERE id = ?", (card_id,)).fetchone()
+    assert tuple(row) == (expected.ease, expected.interval_days)
+
+
+def test_simple_app_study_sampler_is_seedable_and_favours_due_cards(simple_app, simple_client):
+    deck_id = simple_client.post("/decks", json={"name": "Team"}).json()["id"]
+    now = datetime.now()
+    due = {(now - timedelta(days=1)).isoformat(): 10, (now + timedelta(days=30)).isoformat(): 50}
+    with simple_app.db_pool.connection() as conn:
+        conn.executemany(
+            "INSERT INTO flashcards (deck_id, person_name, person_role, image_filename, front, back, next_review)"
+            " VALUES (?, 'Ada Lovelace', 'Engineer', 'ada.jpg', '', '', ?)",
+            [(deck_id, next_review) for next_review, count in due.items() for _ in range(count)],
+        )
+        conn.commit()
+        due_ids = {row[0] for row in conn.execute(
+            "SELECT id FROM flashcards WHERE deck_id = ? AND next_review < ?", (deck_id, now.isoformat())
+        )}
+
+    def study(**params):
+        return [card["id"] for card in simple_client.get(f"/decks/{deck_id}/study", params=params).json()]
+
+    for weighted in (False, True):
+        assert study(seed=7, weighted=weighted) == study(seed=7, weighted=weighted)
+        assert study(seed=7, weighted=weighted) != study(seed=8, weighted=weighted)
+
+    # Uniform samples are about a sixth due cards, like the deck; DUE_WEIGHT raises that
+    def due_count(weighted):
+        return sum(len(due_ids.intersection(study(seed=seed, weighted=weighted))) for seed in range(50))
+    assert due_count(True) > 1.5 * due_count(False)
@@ -0,0 +1,43 @@
+import pytest
+
+from token_store import MemoryTokenStore, SQLiteTokenStore, TokenStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_store_cannot_be_instantiated_without_every_method():
+    class Partial(TokenStore):
+        def add(self, token, ttl_seconds):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_tokens_expire_and_can_be_revoked(backend, tmp_path):
+    clock = Clock()
+    if backend == "memory":
+        store = MemoryTokenStore(clock=clock)
+    else:
+        store = SQLiteTokenStore(str(tmp_path / "tokens.db"), clock=clock)
+    store.add("a", 60)
+    store.add("b", 60)
+    store.revoke("b")
+    assert store.is_valid("a") and not store.is_valid("b")
+    assert len(store) == 1
+
+    clock.now += 61
+    assert not store.is_valid("a")
+    assert len(store) == 0
+
+
+def test_simple_app_rejects_unknown_tokens(simple_client):
+    assert simple_client.get("/decks").status_code == 200
+    assert simple_client.get("/decks", headers={"Authorization": "Bearer nope"}).status_code == 401
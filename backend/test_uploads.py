@@ -0,0 +1,112 @@
+import io
+import os
+import zipfile
+
+from conftest import jpeg
+
+
+def test_bulk_upload_accepts_what_the_preview_accepts(client, make_deck):
+    deck_id, _ = make_deck()
+    filenames = ["Ada Lovelace - Engineer.jpg", "Grace_Hopper_Admiral.heic", "notes.txt", ".png"]
+    preview = client.post("/cards/bulk/preview", json={"deck_id": deck_id, "filenames": filenames}).json()
+
+    # Content types don't matter, only the filename
+    upload = client.post("/cards/bulk", data={"deck_id": deck_id}, files=[
+        ("images", (filenames[0], jpeg(), "application/octet-stream")),
+        ("images", (filenames[1], jpeg(), "image/heic")),
+        ("images", (filenames[2], jpeg(), "image/jpeg")),
+        ("images", (filenames[3], jpeg(), "image/png")),
+    ]).json()
+    assert [f["status"] for f in preview["files"]] == ["ok", "ok", "error", "error"]
+    assert [f["status"] for f in upload["files"]] == ["created", "created", "error", "error"]
+    assert [f["error"] for f in upload["files"]] == [f["error"] for f in preview["files"]]
+
+
+def test_images_are_cached_by_etag(client, main, make_deck):
+    deck_id, (card_id,) = make_deck([("Ada Lovelace", "Engineer")])
+    card = next(card for card in client.get(f"/decks/{deck_id}/cards").json() if card["id"] == card_id)
+    for url in (f"/images/{card['image_filename']}", card["thumbnail_url"]):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == main.IMAGE_CACHE_CONTROL
+        etag = response.headers["etag"]
+
+        revalidated = client.get(url, headers={"If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+        assert revalidated.content == b""
+
+    # Each width has its own tag
+    assert client.get(f"/images/{card['image_filename']}?w=64").headers["etag"] != etag
+
+
+def test_single_upload_uses_the_bulk_filename_rule(client, make_deck):
+    deck_id, _ = make_deck()
+    form = {"deck_id": deck_id, "person_name": "Ada Lovelace", "person_role": "Engineer"}
+    heic = client.post("/cards", data=form, files={"image": ("ada.heic", jpeg(), "application/octet-stream")})
+    assert heic.status_code == 200
+    text = client.post("/cards", data=form, files={"image": ("ada.txt", jpeg(), "image/jpeg")})
+    assert text.status_code == 400
+    assert text.json()["detail"] == "File ada.txt is not an image"
+
+
+def team_zip() -> bytes:
+    """One card's photo among OS metadata, a folder and a non-image"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("team/", b"")
+        archive.writestr("team/Ada Lovelace - Engineer.jpg", jpeg())
+        archive.writestr("__MACOSX/team/._Ada Lovelace - Engineer.jpg", b"resource fork")
+        archive.writestr("__MACOSX/team/Grace Hopper - Admiral.jpg", jpeg())
+        archive.writestr("team/.DS_Store", b"finder")
+        archive.writestr("team/notes.txt", b"not a photo")
+    return buffer.getvalue()
+
+
+def test_archive_import_skips_metadata_and_reports_non_images(client, make_deck):
+    deck_id, _ = make_deck()
+    response = client.post("/cards/archive", data={"deck_id": deck_id},
+                           files={"archive": ("team.zip", team_zip(), "application/zip")}).json()
+    assert (response["created_count"], response["error_count"]) == (1, 1)
+    assert [error["filename"] for error in response["errors"]] == ["team/notes.txt"]
+    cards = client.get(f"/decks/{deck_id}/cards").json()
+    assert [(card["person_name"], card["person_role"]) for card in cards] == [("Ada Lovelace", "Engineer")]
+
+
+def test_simple_app_archive_import_skips_metadata_and_reports_non_images(simple_app, simple_client):
+    deck_id = simple_client.post("/decks", json={"name": "Team"}).json()["id"]
+    response = simple_client.post("/bulk-upload/archive", data={"deck_id": deck_id},
+                                  files={"archive": ("team.zip", team_zip(), "application/zip")}).json()
+    assert (response["created_count"], response["error_count"]) == (1, 1)
+    assert [error["filename"] for error in response["errors"]] == ["team/notes.txt"]
+    with simple_app.db_pool.connection() as conn:
+        people = conn.execute("SELECT person_name, person_role FROM flashcards WHERE deck_id = ?", (deck_id,)).fetchall()
+    assert [tuple(row) for row in people] == [("Ada Lovelace", "Engineer")]
+
+
+def test_simple_app_rejects_uploads_that_are_not_archives(simple_client):
+    deck_id = simple_client.post("/decks", json={"name": "Team"}).json()["id"]
+    response = simple_client.post("/bulk-upload/archive", data={"deck_id": deck_id},
+                                  files={"archive": ("team.zip", b"plain text", "application/zip")})
+    assert response.status_code == 400
+
+
+def test_shared_images_are_removed_with_their_last_card(client, main, make_deck):
+    photo = jpeg((12, 34, 56))  # Not shared with other tests' cards
+
+    def add_card(deck_id):
+        form = {"deck_id": deck_id, "person_name": "Ada Lovelace", "person_role": "Engineer"}
+        return client.post("/cards", data=form, files={"image": ("ada.jpg", photo, "image/jpeg")}).json()
+
+    first_deck, _ = make_deck()
+    second_deck, _ = make_deck()
+    first, duplicate, other = add_card(first_deck), add_card(first_deck), add_card(second_deck)
+    assert first["image_filename"] == duplicate["image_filename"] == other["image_filename"]
+    path = main.image_store.path(first["image_filename"])
+
+    client.delete(f"/cards/{first['id']}")
+    assert os.path.isfile(path)
+    client.delete(f"/decks/{first_deck}")
+    assert os.path.isfile(path)
+    client.delete(f"/cards/{other['id']}")
+    assert not os.path.isfile(path)
@@ -0,0 +1,165 @@
+"""
+Access-token storage with real expiry and bounded memory.
+
+MemoryTokenStore keeps tokens per process. SQLiteTokenStore keeps them in a
+table so every uvicorn worker sharing the database file sees the same
+logins. Pick one with create_token_store().
+
+This module needs only the standard library, so simple_app.py imports it
+too; Dockerfile.fly copies it next to simple_app.py.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenStore(ABC):
+    @abstractmethod
+    def add(self, token: str, ttl_seconds: float):
+        """Store token until ttl_seconds from now"""
+
+    @abstractmethod
+    def is_valid(self, token: str) -> bool:
+        """True if token was added, has not expired and was not revoked"""
+
+    @abstractmethod
+    def revoke(self, token: str):
+        """Forget token; unknown tokens are ignored"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Unexpired tokens held"""
+
+
+class MemoryTokenStore(TokenStore):
+    """Tokens kept in issue order. Tokens share one TTL in practice, so the
+    oldest entry is also the next to expire and eviction only ever pops from
+    the front: O(1) per token."""
+
+    def __init__(self, max_tokens: int = 10000, clock=time.time):
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._expiry = OrderedDict()  # token -> expires_at
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        while self._expiry:
+            token, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now and len(self._expiry) <= self.max_tokens:
+                break
+            self._expiry.popitem(last=False)
+
+    def add(self, token: str, ttl_seconds: float):
+        with self._lock:
+            now = self._clock()
+            self._expiry[token] = now + ttl_seconds
+            self._expiry.move_to_end(token)
+            self._evict(now)
+
+    def is_valid(self, token: str) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._evict(now)
+            expires_at = self._expiry.get(token)
+            if expires_at is None:
+                return False
+            if expires_at <= now:
+                # Longer-lived tokens ahead of it kept it from being popped yet
+                del self._expiry[token]
+                return False
+            return True
+
+    def revoke(self, token: str):
+        with self._lock:
+            self._expiry.pop(token, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict(self._clock())
+            return len(self._expiry)
+
+
+class SQLiteTokenStore(TokenStore):
+    """Tokens in an access_tokens table, shared by all processes using the
+    same database file. Only a SHA-256 of each token is stored."""
+
+    PURGE_EVERY = 100  # Sweep expired rows once per this many logins
+
+    def __init__(self, path: str, max_tokens: int = 10000, clock=time.time):
+        self.path = path
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._local = threading.local()
+        self._adds = 0
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS access_tokens (
+                    token_hash TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_access_tokens_expires_at ON access_tokens (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def add(self, token: str, ttl_seconds: float):
+        now = self._clock()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO access_tokens (token_hash, expires_at) VALUES (?, ?)",
+                (self._hash(token), now + ttl_seconds),
+            )
+            self._adds += 1
+            if self._adds % self.PURGE_EVERY == 0:
+                self._purge(conn, now)
+
+    def _purge(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM access_tokens WHERE expires_at <= ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM access_tokens").fetchone()[0] - self.max_tokens
+        if excess > 0:
+            conn.execute("""
+                DELETE FROM access_tokens WHERE token_hash IN (
+                    SELECT token_hash FROM access_tokens ORDER BY expires_at LIMIT ?
+                )
+            """, (excess,))
+
+    def is_valid(self, token: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM access_tokens WHERE token_hash = ? AND expires_at > ?",
+            (self._hash(token), self._clock()),
+        ).fetchone()
+        return row is not None
+
+    def revoke(self, token: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM access_tokens WHERE token_hash = ?", (self._hash(token),))
+
+    def __len__(self) -> int:
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM access_tokens WHERE expires_at > ?", (self._clock(),)
+        ).fetchone()
+        return row[0]
+
+
+def create_token_store(backend: str = "memory", path: Optional[str] = None, max_tokens: int = 10000) -> TokenStore:
+    """backend is "memory" (per process) or "sqlite" (shared via the file at path)"""
+    if backend == "memory":
+        return MemoryTokenStore(max_tokens=max_tokens)
+    if backend == "sqlite":
+        return SQLiteTokenStore(path or "flashcards.db", max_tokens=max_tokens)
+    raise ValueError(f"Unknown token store backend: {backend}")
@@ -20,6 +20,10 @@ cd ..
 mkdir -p backend/static
 cp -r frontend/dist/* backend/static/
 
+# Precompress JS/CSS/HTML for PrecompressedStaticFiles
+echo "🗜️  Precompressing static assets..."
+(cd backend && python precompress_static.py static)
+
 echo "✅ Production build complete!"
 echo "📦 Files ready for deployment in backend/ directory"
 echo ""
@@ -11,6 +11,7 @@ interface Flashcard {
   person_name: string
   person_role: string
   image_filename: string
+  thumbnail_url: string | null
   difficulty: number
   review_count: number
 }
@@ -171,7 +172,9 @@ const StudySession = () => {
               <div className="card-label">Who is this person?</div>
               <div className="card-image">
                 <img 
-                  src={`http://localhost:8001/uploads/${currentCard.image_filename}`}
+                  src={currentCard.thumbnail_url
+                    ? `http://localhost:8001${currentCard.thumbnail_url}`
+                    : `http://localhost:8001/uploads/${currentCard.image_filename}`}
                   alt="Team member"
                   onError={(e) => {
                     (e.target as HTMLImageElement).src = '/api/placeholder/300/300'
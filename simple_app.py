@@ -4,22 +4,53 @@ This version has minimal dependencies for easier deployment
 """
 
 from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
+import time
 import uuid
 import shutil
 import secrets
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+from datetime import datetime
 import sqlite3
 import json
+import heapq
+import queue
+import random
+import threading
+import re
+import hashlib
+import mimetypes
+import gzip
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; originals are served without it
+    Image = None
+
+# Modules shared with backend/main.py live in backend/ here and are copied
+# next to this file in the Fly image (see Dockerfile.fly)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import archives
+import compression
+import filename_parser
+import sm2
+from metrics import MetricsMiddleware, MetricsRegistry, SamplingProfiler
+from quiz import QuizIndexCache
+from token_store import create_token_store
 
 # Simple authentication
 VALID_USERNAME = "dave"
 VALID_PASSWORD = "india"
-active_tokens = set()
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "720"))
+MAX_ACTIVE_TOKENS = int(os.environ.get("MAX_ACTIVE_TOKENS", "10000"))
 security = HTTPBearer()
 
 app = FastAPI(title="Team Flashcard API", version="1.0.0")
@@ -33,57 +64,257 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# brotli/gzip for JSON and other text responses of at least 1 KB (see backend/compression.py)
+app.add_middleware(
+    compression.CompressionMiddleware, minimum_size=int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+)
+
+# Request metrics for /metrics, and an optional sampling profiler for one
+# route (see backend/metrics.py). Queries are timed by the pool's connection
+# factory below. PROFILE_ROUTE=/decks/{deck_id}/study samples Python stacks
+# while that route is in flight; GET /debug/profile returns them.
+metrics = MetricsRegistry()
+profiler = SamplingProfiler(
+    os.environ["PROFILE_ROUTE"], interval=float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000
+) if os.environ.get("PROFILE_ROUTE") else None
+# Added last so it is outermost and times the whole request
+app.add_middleware(MetricsMiddleware, registry=metrics, profiler=profiler)
+
 # Create uploads directory
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# SQLite connection pool
+# Connections are opened once and reused, so each one keeps its own cache of
+# prepared statements. WAL lets readers run alongside a single writer, also
+# across uvicorn worker processes sharing the same database file.
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "flashcards.db")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+
+# Connection and cursor that time each statement for the request metrics.
+# Connection.execute() goes through cursor() but not Cursor.execute(), so
+# both classes are needed. Only execution is timed, not fetching rows.
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            metrics.record_query(time.perf_counter() - started)
+
+    def executemany(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            metrics.record_query(time.perf_counter() - started)
+
+    def executescript(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().executescript(*args)
+        finally:
+            metrics.record_query(time.perf_counter() - started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,  # Wait on a busy writer instead of failing immediately
+            check_same_thread=False,  # Pooled connections move between worker threads
+            cached_statements=256,
+            factory=InstrumentedConnection,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable enough with WAL, far fewer fsyncs
+        conn.execute("PRAGMA cache_size=-32000")  # ~32 MB page cache
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped reads
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                # Never hand out a connection with a transaction still open
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+db_pool = ConnectionPool(DATABASE_PATH, DB_POOL_SIZE)
+
 # Initialize SQLite database
 def init_db():
-    conn = sqlite3.connect('flashcards.db')
-    cursor = conn.cursor()
-    
-    # Create decks table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS decks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create flashcards table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS flashcards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            deck_id INTEGER,
-            person_name TEXT NOT NULL,
-            person_role TEXT NOT NULL,
-            image_filename TEXT,
-            front TEXT DEFAULT '',
-            back TEXT DEFAULT '',
-            difficulty INTEGER DEFAULT 3,
-            last_reviewed TIMESTAMP,
-            next_review TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            review_count INTEGER DEFAULT 0,
-            FOREIGN KEY (deck_id) REFERENCES decks (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        # Create decks table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS decks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Create flashcards table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS flashcards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                deck_id INTEGER,
+                person_name TEXT NOT NULL,
+                person_role TEXT NOT NULL,
+                image_filename TEXT,
+                front TEXT DEFAULT '',
+                back TEXT DEFAULT '',
+                difficulty INTEGER DEFAULT 3,
+                last_reviewed TIMESTAMP,
+                next_review TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                review_count INTEGER DEFAULT 0,
+                ease REAL DEFAULT 2.5,
+                interval_days REAL,
+                FOREIGN KEY (deck_id) REFERENCES decks (id)
+            )
+        ''')
+        
+        # Columns added after the first release
+        existing_columns = {row[1] for row in cursor.execute('PRAGMA table_info(flashcards)')}
+        for column, definition in (('ease', 'REAL DEFAULT 2.5'), ('interval_days', 'REAL')):
+            if column not in existing_columns:
+                cursor.execute(f'ALTER TABLE flashcards ADD COLUMN {column} {definition}')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_flashcards_deck_id ON flashcards (deck_id)')
+        
+        conn.commit()
 
 # Initialize database on startup
 init_db()
 
+# Study card sampling
+# Picks a deck's study batch without ORDER BY RANDOM(), which makes SQLite
+# sort the whole deck on every request. Uniform sessions walk a pre-shuffled
+# per-deck order with a cursor; weighted sessions draw one pass of
+# Efraimidis-Spirakis keys so due and often-failed cards come up more.
+STUDY_BATCH_SIZE = 20
+DUE_WEIGHT = 3.0
+
+class StudySampler:
+    def __init__(self):
+        self._orders = {}  # deck_id -> [shuffled card ids, cursor]
+        self._lock = threading.Lock()
+
+    def invalidate(self, deck_id: int):
+        with self._lock:
+            self._orders.pop(deck_id, None)
+
+    def sample(self, cursor, deck_id: int, limit: int, weighted: bool = False, seed: Optional[int] = None) -> List[int]:
+        if weighted:
+            return self._weighted_sample(cursor, deck_id, limit, random.Random(seed))
+        if seed is not None:
+            # Reproducible session: shuffle a fresh copy, leave the shared cursor alone
+            card_ids = self._load_ids(cursor, deck_id)
+            random.Random(seed).shuffle(card_ids)
+            return card_ids[:limit]
+        return self._advance(cursor, deck_id, limit)
+
+    def _load_ids(self, cursor, deck_id: int) -> List[int]:
+        cursor.execute('SELECT id FROM flashcards WHERE deck_id = ? ORDER BY id', (deck_id,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def _shuffled_ids(self, cursor, deck_id: int) -> List[int]:
+        card_ids = self._load_ids(cursor, deck_id)
+        random.shuffle(card_ids)
+        return card_ids
+
+    def _advance(self, cursor, deck_id: int, limit: int) -> List[int]:
+        with self._lock:
+            order = self._orders.get(deck_id)
+            if order is None:
+                order = self._orders[deck_id] = [self._shuffled_ids(cursor, deck_id), 0]
+            
+            card_ids, position = order
+            batch = card_ids[position:position + limit]
+            order[1] = position + len(batch)
+            
+            if len(batch) < limit:
+                # End of this pass: reshuffle, top up with cards not already in
+                # the batch and push the ones that are to the back of the new pass
+                served = set(batch)
+                fresh = self._shuffled_ids(cursor, deck_id)
+                unseen = [card_id for card_id in fresh if card_id not in served]
+                topup = unseen[:limit - len(batch)]
+                self._orders[deck_id] = [unseen + [card_id for card_id in fresh if card_id in served], len(topup)]
+                batch.extend(topup)
+            
+            return batch
+
+    def _weighted_sample(self, cursor, deck_id: int, limit: int, rng: random.Random) -> List[int]:
+        cursor.execute('''
+            SELECT id, difficulty, CASE WHEN next_review <= ? THEN 1 ELSE 0 END
+            FROM flashcards
+            WHERE deck_id = ?
+            ORDER BY id
+        ''', (datetime.now().isoformat(), deck_id))
+        
+        def keyed_rows():
+            for card_id, difficulty, is_due in cursor:
+                # difficulty: 1 = easy ... 5 = hard
+                weight = 1.0 + max((difficulty or 3) - 1, 0) / 2.0
+                if is_due:
+                    weight *= DUE_WEIGHT
+                yield rng.random() ** (1.0 / weight), card_id
+        
+        return [card_id for _, card_id in heapq.nlargest(limit, keyed_rows())]
+
+study_sampler = StudySampler()
+
+# Per-deck name/role indexes for quiz distractors (see backend/quiz.py),
+# built on first use and dropped when cards are added
+QUIZ_MAX_DISTRACTORS = 10
+quiz_index = QuizIndexCache()
+
+# Token storage with expiry (see backend/token_store.py). TOKEN_STORE=sqlite
+# keeps (hashed) tokens in the database so every uvicorn worker accepts the
+# same logins.
+active_tokens = create_token_store(
+    os.environ.get("TOKEN_STORE", "memory"),
+    path=DATABASE_PATH,
+    max_tokens=MAX_ACTIVE_TOKENS,
+)
+
 # Authentication functions
 def create_access_token():
     token = secrets.token_urlsafe(32)
-    active_tokens.add(token)
+    active_tokens.add(token, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
     return token
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    if credentials.credentials not in active_tokens:
+    if not active_tokens.is_valid(credentials.credentials):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -93,7 +324,7 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
 # Login endpoint
 @app.post("/login")
-async def login(username: str = Form(), password: str = Form()):
+def login(username: str = Form(), password: str = Form()):
     if username != VALID_USERNAME or password != VALID_PASSWORD:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -106,30 +337,42 @@ async def login(username: str = Form(), password: str = Form()):
 # Get all decks
 @app.get("/decks")
 def get_decks(current_user: str = Depends(verify_token)):
-    conn = sqlite3.connect('flashcards.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT d.id, d.name, d.description, d.created_at, COUNT(f.id) as card_count
-        FROM decks d
-        LEFT JOIN flashcards f ON d.id = f.deck_id
-        GROUP BY d.id, d.name, d.description, d.created_at
-        ORDER BY d.created_at DESC
-    ''')
-    
-    decks = []
-    for row in cursor.fetchall():
-        decks.append({
-            "id": row[0],
-            "name": row[1],
-            "description": row[2],
-            "created_at": row[3],
-            "card_count": row[4]
-        })
-    
-    conn.close()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT d.id, d.name, d.description, d.created_at, COUNT(f.id) as card_count
+            FROM decks d
+            LEFT JOIN flashcards f ON d.id = f.deck_id
+            GROUP BY d.id, d.name, d.description, d.created_at
+            ORDER BY d.created_at DESC
+        ''')
+        
+        decks = []
+        for row in cursor.fetchall():
+            decks.append({
+                "id": row[0],
+                "name": row[1],
+                "description": row[2],
+                "created_at": row[3],
+                "card_count": row[4]
+            })
+        
     return decks
 
+# Handlers that read a JSON body stay async and run their database work with
+# run_in_threadpool, since db_pool.connection() can block waiting for a free
+# connection or on SQLite's busy timeout
+def insert_deck(name: str, description: str) -> int:
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO decks (name, description) VALUES (?, ?)",
+            (name, description)
+        )
+        conn.commit()
+        return cursor.lastrowid
+
 # Create new deck
 @app.post("/decks")
 async def create_deck(request: Request, current_user: str = Depends(verify_token)):
@@ -140,18 +383,7 @@ async def create_deck(request: Request, current_user: str = Depends(verify_token
     if not name:
         raise HTTPException(status_code=400, detail="Deck name is required")
     
-    conn = sqlite3.connect('flashcards.db')
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "INSERT INTO decks (name, description) VALUES (?, ?)",
-        (name, description)
-    )
-    
-    deck_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
+    deck_id = await run_in_threadpool(insert_deck, name, description)
     return {
         "id": deck_id,
         "name": name,
@@ -160,79 +392,325 @@ async def create_deck(request: Request, current_user: str = Depends(verify_token
         "card_count": 0
     }
 
+# Dry run for bulk upload: parse and validate filenames, no image bytes
+MAX_PREVIEW_FILENAMES = 20000
+
+def deck_people(deck_id: int):
+    """(person_name, person_role) of the deck's cards, or None if there is no such deck"""
+    with db_pool.connection() as conn:
+        if conn.execute("SELECT 1 FROM decks WHERE id = ?", (deck_id,)).fetchone() is None:
+            return None
+        return set(conn.execute(
+            "SELECT person_name, person_role FROM flashcards WHERE deck_id = ?", (deck_id,)
+        ).fetchall())
+
+@app.post("/bulk-upload/preview")
+async def preview_bulk_upload(request: Request, current_user: str = Depends(verify_token)):
+    """Body: {"deck_id": 1, "filenames": ["John Doe - Engineer.jpg", ...]}"""
+    request_data = await request.json()
+    try:
+        deck_id = int(request_data["deck_id"])
+        filenames = [str(filename) for filename in request_data["filenames"]]
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Body needs deck_id and a filenames list")
+    if len(filenames) > MAX_PREVIEW_FILENAMES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PREVIEW_FILENAMES} filenames per preview")
+
+    existing = await run_in_threadpool(deck_people, deck_id)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+
+    seen_filenames = set()
+    files = []
+    error_count = 0
+    for filename in filenames:
+        parsed = filename_parser.parse(filename)
+        result = {"filename": filename, "status": "ok", "person_name": None, "person_role": None,
+                  "error": filename_parser.filename_error(parsed, filename), "warnings": []}
+        if result["error"]:
+            result["status"] = "error"
+            error_count += 1
+        else:
+            result["person_name"] = parsed.person_name
+            result["person_role"] = parsed.person_role
+            if (parsed.person_name, parsed.person_role) in existing:
+                result["warnings"].append(f"Deck already has a card for {parsed.person_name} ({parsed.person_role})")
+        if filename in seen_filenames:
+            result["warnings"].append(f"Duplicate filename in batch: {filename}")
+        seen_filenames.add(filename)
+        files.append(result)
+
+    return {"files": files, "valid_count": len(files) - error_count, "error_count": error_count}
+
 # Bulk upload endpoint
 @app.post("/bulk-upload")
-async def bulk_upload_photos(
+def bulk_upload_photos(
     deck_id: int = Form(),
     files: List[UploadFile] = File(...),
     current_user: str = Depends(verify_token)
 ):
-    conn = sqlite3.connect('flashcards.db')
-    cursor = conn.cursor()
-    
-    uploaded_count = 0
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        uploaded_count = 0
+        
+        for file in files:
+            # Accepted by the same filename rule the preview applies
+            filename = file.filename or ""
+            parsed = filename_parser.parse(filename)
+            if filename_parser.filename_error(parsed, filename) is None:
+                person_name, person_role = parsed.person_name, parsed.person_role
+                
+                # Save file
+                file_id = str(uuid.uuid4())
+                new_filename = f"{file_id}.{parsed.extension}"
+                file_path = os.path.join(UPLOAD_DIR, new_filename)
+                
+                with open(file_path, "wb") as buffer:
+                    shutil.copyfileobj(file.file, buffer)
+                
+                # Create flashcard record
+                cursor.execute('''
+                    INSERT INTO flashcards (deck_id, person_name, person_role, image_filename, front, back)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (deck_id, person_name, person_role, new_filename, person_name, person_role))
+                
+                uploaded_count += 1
+        
+        conn.commit()
+    study_sampler.invalidate(deck_id)
+    quiz_index.invalidate(deck_id)
     
-    for file in files:
-        if file.content_type and file.content_type.startswith('image/'):
-            # Parse filename to extract name and role
-            filename = file.filename
-            name_part = filename.rsplit('.', 1)[0]  # Remove extension
-            
-            if ' - ' in name_part:
-                person_name, person_role = name_part.split(' - ', 1)
-            else:
-                person_name = name_part
-                person_role = "Team Member"
-            
-            # Save file
-            file_id = str(uuid.uuid4())
-            file_extension = filename.split('.')[-1] if '.' in filename else 'jpg'
-            new_filename = f"{file_id}.{file_extension}"
-            file_path = os.path.join(UPLOAD_DIR, new_filename)
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Create flashcard record
-            cursor.execute('''
+    return {"message": f"Successfully uploaded {uploaded_count} photos"}
+
+# Archive import: one ZIP or tar of photos instead of one multipart part per
+# image. Members are streamed straight into uploads/ (see backend/archives.py)
+# and cards are inserted ARCHIVE_BATCH_SIZE per transaction, so memory stays
+# flat whatever the archive size.
+ARCHIVE_BATCH_SIZE = 200
+MAX_REPORTED_ERRORS = 100
+
+def copy_archive_member(stream, file_path: str):
+    try:
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(stream, buffer)
+    except Exception:
+        os.remove(file_path)
+        raise
+
+@app.post("/bulk-upload/archive")
+def bulk_upload_archive(
+    deck_id: int = Form(),
+    archive: UploadFile = File(...),
+    current_user: str = Depends(verify_token)
+):
+    with db_pool.connection() as conn:
+        if conn.execute("SELECT 1 FROM decks WHERE id = ?", (deck_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Deck not found")
+
+    created_count = 0
+    error_count = 0
+    errors = []
+    batch = []
+
+    def commit_batch():
+        with db_pool.connection() as conn:
+            conn.executemany('''
                 INSERT INTO flashcards (deck_id, person_name, person_role, image_filename, front, back)
                 VALUES (?, ?, ?, ?, ?, ?)
-            ''', (deck_id, person_name, person_role, new_filename, person_name, person_role))
-            
-            uploaded_count += 1
-    
-    conn.commit()
-    conn.close()
-    
-    return {"message": f"Successfully uploaded {uploaded_count} photos"}
+            ''', batch)
+            conn.commit()
+        batch.clear()
+
+    try:
+        for member_name, size, stream in archives.iter_members(archive.file):
+            filename = member_name.rsplit("/", 1)[-1]
+            parsed = filename_parser.parse(filename)
+            error = filename_parser.filename_error(parsed, filename)
+            if error is None and size > archives.MAX_MEMBER_BYTES:
+                error = archives.too_large(member_name)
+            if error is None:
+                new_filename = f"{uuid.uuid4()}.{parsed.extension}"
+                try:
+                    copy_archive_member(stream, os.path.join(UPLOAD_DIR, new_filename))
+                except Exception as e:
+                    error = f"Error processing {member_name}: {str(e)}"
+            if error is not None:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"filename": member_name, "error": error})
+                continue
+
+            batch.append((deck_id, parsed.person_name, parsed.person_role, new_filename,
+                          parsed.person_name, parsed.person_role))
+            if len(batch) >= ARCHIVE_BATCH_SIZE:
+                created_count += len(batch)
+                commit_batch()
+        if batch:
+            created_count += len(batch)
+            commit_batch()
+    except archives.ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if created_count:
+            study_sampler.invalidate(deck_id)
+            quiz_index.invalidate(deck_id)
+
+    return {
+        "message": f"Successfully uploaded {created_count} photos",
+        "created_count": created_count,
+        "error_count": error_count,
+        "errors": errors,
+    }
 
 # Get cards for study
 @app.get("/decks/{deck_id}/study")
-def get_study_cards(deck_id: int, current_user: str = Depends(verify_token)):
-    conn = sqlite3.connect('flashcards.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+def get_study_cards(
+    deck_id: int,
+    weighted: bool = False,
+    seed: Optional[int] = None,
+    current_user: str = Depends(verify_token)
+):
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        card_ids = study_sampler.sample(cursor, deck_id, STUDY_BATCH_SIZE, weighted=weighted, seed=seed)
+        return [card for card, _ in fetch_study_cards(cursor, card_ids)]
+
+def fetch_study_cards(cursor, card_ids: List[int]):
+    """(card dict, row) pairs for card_ids, in card_ids order"""
+    placeholders = ','.join('?' * len(card_ids))
+    cursor.execute(f'''
         SELECT id, person_name, person_role, image_filename, front, back
         FROM flashcards 
-        WHERE deck_id = ?
-        ORDER BY RANDOM()
-        LIMIT 20
-    ''', (deck_id,))
+        WHERE id IN ({placeholders})
+    ''', card_ids)
+    rows_by_id = {row[0]: row for row in cursor.fetchall()}
     
     cards = []
-    for row in cursor.fetchall():
+    for row in (rows_by_id[card_id] for card_id in card_ids if card_id in rows_by_id):
         image_url = f"/uploads/{row[3]}" if row[3] else None
-        cards.append({
+        thumbnail_url = f"{image_url}?w={THUMBNAIL_WIDTH}" if image_url else None
+        cards.append(({
             "id": row[0],
             "front": row[4] or row[1],
             "back": row[5] or row[2],
-            "image_url": image_url
-        })
-    
-    conn.close()
+            "image_url": image_url,
+            "thumbnail_url": thumbnail_url
+        }, row))
     return cards
 
+# Multiple-choice study: each card with its name among distractor names
+@app.get("/decks/{deck_id}/quiz")
+def get_quiz(
+    deck_id: int,
+    distractors: int = 3,
+    weighted: bool = False,
+    seed: Optional[int] = None,
+    current_user: str = Depends(verify_token)
+):
+    if not 1 <= distractors <= QUIZ_MAX_DISTRACTORS:
+        raise HTTPException(status_code=400, detail=f"distractors must be between 1 and {QUIZ_MAX_DISTRACTORS}")
+    rng = random.Random(seed)
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        card_ids = study_sampler.sample(cursor, deck_id, STUDY_BATCH_SIZE, weighted=weighted, seed=seed)
+        cards = fetch_study_cards(cursor, card_ids)
+        people = quiz_index.get_sync(deck_id, lambda: cursor.execute(
+            'SELECT person_name, person_role FROM flashcards WHERE deck_id = ?', (deck_id,)
+        ).fetchall()) if cards else None
+    
+    questions = []
+    for card, row in cards:
+        options = people.distractors(row[1], row[2], distractors, rng) + [row[1]]
+        rng.shuffle(options)
+        questions.append({**card, "person_name": row[1], "options": options})
+    return questions
+
+# Spaced repetition: backend/sm2.py's rules, which rate 1 (hard) to 5 (easy)
+RATINGS = {"hard": 1, "medium": 3, "easy": 5}  # Scheduler quality, 5 = best recall
+DIFFICULTY_SCORES = {"easy": 1, "medium": 3, "hard": 5}  # Stored difficulty, 5 = hardest
+
+def parse_timestamp(value) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def parse_reviewed_at(value, now: datetime) -> datetime:
+    """Client timestamp as local naive time (how this app stores them), never in the future"""
+    if not value:
+        return now
+    try:
+        reviewed_at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return now
+    if reviewed_at.tzinfo is not None:
+        reviewed_at = reviewed_at.astimezone().replace(tzinfo=None)
+    return min(reviewed_at, now)
+
+def apply_reviews(cursor, reviews):
+    """Schedule (reviewed_at, card_id, difficulty) reviews in reviewed_at order
+    from each card's current state and write them with one executemany. Reviews
+    not newer than the card's last review are skipped, so a late offline upload
+    can't rewind a card. Returns the new state of every card that exists;
+    "applied" counts the reviews used."""
+    card_ids = list(dict.fromkeys(card_id for _, card_id, _ in reviews))
+    placeholders = ','.join('?' * len(card_ids))
+    cursor.execute(f'''
+        SELECT id, review_count, ease, interval_days, last_reviewed, next_review
+        FROM flashcards WHERE id IN ({placeholders})
+    ''', card_ids)
+    
+    state = {}
+    for card_id, review_count, ease, interval_days, last_reviewed, next_review in cursor.fetchall():
+        if interval_days is None:
+            # Reviewed before intervals were stored: use the gap the old scheduler left
+            last, upcoming = parse_timestamp(last_reviewed), parse_timestamp(next_review)
+            interval_days = max((upcoming - last).total_seconds() / 86400, 0.0) if last and upcoming else 0.0
+        state[card_id] = {
+            "review_count": review_count or 0,
+            "ease": sm2.DEFAULT_EASE if ease is None else ease,
+            "interval_days": interval_days,
+            "last_reviewed": parse_timestamp(last_reviewed),
+            "next_review": next_review,
+            "applied": 0,
+        }
+    
+    rows = []
+    for reviewed_at, card_id, difficulty in sorted(reviews, key=lambda review: review[0]):
+        card = state.get(card_id)
+        if card is None:
+            continue
+        if card["last_reviewed"] is not None and reviewed_at <= card["last_reviewed"]:
+            continue
+        ease, interval, next_review = sm2.schedule_card(
+            RATINGS.get(difficulty, 3), card["review_count"], card["interval_days"], card["ease"], reviewed_at
+        )
+        card["review_count"] += 1
+        card["ease"] = ease
+        card["interval_days"] = interval
+        card["last_reviewed"] = reviewed_at
+        card["next_review"] = next_review.isoformat()
+        card["applied"] += 1
+        rows.append((
+            DIFFICULTY_SCORES.get(difficulty, 3), reviewed_at.isoformat(), card["next_review"],
+            card["review_count"], ease, interval, card_id
+        ))
+    
+    cursor.executemany('''
+        UPDATE flashcards 
+        SET difficulty = ?, last_reviewed = ?, next_review = ?, review_count = ?, ease = ?, interval_days = ?
+        WHERE id = ?
+    ''', rows)
+    return state
+
+def record_reviews(reviews):
+    """apply_reviews() in a transaction of its own"""
+    with db_pool.connection() as conn:
+        state = apply_reviews(conn.cursor(), reviews)
+        conn.commit()
+    return state
+
 # Record card review
 @app.post("/cards/{card_id}/review")
 async def review_card(
@@ -243,40 +721,245 @@ async def review_card(
     request_data = await request.json()
     difficulty = request_data.get("difficulty", "medium")
     
-    conn = sqlite3.connect('flashcards.db')
-    cursor = conn.cursor()
+    await run_in_threadpool(record_reviews, [(datetime.now(), card_id, difficulty)])
+    return {"status": "success"}
+
+# Record a batch of buffered reviews
+@app.post("/reviews/batch")
+async def review_cards_batch(request: Request, current_user: str = Depends(verify_token)):
+    """Body: {"reviews": [{"card_id", "difficulty", "reviewed_at"}, ...]}.
+    All reviews are applied in one transaction with a single executemany."""
+    request_data = await request.json()
+    reviews = request_data.get("reviews", []) if isinstance(request_data, dict) else request_data
+    
+    now = datetime.now()
+    records = []
+    for position, review in enumerate(reviews):
+        try:
+            card_id = int(review["card_id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Review {position} has no valid card_id")
+        reviewed_at = parse_reviewed_at(review.get("reviewed_at"), now)
+        records.append((reviewed_at, position, card_id, review.get("difficulty", "medium")))
     
-    # Simple spaced repetition algorithm
-    difficulty_map = {"easy": 1, "medium": 3, "hard": 5}
-    difficulty_score = difficulty_map.get(difficulty, 3)
+    # Oldest first, so the latest review of a card decides its schedule
+    records.sort(key=lambda record: record[:2])
+    card_ids = list(dict.fromkeys(record[2] for record in records))
+    if not card_ids:
+        return []
     
-    # Calculate next review date
-    days_to_add = {1: 3, 3: 1, 5: 0.5}[difficulty_score]
-    next_review = datetime.now() + timedelta(days=days_to_add)
+    state = await run_in_threadpool(record_reviews, [
+        (reviewed_at, card_id, difficulty) for reviewed_at, _, card_id, difficulty in records
+    ])
     
-    cursor.execute('''
-        UPDATE flashcards 
-        SET difficulty = ?, last_reviewed = ?, next_review = ?, review_count = review_count + 1
-        WHERE id = ?
-    ''', (difficulty_score, datetime.now().isoformat(), next_review.isoformat(), card_id))
+    results = []
+    for card_id in card_ids:
+        card = state.get(card_id)
+        if card is None:
+            results.append({"card_id": card_id, "status": "not_found"})
+        else:
+            results.append({
+                "card_id": card_id,
+                "status": "reviewed" if card["applied"] else "stale",
+                "review_count": card["review_count"],
+                "next_review": card["next_review"]
+            })
+    return results
+
+# Resized image variants
+# Generated on first request and cached under uploads/variants/w<width>/ so a
+# study session loads small JPEGs instead of full-size phone photos
+VARIANT_WIDTHS = (64, 128, 200, 400, 800)
+THUMBNAIL_WIDTH = 400  # 2x the 200px the study view displays
+VARIANT_DIR = os.path.join(UPLOAD_DIR, "variants")
+
+def variant_width(requested_width: int) -> int:
+    return next((w for w in VARIANT_WIDTHS if requested_width <= w), VARIANT_WIDTHS[-1])
+
+def get_image_variant(file_path: str, filename: str, requested_width: int) -> str:
+    width = variant_width(requested_width)
+    variant_path = os.path.join(VARIANT_DIR, f"w{width}", filename.rsplit('.', 1)[0] + '.jpg')
+    if os.path.exists(variant_path):
+        return variant_path
+    if Image is None:
+        return file_path
+    
+    try:
+        with Image.open(file_path) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.width <= width:
+                return file_path
+            height = max(1, round(image.height * width / image.width))
+            resized = image.convert('RGB').resize((width, height), Image.LANCZOS)
+            os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+            temp_path = f"{variant_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                resized.save(temp_path, format='JPEG', quality=80, optimize=True, progressive=True)
+                os.replace(temp_path, variant_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return variant_path
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return file_path
+
+# Image HTTP caching
+# Stored images get uuid (or content-hash) names and are never rewritten, so
+# browsers may cache them for a year without revalidating. File metadata is
+# kept in a small LRU so a hot image is served without a stat() per request.
+IMAGE_METADATA_CACHE_SIZE = 2048
+IMAGE_READ_CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+IMMUTABLE_IMAGE_NAME = re.compile(
+    r'^(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{64})\.[A-Za-z0-9]+$'
+)
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+class ImageMetadata(NamedTuple):
+    path: str
+    stat_result: os.stat_result
+    etag: str
+    last_modified: str
+    media_type: str
+    cache_control: str
+
+class ImageMetadataCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filename: str, width: Optional[int]) -> Optional[ImageMetadata]:
+        key = (filename, width)
+        with self._lock:
+            metadata = self._entries.get(key)
+            if metadata is not None:
+                self._entries.move_to_end(key)
+                return metadata
+        
+        metadata = self._load(filename, width)
+        if metadata is not None:
+            with self._lock:
+                self._entries[key] = metadata
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return metadata
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self, filename: str, width: Optional[int]) -> Optional[ImageMetadata]:
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        if os.path.basename(filename) != filename or not os.path.isfile(file_path):
+            return None
+        if width is not None:
+            file_path = get_image_variant(file_path, filename, width)
+        
+        stat_result = os.stat(file_path)
+        etag = '"{:x}-{:x}"'.format(stat_result.st_mtime_ns, stat_result.st_size)
+        if width is not None:
+            etag = '"w{}-{}'.format(width, etag[1:])
+        immutable = IMMUTABLE_IMAGE_NAME.match(filename) is not None
+        return ImageMetadata(
+            path=file_path,
+            stat_result=stat_result,
+            etag=etag,
+            last_modified=formatdate(stat_result.st_mtime, usegmt=True),
+            media_type=mimetypes.guess_type(file_path)[0] or "application/octet-stream",
+            cache_control=IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        )
+
+image_metadata = ImageMetadataCache(IMAGE_METADATA_CACHE_SIZE)
+
+def is_not_modified(request: Request, metadata: ImageMetadata) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.replace("W/", "", 1) == metadata.etag for tag in tags)
     
-    conn.commit()
-    conn.close()
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(metadata.stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_byte_range(range_header: str, size: int):
+    """(start, end) inclusive for a single "bytes=" range, None to ignore the
+    header, or raises ValueError when the range cannot be satisfied"""
+    match = RANGE_HEADER.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None  # Malformed or multi-range: serve the whole file
     
-    return {"status": "success"}
+    if match.group(1) == "":
+        # Suffix range: the last N bytes
+        length = int(match.group(2))
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+def iter_file_range(file_path: str, start: int, end: int):
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(IMAGE_READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
 
 # Serve uploaded images
 @app.get("/uploads/{filename}")
-async def get_uploaded_file(filename: str):
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    raise HTTPException(status_code=404, detail="File not found")
+def get_uploaded_file(filename: str, request: Request, w: Optional[int] = None):
+    metadata = image_metadata.get(filename, variant_width(w) if w is not None and w > 0 else None)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    headers = {
+        "ETag": metadata.etag,
+        "Last-Modified": metadata.last_modified,
+        "Cache-Control": metadata.cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if is_not_modified(request, metadata):
+        return Response(status_code=304, headers=headers)
+    
+    size = metadata.stat_result.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (metadata.etag, metadata.last_modified)):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                iter_file_range(metadata.path, start, end),
+                status_code=206,
+                headers=headers,
+                media_type=metadata.media_type,
+            )
+    
+    return FileResponse(metadata.path, headers=headers, media_type=metadata.media_type, stat_result=metadata.stat_result)
 
 # Root endpoint - serve frontend
-@app.get("/", response_class=HTMLResponse)
-async def serve_frontend():
-    return """
+# The page never changes while the process runs, so it is encoded and
+# compressed once at import; a request only picks the variant it accepts.
+INDEX_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -603,7 +1286,7 @@ async def serve_frontend():
                 isFlipped = false;
                 
                 document.getElementById('cardImage').innerHTML = card.image_url ? 
-                    `<img src="${card.image_url}" style="max-width:200px; max-height:200px; border-radius:10px;">` : 
+                    `<img src="${card.thumbnail_url || card.image_url}" style="max-width:200px; max-height:200px; border-radius:10px;">` : 
                     '<div style="width:200px; height:200px; background:#f0f0f0; display:flex; align-items:center; justify-content:center; border-radius:10px;">No Image</div>';
                 
                 document.getElementById('cardText').innerHTML = '<h3>Who is this?</h3>';
@@ -651,6 +1334,43 @@ async def serve_frontend():
     </html>
     """
 
+class EncodedPage(NamedTuple):
+    variants: dict  # Content-Encoding ("identity", "gzip", "br") -> body bytes
+    etag: str
+
+def encode_page(html: str) -> EncodedPage:
+    body = html.encode("utf-8")
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if compression.brotli is not None:
+        variants["br"] = compression.brotli.compress(body, quality=11)
+    return EncodedPage(variants, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+
+INDEX_PAGE = encode_page(INDEX_HTML)
+
+metrics.gauge("active_tokens", "Unexpired access tokens in the token store", lambda: len(active_tokens))
+metrics.gauge("image_metadata_entries", "Entries in the image metadata cache", lambda: len(image_metadata))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+def get_profile(reset: bool = False, current_user: str = Depends(verify_token)):
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is off; set PROFILE_ROUTE to enable it")
+    return PlainTextResponse(profiler.folded(reset=reset))
+
+@app.get("/", response_class=HTMLResponse)
+async def serve_frontend(request: Request):
+    headers = {"ETag": INDEX_PAGE.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if INDEX_PAGE.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    offered = [coding for coding in ("br", "gzip") if coding in INDEX_PAGE.variants]
+    encoding = compression.choose_encoding(request.headers.get("accept-encoding", ""), offered) or "identity"
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(INDEX_PAGE.variants[encoding], media_type="text/html", headers=headers)
+
 if __name__ == "__main__":
     import uvicorn
     # Replit port configuration